@@ -1,26 +1,473 @@
-from flask import Flask, render_template, request, redirect, url_for, session, flash
+from flask import (Blueprint, Flask, current_app, render_template, request, redirect, url_for,
+                   session, flash, g, has_app_context, has_request_context, Response, jsonify,
+                   abort)
 import sqlite3
-from datetime import datetime
-from werkzeug.security import generate_password_hash, check_password_hash
+import queue
+import threading
+import json
+import hashlib
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from werkzeug.security import DEFAULT_PBKDF2_ITERATIONS, generate_password_hash, check_password_hash
 import re
 
-PER_PAGE = 3
-
-app = Flask(__name__)
-app.secret_key = 'chave-secreta-simples'
+from migrar_db import VERSAO_ATUAL
+from repositorios import (classe_cursor_postgres, colunas_do_board, conectar_postgres,
+                          criar_pool_postgres, criar_repositorios)
+
+# Configuração de cada app: estes são os padrões; as variáveis HELPDESK_*
+# e o dict passado para create_app passam por cima (ver APLICAÇÃO, no fim).
+# Dentro do app, ler sempre de current_app.config.
+CONFIG_PADRAO = {
+    "DATABASE": 'database.db',   # arquivo ou URI (":memory:" vira banco em memória compartilhado)
+    # "sqlite" (DATABASE) ou "postgres" (POSTGRES_DSN, schema em schema_postgres.sql)
+    "BANCO": 'sqlite',
+    "POSTGRES_DSN": 'postgresql://helpdesk@localhost/helpdesk',
+    "DB_POOL_SIZE": 8,           # conexões ociosas mantidas no pool (postgres: máximo do pool)
+    "PER_PAGE": 3,
+    "SECRET_KEY": 'chave-secreta-simples',
+    # Hash de senha (formato do werkzeug: "metodo:parametros", ou só
+    # "scrypt"/"pbkdf2" com os padrões). Trocar o método/custo: senhas
+    # antigas são refeitas no próximo login.
+    "SENHA_METODO": 'scrypt:32768:8:1',
+}
+
+COMMENTS_PER_PAGE = 50
+BUSCA_LIMITE = 30
+STATS_DIAS_PADRAO = 30
+
+POSTGRES_POOL_MIN = 2     # conexões abertas mesmo sem movimento
+
+DB_BUSY_TIMEOUT_MS = 5000  # espera pelo lock antes de dar "database is locked"
+DB_CACHE_SIZE_KB = 16000   # cache de páginas por conexão (~16 MB)
+
+# "Marcar como visto" fora do request (thread gravando em lote).
+# False = grava na hora, na mesma conexão do request.
+LEITURAS_EM_SEGUNDO_PLANO = False
+LEITURAS_FILA_MAX = 1000
+LEITURAS_LOTE_MAX = 200
+
+# Pool dos hashes de senha (o método fica em SENHA_METODO, na config)
+SENHA_WORKERS = min(4, os.cpu_count() or 1)  # hashes rodando ao mesmo tempo
+SENHA_FILA_MAX = 32                           # hashes esperando (o resto recebe "ocupado")
+SENHA_ESPERA_SEG = 10
+
+# Instrumentação de SQL (Server-Timing + painel no modo debug + log de lentas)
+CONSULTA_LENTA_MS = 50
+CONSULTAS_LENTAS_LOG = 'consultas_lentas.log'
+PAINEL_SQL_TOP = 5
+
+# /metrics: limites dos baldes do histograma de tempo de resposta (segundos)
+METRICAS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+# Rotas e hooks ficam no blueprint; create_app monta um Flask novo com ele
+bp = Blueprint("helpdesk", __name__)
 
 
 # ============================================================
 # BANCO
 # ============================================================
-def get_db_connection():
-    conn = sqlite3.connect('database.db')
+class RecursosDoApp:
+    """
+    O que é de UM app (cada create_app ganha o seu, em
+    app.extensions["helpdesk"]): pool de conexões, thread/fila das
+    leituras em segundo plano, assinantes do /events, a thread que lê
+    o ticket_events para eles e as métricas do /metrics.
+    """
+
+    def __init__(self, config):
+        self.db_pool = queue.LifoQueue(maxsize=config["DB_POOL_SIZE"])
+        self.pool_postgres = None
+        self.lock = threading.Lock()
+
+        self.fila_leituras = queue.Queue(maxsize=LEITURAS_FILA_MAX)
+        self.gravador_leituras = None
+
+        self.assinantes = []
+        self.assinantes_lock = threading.Lock()
+        self.leitor_eventos = None
+
+        # Banco em memória some quando fecha a última conexão
+        self.conexao_memoria = None
+
+        self.metricas = {
+            "conexoes_abertas": 0,
+            "conexoes_fechadas": 0,
+            "conexoes_em_uso": 0,
+            "comandos_sql": 0,
+        }
+        self.histogramas = {}  # rota -> {"baldes": [...], "soma": s, "total": n}
+        self.metricas_lock = threading.Lock()
+
+
+def recursos():
+    return current_app.extensions["helpdesk"]
+
+
+def sqlite_em_memoria(caminho):
+    # ":memory:", "file::memory:?cache=shared", "file:testes?mode=memory&cache=shared"
+    return caminho == ":memory:" or caminho.startswith("file::memory:") or (
+        caminho.startswith("file:") and "mode=memory" in caminho)
+
+
+def abrir_conexao(config=None):
+    """
+    Abre uma conexão nova já configurada:
+    - WAL: leitores não bloqueiam escritores (e vice-versa)
+    - synchronous=NORMAL: seguro com WAL e bem menos fsync
+    - busy_timeout: espera o lock em vez de falhar na hora
+    - cache_size maior: menos leitura de disco nos boards
+
+    BANCO = "postgres": conexão avulsa no POSTGRES_DSN.
+    config: a do app atual, se não vier.
+    """
+    config = config or current_app.config
+
+    if config["BANCO"] == "postgres":
+        somar_metrica("conexoes_abertas")
+        return conectar_postgres(config["POSTGRES_DSN"], cursor_medido_postgres())
+
+    # uri=True: DATABASE também aceita "file:...?mode=memory&cache=shared"
+    conn = sqlite3.connect(config["DATABASE"], uri=True, check_same_thread=False,
+                           factory=ConexaoMedida)
+    somar_metrica("conexoes_abertas")
     conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute("PRAGMA synchronous = NORMAL")
+    conn.execute(f"PRAGMA busy_timeout = {DB_BUSY_TIMEOUT_MS}")
+    conn.execute(f"PRAGMA cache_size = -{DB_CACHE_SIZE_KB}")
     return conn
 
 
+def pool_postgres():
+    """
+    Pool do psycopg_pool (um por app/processo), criado no primeiro uso.
+    Ele mesmo abre, testa e fecha as conexões.
+    """
+    estado = recursos()
+    config = current_app.config
+
+    with estado.lock:
+        if estado.pool_postgres is None:
+            estado.pool_postgres = criar_pool_postgres(config["POSTGRES_DSN"], POSTGRES_POOL_MIN,
+                                                       config["DB_POOL_SIZE"],
+                                                       DB_BUSY_TIMEOUT_MS / 1000,
+                                                       cursor_medido_postgres())
+    return estado.pool_postgres
+
+
+def pegar_conexao_do_pool():
+    somar_metrica("conexoes_em_uso")
+
+    if current_app.config["BANCO"] == "postgres":
+        return pool_postgres().getconn()
+
+    try:
+        return recursos().db_pool.get_nowait()
+    except queue.Empty:
+        return abrir_conexao()
+
+
+def devolver_conexao_ao_pool(conn):
+    somar_metrica("conexoes_em_uso", -1)
+
+    # putconn também desfaz transação pendurada
+    if current_app.config["BANCO"] == "postgres":
+        pool_postgres().putconn(conn)
+        return
+
+    # Nunca devolve conexão com transação pendurada
+    if conn.in_transaction:
+        conn.rollback()
+
+    try:
+        recursos().db_pool.put_nowait(conn)
+    except queue.Full:
+        conn.close()
+        somar_metrica("conexoes_fechadas")
+
+
+def get_db_connection():
+    """
+    Retorna a conexão do request atual (guardada em flask.g).
+    Ela sai do pool na primeira chamada e volta no teardown do request,
+    então as rotas NÃO devem chamar conn.close().
+
+    Fora de um request (scripts, testes): dentro de "with app.app_context()",
+    e a conexão volta para o pool quando o contexto fecha.
+    """
+    if "db" not in g:
+        g.db = pegar_conexao_do_pool()
+    return g.db
+
+
+def conexoes_ociosas():
+    if current_app.config["BANCO"] == "postgres":
+        return pool_postgres().get_stats().get("pool_available", 0)
+    return recursos().db_pool.qsize()
+
+
+def repositorios(conn=None):
+    """
+    Repositórios (usuarios, tickets, comentarios) do BANCO configurado,
+    na conexão do request, ou em conn (thread de leituras, leituras em paralelo).
+    """
+    if conn is not None:
+        return criar_repositorios(current_app.config["BANCO"], conn)
+
+    if "repositorios" not in g:
+        g.repositorios = criar_repositorios(current_app.config["BANCO"], get_db_connection())
+    return g.repositorios
+
+
+def liberar_conexao(exception=None):
+    # teardown_appcontext (registrado no create_app)
+    g.pop("repositorios", None)
+    conn = g.pop("db", None)
+    if conn is not None:
+        devolver_conexao_ao_pool(conn)
+
+
+# ============================================================
+# INSTRUMENTAÇÃO DE SQL (POR REQUEST)
+# ============================================================
+#
+# Toda conexão do app mede os comandos: ConexaoMedida (SQLite) ou
+# cursor_factory=cursor_medido_postgres() (psycopg). Cada comando
+# executado no request vira um registro em g.consultas (sql, params,
+# ms), somando o tempo do execute e dos fetch*. No fim do request:
+# - header Server-Timing (tempo de banco, nº de comandos, tempo total)
+# - comandos acima de CONSULTA_LENTA_MS vão para consultas_lentas.log
+#   junto com o plano (EXPLAIN QUERY PLAN / EXPLAIN do PostgreSQL)
+# - no modo debug, painel_sql.html mostra o resumo no rodapé da página
+#
+log_consultas_lentas = logging.getLogger("helpdesk.consultas_lentas")
+
+
+def registrar_consulta(sql, params, inicio):
+    # Fora de request (scripts, thread de leituras): não mede
+    if not has_request_context():
+        return None
+
+    consulta = {"sql": sql, "params": params, "ms": (time.perf_counter() - inicio) * 1000}
+    g.setdefault("consultas", []).append(consulta)
+    return consulta
+
+
+class MedicaoDeComandos:
+    """
+    Mede execute/executemany/fetch* de um cursor DB-API: vem antes do
+    cursor do driver na herança (sqlite3.Cursor ou psycopg.Cursor).
+    """
+    _consulta = None
+
+    def execute(self, sql, params=None, **kwargs):
+        inicio = time.perf_counter()
+        try:
+            if params is None:
+                return super().execute(sql, **kwargs)
+            return super().execute(sql, params, **kwargs)
+        finally:
+            self._consulta = registrar_consulta(sql, params, inicio)
+
+    def executemany(self, sql, lista_params, **kwargs):
+        lista_params = list(lista_params)
+        inicio = time.perf_counter()
+        try:
+            return super().executemany(sql, lista_params, **kwargs)
+        finally:
+            self._consulta = registrar_consulta(sql, lista_params[0] if lista_params else (), inicio)
+
+    def _somar_fetch(self, inicio):
+        if self._consulta is not None:
+            self._consulta["ms"] += (time.perf_counter() - inicio) * 1000
+
+    def fetchone(self):
+        inicio = time.perf_counter()
+        try:
+            return super().fetchone()
+        finally:
+            self._somar_fetch(inicio)
+
+    def fetchmany(self, *args):
+        inicio = time.perf_counter()
+        try:
+            return super().fetchmany(*args)
+        finally:
+            self._somar_fetch(inicio)
+
+    def fetchall(self):
+        inicio = time.perf_counter()
+        try:
+            return super().fetchall()
+        finally:
+            self._somar_fetch(inicio)
+
+
+class CursorMedido(MedicaoDeComandos, sqlite3.Cursor):
+    pass
+
+
+_cursor_medido_postgres = None
+
+
+def cursor_medido_postgres():
+    """
+    CursorMedido do psycopg (criado no primeiro uso: o psycopg só é
+    importado com BANCO = "postgres").
+    """
+    global _cursor_medido_postgres
+    if _cursor_medido_postgres is None:
+        _cursor_medido_postgres = type("CursorMedidoPostgres",
+                                       (MedicaoDeComandos, classe_cursor_postgres()), {})
+    return _cursor_medido_postgres
+
+
+class ConexaoMedida(sqlite3.Connection):
+    # conn.execute() do sqlite3 não passa por cursor(): redireciona aqui
+    def cursor(self, factory=CursorMedido):
+        return super().cursor(factory)
+
+    def execute(self, sql, params=()):
+        return self.cursor().execute(sql, params)
+
+    def executemany(self, sql, lista_params):
+        return self.cursor().executemany(sql, lista_params)
+
+
+@bp.before_app_request
+def iniciar_medicao():
+    g.inicio_request = time.perf_counter()
+
+
+@bp.app_template_global()
+def resumo_consultas():
+    """
+    {total, ms, lentas: [os PAINEL_SQL_TOP comandos mais demorados]} do request atual.
+    """
+    consultas = list(g.get("consultas", []))
+    return {
+        "total": len(consultas),
+        "ms": sum(c["ms"] for c in consultas),
+        "lentas": sorted(consultas, key=lambda c: c["ms"], reverse=True)[:PAINEL_SQL_TOP],
+    }
+
+
+def plano_da_consulta(conn, sql, params):
+    """
+    Plano de um comando já executado, no formato do banco do app.
+    Cursor comum (não medido): o EXPLAIN não entra na contagem do request.
+    """
+    if current_app.config["BANCO"] == "postgres":
+        # Savepoint: EXPLAIN com erro não deixa a transação abortada
+        with conn.transaction():
+            cursor = classe_cursor_postgres()(conn)
+            return [linha["QUERY PLAN"] for linha in cursor.execute(
+                "EXPLAIN " + sql, params or None
+            ).fetchall()]
+
+    return [linha[3] for linha in conn.cursor(sqlite3.Cursor).execute(
+        "EXPLAIN QUERY PLAN " + sql, params or ()
+    ).fetchall()]
+
+
+def gravar_consultas_lentas(consultas):
+    lentas = [c for c in consultas if c["ms"] >= CONSULTA_LENTA_MS]
+    if not lentas:
+        return
+
+    if not log_consultas_lentas.handlers:
+        handler = logging.FileHandler(CONSULTAS_LENTAS_LOG, encoding="utf-8")
+        handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+        log_consultas_lentas.addHandler(handler)
+        log_consultas_lentas.setLevel(logging.INFO)
+
+    conn = g.get("db")
+
+    for consulta in lentas:
+        plano = []
+        sql = consulta["sql"].strip()
+
+        # EXPLAIN só faz sentido para comandos "de verdade" (não BEGIN/COMMIT/PRAGMA)
+        if conn is not None and re.match(r"(SELECT|WITH|INSERT|UPDATE|DELETE)\b", sql, re.IGNORECASE):
+            try:
+                plano = plano_da_consulta(conn, sql, consulta["params"])
+            except Exception as erro:
+                # sqlite3.Error / psycopg.Error: o log sai sem o plano
+                plano = [f"(sem plano: {erro})"]
+
+        log_consultas_lentas.info(
+            "%.1f ms %s %s\n  SQL: %s\n  params: %r\n  plano:\n%s",
+            consulta["ms"], request.method, request.path,
+            " ".join(sql.split()), consulta["params"],
+            "\n".join(f"    {linha}" for linha in plano) or "    -",
+        )
+
+
+@bp.after_app_request
+def fechar_medicao(resposta):
+    consultas = g.get("consultas", [])
+    total_ms = sum(c["ms"] for c in consultas)
+
+    timings = [f'db;dur={total_ms:.1f};desc="{len(consultas)} comandos SQL"']
+    if "inicio_request" in g:
+        timings.append(f"app;dur={(time.perf_counter() - g.inicio_request) * 1000:.1f}")
+    resposta.headers["Server-Timing"] = ", ".join(timings)
+
+    gravar_consultas_lentas(consultas)
+    return resposta
+
+
+# Datas ficam no banco em ISO-8601 ("2026-01-13 11:10:00"): ordenam certo
+# como texto, aceitam índice e funcionam com date()/julianday() do SQLite.
+# O formato brasileiro é só para exibir (filtro data_br nos templates).
+FORMATO_DATA_BANCO = '%Y-%m-%d %H:%M:%S'
+FORMATO_DATA_TELA = '%d/%m/%Y %H:%M'
+
+
 def now_str():
-    return datetime.now().strftime('%d/%m/%Y %H:%M')
+    return datetime.now().strftime(FORMATO_DATA_BANCO)
+
+
+@bp.app_template_filter('data_br')
+def data_br(valor, com_hora=True):
+    """
+    "2026-01-13 11:10:00" -> "13/01/2026 11:10". Vazio/None passa direto
+    (para o template continuar usando {{ x | data_br or "—" }}).
+    com_hora=False: só a data ("2026-01-13" -> "13/01/2026").
+    """
+    if not valor:
+        return valor
+
+    formato = FORMATO_DATA_TELA if com_hora else FORMATO_DATA_TELA.split(" ")[0]
+
+    try:
+        return datetime.fromisoformat(valor).strftime(formato)
+    except ValueError:
+        return valor
+
+
+@bp.app_template_filter('duracao')
+def duracao(segundos):
+    """
+    Segundos -> "45min", "3h 20min", "2d 5h". None -> "—".
+    """
+    if segundos is None:
+        return "—"
+
+    minutos = int(segundos) // 60
+    if minutos < 60:
+        return f"{minutos}min"
+
+    horas, minutos = divmod(minutos, 60)
+    if horas < 24:
+        return f"{horas}h {minutos}min"
+
+    dias, horas = divmod(horas, 24)
+    return f"{dias}d {horas}h"
 
 
 # ============================================================
@@ -36,87 +483,139 @@ def validar_username(username):
 
 
 # ============================================================
-# HELPERS: COLUNAS "SEEN" POR PERFIL
+# SENHAS (HASH EM POOL DE THREADS LIMITADO)
 # ============================================================
-def get_seen_comment_col():
-    nivel = session.get("nivel")
-    if nivel == 0:
-        return "user_seen_comment_id"
-    if nivel == 1:
-        return "attendant_seen_comment_id"
-    return "admin_seen_comment_id"
+#
+# scrypt/pbkdf2 do hashlib soltam o GIL enquanto calculam, então um pool
+# de threads já usa vários núcleos. O pool limita quantos hashes rodam
+# juntos: um monte de login na troca de turno não come a CPU dos boards.
+#
+# A thread do request (gthread do gunicorn) continua parada no .result()
+# até o hash sair: o pool NÃO libera o worker, só limita a CPU. Com o
+# pool lotado, quem passa de SENHA_ESPERA_SEG na fila recebe "Servidor
+# ocupado" (descarte de carga) em vez de segurar a thread mais tempo.
+#
+_senha_pool = ThreadPoolExecutor(max_workers=SENHA_WORKERS, thread_name_prefix="senha")
+_senha_vagas = threading.BoundedSemaphore(SENHA_WORKERS + SENHA_FILA_MAX)
+
+
+def rodar_no_pool_de_senhas(funcao, *args):
+    """
+    Roda funcao(*args) no pool e espera o resultado (bloqueia a thread
+    do request). Retorna None se o pool estiver lotado (fila cheia por
+    SENHA_ESPERA_SEG): quem chama responde "Servidor ocupado".
+    """
+    if not _senha_vagas.acquire(timeout=SENHA_ESPERA_SEG):
+        return None
+    try:
+        return _senha_pool.submit(funcao, *args).result()
+    finally:
+        _senha_vagas.release()
 
 
-def get_seen_status_col():
-    nivel = session.get("nivel")
-    if nivel == 0:
-        return "user_seen_status_at"
-    if nivel == 1:
-        return "attendant_seen_status_at"
-    return "admin_seen_status_at"
+def gerar_hash_senha(senha):
+    return rodar_no_pool_de_senhas(generate_password_hash, senha,
+                                   current_app.config["SENHA_METODO"])
+
+
+def conferir_senha(senha_hash, senha):
+    """
+    True / False, ou None se o pool estiver lotado.
+    """
+    return rodar_no_pool_de_senhas(check_password_hash, senha_hash, senha)
+
+
+# Parâmetros que o werkzeug usa quando o método vem abreviado
+# ("scrypt" grava "scrypt:32768:8:1", "pbkdf2" grava "pbkdf2:sha256:<iterações>")
+PADROES_METODO_SENHA = {
+    "scrypt": (str(2 ** 15), "8", "1"),
+    "pbkdf2": ("sha256", str(DEFAULT_PBKDF2_ITERATIONS)),
+}
+
+
+def parametros_do_metodo(metodo):
+    """
+    "scrypt" -> ("scrypt", "32768", "8", "1"); "pbkdf2:sha256:600000" ->
+    ("pbkdf2", "sha256", "600000"). ValueError se o werkzeug não conhece.
+    """
+    nome, *parametros = metodo.split(":")
+    padroes = PADROES_METODO_SENHA.get(nome)
+    if padroes is None or len(parametros) > len(padroes):
+        raise ValueError(f"Método de senha desconhecido: {metodo}")
+    return (nome, *parametros, *padroes[len(parametros):])
+
+
+def hash_desatualizado(senha_hash, metodo=None):
+    """
+    O hash foi feito com outro método/custo que o configurado?
+    "scrypt:32768:8:1$salt$hash" -> compara ("scrypt", "32768", "8", "1").
+    """
+    metodo = metodo or current_app.config["SENHA_METODO"]
+    try:
+        return parametros_do_metodo(senha_hash.split("$", 1)[0]) != parametros_do_metodo(metodo)
+    except ValueError:
+        # Formato antigo/desconhecido: refaz com o atual
+        return True
 
 
 # ============================================================
 # NOTIFICAÇÕES 🔴 (CONTADOR) + 🟡 (STATUS)
 # ============================================================
-def get_unread_comment_count(ticket_id):
+#
+# O que cada pessoa já viu fica em comment_reads (uma linha por
+# ticket + usuário), e não mais em colunas do ticket por perfil:
+# - last_seen_comment_id: último comentário visto
+# - last_seen_status_at: quando viu o ticket pela última vez
+#
+# Assim dois admins não sobrescrevem a leitura um do outro e abrir
+# um ticket não escreve na linha (quente) de tickets.
+#
+def get_unread_comment_counts(ticket_ids):
     """
-    Retorna quantos comentários NÃO LIDOS existem para o usuário logado
-    naquele ticket.
+    Retorna {ticket_id: quantidade} de comentários NÃO LIDOS para o usuário
+    logado, para vários tickets de uma vez (uma única query).
 
     Regras:
     - Só conta comentários feitos por OUTRA pessoa (não o próprio autor)
-    - Usa seen_comment_id específico do perfil (user/attendant/admin)
-    - Admin ver NÃO marca como lido pros outros
+    - Usa a leitura do próprio usuário (comment_reads)
+    - Tickets sem comentários não lidos não aparecem no dict (conta 0)
+
+    Ticket cujo last_comment_id não passou do que o usuário viu é descartado
+    só olhando tickets + comment_reads; ticket_comments só é consultado (pelo
+    índice ticket_id, id) para quem tem comentário novo.
     """
     if "user_id" not in session:
-        return 0
+        return {}
 
-    user_id = session["user_id"]
-    seen_col = get_seen_comment_col()
+    ticket_ids = list(ticket_ids)
+    if not ticket_ids:
+        return {}
 
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    return repositorios().comentarios.nao_lidos(ticket_ids, session["user_id"])
 
-    cursor.execute(f"""
-        SELECT {seen_col} AS seen_id
-        FROM tickets
-        WHERE id = ?
-    """, (ticket_id,))
-    row = cursor.fetchone()
 
-    if not row:
-        conn.close()
-        return 0
-
-    seen_id = row["seen_id"] or 0
-
-    cursor.execute("""
-        SELECT COUNT(*) AS total
-        FROM ticket_comments
-        WHERE ticket_id = ?
-          AND id > ?
-          AND user_id != ?
-    """, (ticket_id, seen_id, user_id))
-
-    total = cursor.fetchone()["total"]
-    conn.close()
-
-    return total
+def get_unread_comment_count(ticket_id):
+    """
+    Retorna quantos comentários NÃO LIDOS existem para o usuário logado
+    naquele ticket (atalho para get_unread_comment_counts).
+    """
+    return get_unread_comment_counts([ticket_id]).get(ticket_id, 0)
 
 
 def get_has_status_update(ticket):
     """
     🟡 status atualizado aparece quando last_status_at > seen_status_at
     e a mudança foi feita por outra pessoa.
+
+    O ticket precisa trazer seen_status_at (LEFT JOIN em comment_reads
+    do usuário logado, como nas queries dos boards).
     """
     if "user_id" not in session:
         return False
 
     user_id = session["user_id"]
-    seen_col = get_seen_status_col()
 
-    seen_status_at = ticket[seen_col]
+    seen_status_at = ticket["seen_status_at"]
     last_status_at = ticket["last_status_at"]
     last_status_by = ticket["last_status_by"]
 
@@ -132,95 +631,542 @@ def get_has_status_update(ticket):
     if not seen_status_at:
         return True
 
-    # Comparação por string funciona pois formato é sempre igual dd/mm/yyyy hh:mm
+    # Comparação por string funciona pois o formato é ISO (YYYY-MM-DD HH:MM:SS)
     return last_status_at > seen_status_at
 
 
-def marcar_ticket_como_visto(ticket_id):
+def leitura_atrasada(ticket):
+    """
+    True se o que está em comment_reads (seen_comment_id / seen_status_at,
+    vindos do LEFT JOIN) ficou para trás do ticket. Se não ficou,
+    abrir o ticket não precisa escrever nada.
+    """
+    seen_comment_id = ticket["seen_comment_id"]
+    seen_status_at = ticket["seen_status_at"]
+
+    # Nunca abriu
+    if seen_comment_id is None:
+        return True
+
+    # Chegou comentário depois da última visita
+    if (ticket["last_comment_id"] or 0) > seen_comment_id:
+        return True
+
+    # Status mudou depois da última visita
+    if ticket["last_status_at"] and (not seen_status_at or ticket["last_status_at"] > seen_status_at):
+        return True
+
+    return False
+
+
+def gravar_leituras(conn, linhas):
+    """
+    linhas = [(ticket_id, user_id, last_seen_comment_id, agora), ...]
+
+    Upsert em comment_reads que nunca volta a leitura (a gravação em
+    segundo plano pode chegar depois de uma mais nova).
+    """
+    repositorios(conn).comentarios.gravar_leituras(linhas)
+    conn.commit()
+
+
+# ---------- gravação em segundo plano (LEITURAS_EM_SEGUNDO_PLANO) ----------
+def _loop_gravador_leituras(app):
+    # Contexto do app (config, repositórios) sem request: não usa g.db
+    with app.app_context():
+        fila_leituras = recursos().fila_leituras
+        conn = abrir_conexao()
+
+        while True:
+            linhas = [fila_leituras.get()]
+
+            # Junta o que mais estiver na fila num lote só (uma transação)
+            while len(linhas) < LEITURAS_LOTE_MAX:
+                try:
+                    linhas.append(fila_leituras.get_nowait())
+                except queue.Empty:
+                    break
+
+            try:
+                gravar_leituras(conn, linhas)
+            except Exception:
+                conn.rollback()
+                # Thread daemon: sem isso o erro (e o traceback) some
+                app.logger.exception("Falha ao gravar leituras (%d)", len(linhas))
+
+
+def enfileirar_leituras(linhas):
+    """
+    Entrega as leituras para a thread gravadora. Fila cheia: grava na hora.
+    Perde o que estiver na fila se o processo cair (é só o 🔴/🟡).
+    """
+    estado = recursos()
+
+    with estado.lock:
+        if estado.gravador_leituras is None:
+            estado.gravador_leituras = threading.Thread(
+                target=_loop_gravador_leituras, args=(current_app._get_current_object(),),
+                daemon=True,
+            )
+            estado.gravador_leituras.start()
+
+    for posicao, linha in enumerate(linhas):
+        try:
+            estado.fila_leituras.put_nowait(linha)
+        except queue.Full:
+            gravar_leituras(get_db_connection(), linhas[posicao:])
+            return
+
+
+def marcar_tickets_como_vistos(tickets):
     """
-    Marca como visto:
-    - Comentários: salva o ÚLTIMO comment_id do ticket
-    - Status: salva agora em seen_status_at
+    Marca como visto, para o usuário logado, os tickets JÁ carregados
+    (com last_comment_id, last_status_at, seen_comment_id e seen_status_at):
+    - Comentários: salva o last_comment_id que a pessoa acabou de ver
+    - Status: salva agora em last_seen_status_at
+
+    Só escreve os que estão atrasados (leitura_atrasada); abrir de novo
+    um ticket sem novidade não gera transação de escrita.
     """
     if "user_id" not in session:
         return
 
-    seen_comment_col = get_seen_comment_col()
-    seen_status_col = get_seen_status_col()
+    user_id = session["user_id"]
+    agora = now_str()
 
-    conn = get_db_connection()
-    cursor = conn.cursor()
-
-    # Pega último comentário do ticket
-    cursor.execute("""
-        SELECT id
-        FROM ticket_comments
-        WHERE ticket_id = ?
-        ORDER BY id DESC
-        LIMIT 1
-    """, (ticket_id,))
-    last_comment = cursor.fetchone()
-
-    last_comment_id = last_comment["id"] if last_comment else 0
-
-    cursor.execute(f"""
-        UPDATE tickets
-        SET {seen_comment_col} = ?,
-            {seen_status_col} = ?
-        WHERE id = ?
-    """, (last_comment_id, now_str(), ticket_id))
+    linhas = [
+        (ticket["id"], user_id, ticket["last_comment_id"] or 0, agora)
+        for ticket in tickets
+        if leitura_atrasada(ticket)
+    ]
+    if not linhas:
+        return
+
+    if LEITURAS_EM_SEGUNDO_PLANO:
+        enfileirar_leituras(linhas)
+    else:
+        gravar_leituras(get_db_connection(), linhas)
 
-    conn.commit()
-    conn.close()
 
+def marcar_ticket_como_visto(ticket):
+    marcar_tickets_como_vistos([ticket])
 
-def preparar_lista_com_badges(lista):
+
+def preparar_lista_com_badges(lista, unread_counts=None):
     """
     Retorna lista com:
     - ticket
     - unread_count (🔴)
     - has_status_update (🟡)
+
+    unread_counts pode vir pronto (calculado para o board inteiro);
+    se não vier, é feita uma query só para a lista toda.
     """
+    if unread_counts is None:
+        unread_counts = get_unread_comment_counts(t["id"] for t in lista)
+
     resultado = []
     for t in lista:
-        unread_count = get_unread_comment_count(t["id"])
         has_status_update = get_has_status_update(t)
 
         resultado.append({
             "ticket": t,
-            "unread_count": unread_count,
+            "unread_count": unread_counts.get(t["id"], 0),
             "has_status_update": has_status_update
         })
 
     return resultado
 
 
+# ============================================================
+# LOG DE EVENTOS DOS TICKETS (SÓ INSERÇÃO)
+# ============================================================
+#
+# Toda mudança de ticket grava uma linha em ticket_events (migração 010)
+# na MESMA transação do INSERT/UPDATE: se o commit falhar, não fica
+# evento sem mudança (nem mudança sem evento). As colunas status,
+# attendant_id, is_hidden... do tickets continuam sendo a "foto" atual
+# que os boards leem; o log é o histórico, em ordem de id.
+#
+# Tipos: ticket_created, ticket_started, ticket_closed, ticket_hidden,
+# ticket_unhidden, comment_added
+#
+EVENTOS_LOG_LIMITE = 200      # linhas por página de /api/eventos
+
+DESCRICAO_EVENTOS = {
+    "ticket_created": "abriu o chamado",
+    "ticket_started": "iniciou o atendimento",
+    "ticket_closed": "fechou o chamado",
+    "ticket_hidden": "ocultou o chamado",
+    "ticket_unhidden": "desocultou o chamado",
+    "comment_added": "enviou uma mensagem",
+}
+
+
+def registrar_eventos(conn, eventos, agora=None):
+    """
+    eventos = [(ticket_id, tipo, payload_dict), ...], feitos pelo usuário
+    logado. NÃO faz commit: quem chama commita junto com a mudança.
+    """
+    agora = agora or now_str()
+    repositorios(conn).tickets.registrar_eventos([
+        (ticket_id, tipo, session.get('user_id'), agora,
+         json.dumps(payload or {}, ensure_ascii=False))
+        for ticket_id, tipo, payload in eventos
+    ])
+
+
+def registrar_evento(conn, ticket_id, tipo, payload=None, agora=None):
+    registrar_eventos(conn, [(ticket_id, tipo, payload)], agora)
+
+
+def evento_do_log(linha):
+    evento = dict(linha)
+    evento["payload"] = json.loads(evento["payload"] or "{}")
+    evento["descricao"] = DESCRICAO_EVENTOS.get(evento["tipo"], evento["tipo"])
+    return evento
+
+
+def carregar_eventos(ticket_id, after_id=0, sem_comentarios=False, repos=None):
+    """
+    Linha do tempo de UM ticket (índice ticket_id, id), do mais antigo
+    pro mais novo. sem_comentarios: a tela do chamado já mostra as mensagens.
+    repos: repositórios de outra conexão (leituras em paralelo do asgi.py).
+    """
+    repos = repos or repositorios()
+    linhas = repos.tickets.eventos_do_ticket(ticket_id, after_id, sem_comentarios)
+    return [evento_do_log(linha) for linha in linhas]
+
+
+# ============================================================
+# EVENTOS AO VIVO (SSE) 📡
+# ============================================================
+#
+# Cada aba aberta em /events ganha uma fila no broker do processo. Quem
+# alimenta o broker é UMA thread por processo lendo o ticket_events por
+# id (o log que create/start/close/hide/unhide/add_comment gravam na
+# transação da mudança): a mudança feita em qualquer processo (ou nó,
+# no PostgreSQL) chega a todas as abas, com até EVENTOS_POLL_SEG de
+# atraso. O stream de cada pessoa filtra o que aparece no board dela.
+#
+# Eventos:
+# - ticket_created / status_changed: dados do card + "coluna" onde ele
+#   deve ficar no board de quem recebe (None = tirar o card da tela)
+# - comment_added: só o id do ticket e quem comentou (para o 🔴)
+#
+EVENTOS_FILA_MAX = 100        # eventos pendentes por aba antes de descartar
+EVENTOS_HEARTBEAT_SEG = 15    # comentário ": ping" para manter a conexão viva
+EVENTOS_POLL_SEG = 1.0        # intervalo da leitura do ticket_events
+EVENTOS_LOTE = 200            # linhas do ticket_events por leitura
+EVENTOS_RELER = 20            # ids relidos a cada leitura (ver publicar_eventos_novos)
+
+STATUS_COLUNA = {
+    'Aberto': 'abertos',
+    'Em andamento': 'andamento',
+    'Fechado': 'fechados',
+}
+
+# Card "em branco" que os kanbans renderizam dentro de <template>:
+# o JS clona e preenche quando chega ticket_created / status_changed
+# (global "modelo_card" dos templates, registrado no create_app)
+MODELO_CARD = {
+    "ticket": {
+        "id": 0, "titulo": "", "descricao": "", "status": "", "created_at": "",
+        "creator_username": "", "attendant_username": "",
+        "hider_username": "", "hidden_at": "",
+    },
+    "unread_count": 0,
+    "has_status_update": False,
+}
+
+
+def assinar_eventos(fila_eventos=None):
+    """
+    Registra uma fila no broker (e sobe o leitor do ticket_events na
+    primeira). Qualquer objeto com put_nowait serve (o asgi.py assina
+    com uma ponte para asyncio.Queue).
+    """
+    estado = recursos()
+    if fila_eventos is None:
+        fila_eventos = queue.Queue(maxsize=EVENTOS_FILA_MAX)
+    with estado.assinantes_lock:
+        estado.assinantes.append(fila_eventos)
+
+    # Thread por processo: com o preload_app do gunicorn ela nasce no
+    # worker (no primeiro /events), não no mestre antes do fork
+    with estado.lock:
+        if estado.leitor_eventos is None:
+            estado.leitor_eventos = threading.Thread(
+                target=_loop_leitor_eventos, args=(current_app._get_current_object(),),
+                daemon=True,
+            )
+            estado.leitor_eventos.start()
+
+    return fila_eventos
+
+
+def cancelar_assinatura(fila_eventos):
+    estado = recursos()
+    with estado.assinantes_lock:
+        if fila_eventos in estado.assinantes:
+            estado.assinantes.remove(fila_eventos)
+
+
+def publicar_evento(evento):
+    estado = recursos()
+    with estado.assinantes_lock:
+        assinantes = list(estado.assinantes)
+
+    for fila_eventos in assinantes:
+        try:
+            fila_eventos.put_nowait(evento)
+        except queue.Full:
+            # Aba parada/lenta: perde o evento, o próximo F5 corrige
+            pass
+
+
+def coluna_no_board(ticket, nivel, user_id):
+    """
+    Em qual coluna do board do perfil o ticket aparece (None = não aparece).
+    Mesmas regras de colunas_do_board.
+    """
+    if nivel == 2:
+        if ticket["is_hidden"] == 1:
+            return "ocultados"
+        return STATUS_COLUNA.get(ticket["status"])
+
+    if ticket["is_hidden"] == 1:
+        return None
+
+    if nivel == 0:
+        if ticket["user_id"] != user_id:
+            return None
+        return STATUS_COLUNA.get(ticket["status"])
+
+    if nivel == 1:
+        if ticket["status"] == 'Aberto':
+            return "abertos"
+        if ticket["attendant_id"] != user_id:
+            return None
+        return STATUS_COLUNA.get(ticket["status"])
+
+    return None
+
+
+def ticket_para_evento(ticket):
+    """
+    Só o que o card precisa (e as colunas usadas por coluna_no_board).
+    """
+    campos = ["id", "titulo", "descricao", "status", "is_hidden", "user_id",
+              "attendant_id", "last_status_by", "creator_username", "attendant_username",
+              "hider_username"]
+    dados = {campo: ticket.get(campo) for campo in campos}
+    dados["created_at"] = data_br(ticket.get("created_at"))
+    dados["hidden_at"] = data_br(ticket.get("hidden_at"))
+    return dados
+
+
+# Como o ticket estava antes de cada mudança de status (garantido pelas
+# travas do SQL_ACOES_STATUS / desocultar), para avisar quem tinha o
+# card na tela. O resto vem do ticket atual.
+ANTES_DO_EVENTO = {
+    "ticket_started": {"status": 'Aberto', "is_hidden": 0},
+    "ticket_closed": {"status": 'Em andamento', "is_hidden": 0},
+    "ticket_hidden": {"status": 'Fechado', "is_hidden": 0},
+    "ticket_unhidden": {"is_hidden": 1},
+}
+
+
+def eventos_para_o_broker(repos, linhas):
+    """
+    Linhas do ticket_events -> eventos do broker:
+    - ticket_created / status_changed: card com o estado ATUAL do ticket
+      + "antes" ({status, is_hidden} de antes da mudança)
+    - comment_added: card + autor_id
+    """
+    ticket_ids = list(dict.fromkeys(linha["ticket_id"] for linha in linhas))
+    if not ticket_ids:
+        return []
+
+    # Uma consulta para o lote todo (tabela quente ou arquivo)
+    tickets = {ticket["id"]: ticket_para_evento(ticket)
+               for ticket in repos.tickets.acesso(ticket_ids, None)}
+
+    eventos = []
+    for linha in linhas:
+        ticket = tickets.get(linha["ticket_id"])
+        if ticket is None:
+            continue
+
+        if linha["tipo"] == "comment_added":
+            eventos.append({"tipo": "comment_added", "ticket": ticket, "autor_id": linha["actor_id"]})
+        elif linha["tipo"] == "ticket_created":
+            eventos.append({"tipo": "ticket_created", "ticket": ticket, "antes": None})
+        elif linha["tipo"] in ANTES_DO_EVENTO:
+            eventos.append({"tipo": "status_changed", "ticket": ticket,
+                            "antes": ANTES_DO_EVENTO[linha["tipo"]]})
+
+    return eventos
+
+
+def publicar_eventos_novos(repos, ultimo_id, entregues):
+    """
+    Publica no broker o que entrou no ticket_events depois de ultimo_id,
+    gravado por qualquer processo. Retorna o novo ultimo_id.
+
+    No PostgreSQL o id sai da sequence antes do commit: um evento de id
+    menor pode aparecer depois de um maior. Por isso relê os últimos
+    EVENTOS_RELER ids e pula os que já estão em "entregues".
+    """
+    linhas = [
+        linha for linha in repos.tickets.eventos(max(0, ultimo_id - EVENTOS_RELER), EVENTOS_LOTE)
+        if linha["id"] not in entregues
+    ]
+
+    for evento in eventos_para_o_broker(repos, linhas):
+        publicar_evento(evento)
+
+    entregues.update(linha["id"] for linha in linhas)
+    ultimo_id = max([ultimo_id, *(linha["id"] for linha in linhas)])
+
+    # Só guarda o que ainda cai na janela relida
+    entregues.difference_update([evento_id for evento_id in entregues
+                                 if evento_id <= ultimo_id - EVENTOS_RELER])
+
+    return ultimo_id
+
+
+def _loop_leitor_eventos(app):
+    # Mesmo esquema do gravador de leituras: contexto do app, conexão própria
+    with app.app_context():
+        estado = recursos()
+        conn = abrir_conexao()
+        repos = repositorios(conn)
+        ultimo_id = None
+        entregues = set()
+
+        while True:
+            try:
+                with estado.assinantes_lock:
+                    tem_assinantes = bool(estado.assinantes)
+
+                if not tem_assinantes:
+                    # Ninguém ouvindo: não lê, e quem assinar depois
+                    # começa do "agora" (a página já veio atualizada)
+                    ultimo_id = None
+                elif ultimo_id is None:
+                    ultimo_id = repos.tickets.ultimo_evento_id()
+                    entregues = set(range(ultimo_id - EVENTOS_RELER + 1, ultimo_id + 1))
+                else:
+                    ultimo_id = publicar_eventos_novos(repos, ultimo_id, entregues)
+
+                # Fecha a transação de leitura (PostgreSQL): a próxima vê
+                # os commits novos
+                conn.rollback()
+            except Exception:
+                conn.rollback()
+                app.logger.exception("Falha ao ler ticket_events para o /events")
+
+            time.sleep(EVENTOS_POLL_SEG)
+
+
+def evento_para_usuario(evento, nivel, user_id):
+    """
+    Monta o payload que vai para UMA pessoa (ou None se não é da conta dela).
+    """
+    ticket = evento["ticket"]
+    coluna = coluna_no_board(ticket, nivel, user_id)
+
+    if evento["tipo"] == "comment_added":
+        if coluna is None:
+            return None
+        return {"ticket_id": ticket["id"], "autor_id": evento["autor_id"]}
+
+    coluna_antes = None
+    if evento.get("antes"):
+        coluna_antes = coluna_no_board({**ticket, **evento["antes"]}, nivel, user_id)
+
+    if coluna is None and coluna_antes is None:
+        return None
+
+    return {
+        "ticket_id": ticket["id"],
+        "coluna": coluna,
+        "ticket": ticket,
+    }
+
+
+@bp.route('/events')
+def eventos():
+    if 'user_id' not in session:
+        return Response(status=401)
+
+    nivel = session.get('nivel')
+    user_id = session['user_id']
+    fila_eventos = assinar_eventos()
+    # O gerador roda depois da view, já fora do contexto do app: o
+    # finally (aba fechada) precisa dele para achar o broker
+    app = current_app._get_current_object()
+
+    def stream():
+        try:
+            yield "retry: 5000\n\n"
+            while True:
+                try:
+                    evento = fila_eventos.get(timeout=EVENTOS_HEARTBEAT_SEG)
+                except queue.Empty:
+                    yield ": ping\n\n"
+                    continue
+
+                dados = evento_para_usuario(evento, nivel, user_id)
+                if dados is not None:
+                    yield f"event: {evento['tipo']}\ndata: {json.dumps(dados)}\n\n"
+        finally:
+            with app.app_context():
+                cancelar_assinatura(fila_eventos)
+
+    return Response(stream(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no',
+    })
+
+
 # ============================================================
 # LOGIN
 # ============================================================
-@app.route('/login', methods=['GET', 'POST'])
+@bp.route('/login', methods=['GET', 'POST'])
 def login():
     if request.method == 'POST':
         username = request.form['username'].strip().lower()
         senha = request.form['senha']
 
-        conn = get_db_connection()
-        cursor = conn.cursor()
-
-        cursor.execute("SELECT * FROM users WHERE username = ?", (username,))
-        user = cursor.fetchone()
-        conn.close()
+        usuarios = repositorios().usuarios
+        user = usuarios.por_username(username)
 
         if user:
             senha_hash = user['senha']
-            if check_password_hash(senha_hash, senha):
+            confere = conferir_senha(senha_hash, senha)
+
+            if confere is None:
+                flash("Servidor ocupado, tente novamente em instantes.", "warning")
+                return redirect(url_for('.login'))
+
+            if confere:
+                # Método/custo mudou: aproveita a senha em mãos e refaz o hash
+                if hash_desatualizado(senha_hash):
+                    novo_hash = gerar_hash_senha(senha)
+                    if novo_hash:
+                        usuarios.trocar_senha(user['id'], novo_hash)
+                        get_db_connection().commit()
+
                 session['user_id'] = user['id']
                 session['nivel'] = user['is_admin']  # 0 user | 1 atendente | 2 admin
+                session['username'] = user['username']
                 flash("Login realizado com sucesso!", "success")
-                return redirect(url_for('dashboard'))
+                return redirect(url_for('.dashboard'))
 
         flash("Usuário ou senha inválidos!", "error")
-        return redirect(url_for('login'))
+        return redirect(url_for('.login'))
 
     return render_template('login.html')
 
@@ -228,17 +1174,17 @@ def login():
 # ============================================================
 # LOGOUT
 # ============================================================
-@app.route('/logout')
+@bp.route('/logout')
 def logout():
     session.clear()
     flash("Você saiu do sistema.", "info")
-    return redirect(url_for('login'))
+    return redirect(url_for('.login'))
 
 
 # ============================================================
 # REGISTER
 # ============================================================
-@app.route('/register', methods=['GET', 'POST'])
+@bp.route('/register', methods=['GET', 'POST'])
 def register():
     if request.method == 'POST':
         username = request.form['username'].strip().lower()
@@ -246,31 +1192,25 @@ def register():
 
         if not validar_username(username):
             flash("Username inválido! Use o formato nome.sobrenome (ex: joao.silva)", "error")
-            return redirect(url_for('register'))
+            return redirect(url_for('.register'))
 
-        senha_hash = generate_password_hash(senha)
+        usuarios = repositorios().usuarios
 
-        conn = get_db_connection()
-        cursor = conn.cursor()
-
-        cursor.execute("SELECT id FROM users WHERE username = ?", (username,))
-        existe = cursor.fetchone()
-
-        if existe:
-            conn.close()
+        if usuarios.username_existe(username):
             flash("Esse username já existe! Escolha outro.", "warning")
-            return redirect(url_for('register'))
+            return redirect(url_for('.register'))
 
-        cursor.execute(
-            "INSERT INTO users (username, email, senha, is_admin) VALUES (?, ?, ?, ?)",
-            (username, None, senha_hash, 0)
-        )
+        senha_hash = gerar_hash_senha(senha)
 
-        conn.commit()
-        conn.close()
+        if senha_hash is None:
+            flash("Servidor ocupado, tente novamente em instantes.", "warning")
+            return redirect(url_for('.register'))
+
+        usuarios.criar(username, senha_hash, 0)
+        get_db_connection().commit()
 
         flash("Usuário cadastrado com sucesso! Agora faça login.", "success")
-        return redirect(url_for('login'))
+        return redirect(url_for('.login'))
 
     return render_template('register.html')
 
@@ -278,752 +1218,1134 @@ def register():
 # ============================================================
 # DASHBOARD (REDIRECIONA POR PERFIL)
 # ============================================================
-@app.route('/dashboard')
+@bp.route('/dashboard')
 def dashboard():
     if 'user_id' not in session:
-        return redirect(url_for('login'))
+        return redirect(url_for('.login'))
 
     nivel = session.get('nivel')
 
     if nivel == 0:
-        return redirect(url_for('meus_chamados'))
+        return redirect(url_for('.meus_chamados'))
     if nivel == 1:
-        return redirect(url_for('fila'))
+        return redirect(url_for('.fila'))
     if nivel == 2:
-        return redirect(url_for('admin'))
+        return redirect(url_for('.admin'))
 
-    return redirect(url_for('logout'))
+    return redirect(url_for('.logout'))
 
 
 # ============================================================
 # CRIAR CHAMADO
 # ============================================================
-@app.route('/create-ticket', methods=['GET', 'POST'])
+@bp.route('/create-ticket', methods=['GET', 'POST'])
 def create_ticket():
     if 'user_id' not in session:
-        return redirect(url_for('login'))
+        return redirect(url_for('.login'))
 
     if request.method == 'POST':
         titulo = request.form['titulo']
         descricao = request.form['descricao']
 
         conn = get_db_connection()
-        cursor = conn.cursor()
-
         agora = now_str()
 
-        cursor.execute("""
-            INSERT INTO tickets
-            (titulo, descricao, status, user_id, created_at, is_hidden,
-             last_status_at, last_status_by)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-        """, (
-            titulo,
-            descricao,
-            'Aberto',
-            session['user_id'],
-            agora,
-            0,
-            agora,
-            session['user_id']
-        ))
+        ticket_id = repositorios().tickets.criar(titulo, descricao, session['user_id'], agora)
+
+        registrar_evento(conn, ticket_id, "ticket_created",
+                         {"titulo": titulo, "status": 'Aberto'}, agora)
 
         conn.commit()
-        conn.close()
 
         flash("Chamado criado com sucesso!", "success")
-        return redirect(url_for('dashboard'))
+        return redirect(url_for('.dashboard'))
 
     return render_template('create_ticket.html')
 
 
 # ============================================================
-# INICIAR ATENDIMENTO
+# MUDANÇA DE STATUS (UM TICKET OU VÁRIOS DE UMA VEZ)
 # ============================================================
-@app.route('/start-ticket/<int:ticket_id>')
-def start_ticket(ticket_id):
-    if session.get('nivel') not in [1, 2]:
-        flash("Você não tem permissão para iniciar atendimento.", "error")
-        return redirect(url_for('dashboard'))
+#
+# Cada ação = permissão exigida + tipo no log de eventos. O UPDATE
+# (com as travas de status) fica em repositorios.SQL_ACOES_STATUS.
+#
+ACOES_STATUS = {
+    "start": ("iniciar", "ticket_started"),
+    "close": ("fechar", "ticket_closed"),
+    "hide": ("ocultar", "ticket_hidden"),
+}
+
+LOTE_MAX = 500
+
+
+# Status novo de cada ação (payload do ticket_events; ocultar não muda o status)
+STATUS_DEPOIS_DA_ACAO = {
+    "start": 'Em andamento',
+    "close": 'Fechado',
+}
+
+
+def aplicar_acao_status(acao, ticket_ids):
+    """
+    Aplica a ação em todos os ids numa transação só (um executemany,
+    um commit/fsync). Retorna {ticket_id: "ok" | "nao_encontrado" | "nao_permitido"}.
+
+    O lock de escrita vem antes de ler os tickets (BEGIN IMMEDIATE no
+    SQLite, SELECT ... FOR UPDATE no PostgreSQL): ninguém muda o status
+    entre a checagem e o UPDATE, então o resultado por id é o que de
+    fato aconteceu.
+    """
+    permissao, tipo_evento = ACOES_STATUS[acao]
+    ticket_ids = list(dict.fromkeys(ticket_ids))
+    resultados = {}
+    alterados = []
 
     conn = get_db_connection()
-    cursor = conn.cursor()
+    tickets = repositorios().tickets
+    tickets.travar_para_escrita()
+    try:
+        for ticket_id in ticket_ids:
+            esquecer_acesso_ticket(ticket_id)
+
+        acessos = resolver_acesso_tickets(ticket_ids, travar=True)
+
+        # Só a permissão da própria ação, como nas rotas de sempre: o
+        # atendente fecha/oculta chamado de outro atendente mesmo sem
+        # poder "ver" (fila dele = abertos + os seus)
+        for ticket_id, (ticket, permissoes) in acessos.items():
+            if not ticket:
+                resultados[ticket_id] = "nao_encontrado"
+            elif not permissoes[permissao]:
+                resultados[ticket_id] = "nao_permitido"
+            else:
+                resultados[ticket_id] = "ok"
+                alterados.append(ticket)
 
-    agora = now_str()
+        agora = now_str()
+        tickets.aplicar_acao(acao, [ticket["id"] for ticket in alterados], session['user_id'], agora)
 
-    cursor.execute("""
-        UPDATE tickets
-        SET status = ?,
-            attendant_id = ?,
-            started_at = ?,
-            last_status_at = ?,
-            last_status_by = ?
-        WHERE id = ?
-          AND status = 'Aberto'
-          AND is_hidden = 0
-    """, (
-        'Em andamento',
-        session['user_id'],
-        agora,
-        agora,
-        session['user_id'],
-        ticket_id
-    ))
+        novo_status = STATUS_DEPOIS_DA_ACAO.get(acao)
+        registrar_eventos(conn, [
+            (ticket["id"], tipo_evento,
+             {"status": novo_status, "antes": ticket["status"]} if novo_status else {})
+            for ticket in alterados
+        ], agora)
 
-    conn.commit()
-    conn.close()
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+    for ticket in alterados:
+        esquecer_acesso_ticket(ticket["id"])
+
+    return resultados
+
+
+# ============================================================
+# INICIAR ATENDIMENTO
+# ============================================================
+@bp.route('/start-ticket/<int:ticket_id>')
+def start_ticket(ticket_id):
+    if session.get('nivel') not in [1, 2]:
+        flash("Você não tem permissão para iniciar atendimento.", "error")
+        return redirect(url_for('.dashboard'))
+
+    if aplicar_acao_status("start", [ticket_id])[ticket_id] != "ok":
+        flash(f"Chamado Nº: {ticket_id} não pode ser iniciado.", "error")
+        return redirect(url_for('.dashboard'))
 
     flash(f"Chamado Nº: {ticket_id} iniciado com sucesso!", "success")
-    return redirect(url_for('dashboard'))
+    return redirect(url_for('.dashboard'))
 
 
 # ============================================================
 # FECHAR CHAMADO
 # ============================================================
-@app.route('/close-ticket/<int:ticket_id>')
+@bp.route('/close-ticket/<int:ticket_id>')
 def close_ticket(ticket_id):
     if session.get('nivel') not in [1, 2]:
         flash("Você não tem permissão para fechar chamado.", "error")
-        return redirect(url_for('dashboard'))
-
-    conn = get_db_connection()
-    cursor = conn.cursor()
+        return redirect(url_for('.dashboard'))
 
-    agora = now_str()
-
-    cursor.execute("""
-        UPDATE tickets
-        SET status = ?,
-            closed_at = ?,
-            last_status_at = ?,
-            last_status_by = ?
-        WHERE id = ?
-          AND status = 'Em andamento'
-          AND is_hidden = 0
-    """, (
-        'Fechado',
-        agora,
-        agora,
-        session['user_id'],
-        ticket_id
-    ))
-
-    conn.commit()
-    conn.close()
+    if aplicar_acao_status("close", [ticket_id])[ticket_id] != "ok":
+        flash(f"Chamado Nº: {ticket_id} não pode ser fechado.", "error")
+        return redirect(url_for('.dashboard'))
 
     flash(f"Chamado Nº: {ticket_id} fechado com sucesso!", "success")
-    return redirect(url_for('dashboard'))
+    return redirect(url_for('.dashboard'))
 
 
 # ============================================================
 # OCULTAR CHAMADO (SOFT DELETE)
 # ============================================================
-@app.route('/hide-ticket/<int:ticket_id>')
+@bp.route('/hide-ticket/<int:ticket_id>')
 def hide_ticket(ticket_id):
     if session.get('nivel') not in [1, 2]:
         flash("Você não tem permissão para ocultar chamados.", "error")
-        return redirect(url_for('dashboard'))
-
-    conn = get_db_connection()
-    cursor = conn.cursor()
-
-    agora = now_str()
+        return redirect(url_for('.dashboard'))
 
-    cursor.execute("""
-        UPDATE tickets
-        SET is_hidden = 1,
-            hidden_by = ?,
-            hidden_at = ?
-        WHERE id = ?
-          AND status = 'Fechado'
-          AND is_hidden = 0
-    """, (
-        session['user_id'],
-        agora,
-        ticket_id
-    ))
-
-    conn.commit()
-    conn.close()
+    if aplicar_acao_status("hide", [ticket_id])[ticket_id] != "ok":
+        flash(f"Chamado Nº: {ticket_id} não pode ser ocultado.", "error")
+        return redirect(url_for('.dashboard'))
 
     flash(f"Chamado Nº: {ticket_id} foi ocultado.", "warning")
-    return redirect(url_for('dashboard'))
+    return redirect(url_for('.dashboard'))
 
 
 # ============================================================
 # DESOCULTAR (ADMIN)
 # ============================================================
-@app.route('/unhide-ticket/<int:ticket_id>')
+@bp.route('/unhide-ticket/<int:ticket_id>')
 def unhide_ticket(ticket_id):
     if 'user_id' not in session:
-        return redirect(url_for('login'))
+        return redirect(url_for('.login'))
 
     if session.get('nivel') != 2:
         flash("Apenas administradores podem desocultar.", "error")
-        return redirect(url_for('dashboard'))
+        return redirect(url_for('.dashboard'))
+
+    ticket, permissoes = resolver_acesso_ticket(ticket_id)
+
+    if not ticket or not permissoes["desocultar"]:
+        flash(f"Chamado Nº: {ticket_id} não está ocultado.", "warning")
+        return redirect(url_for('.dashboard'))
 
     conn = get_db_connection()
-    cursor = conn.cursor()
 
-    cursor.execute("""
-        UPDATE tickets
-        SET is_hidden = 0,
-            hidden_by = NULL,
-            hidden_at = NULL
-        WHERE id = ?
-    """, (ticket_id,))
+    repositorios().tickets.desocultar(ticket_id)
+    registrar_evento(conn, ticket_id, "ticket_unhidden")
 
     conn.commit()
-    conn.close()
+    esquecer_acesso_ticket(ticket_id)
 
     flash(f"Chamado Nº: {ticket_id} foi desocultado.", "success")
-    return redirect(url_for('dashboard'))
+    return redirect(url_for('.dashboard'))
 
 
 # ============================================================
-# DETALHE DO CHAMADO + MARCAR COMO VISTO AUTOMATICAMENTE
+# ACESSO AO TICKET (UMA CONSULTA + PERMISSÕES, MEMORIZADO NO REQUEST)
 # ============================================================
-@app.route('/ticket/<int:ticket_id>')
-def ticket_detail(ticket_id):
-    if 'user_id' not in session:
-        return redirect(url_for('login'))
+def calcular_permissoes(ticket, nivel, user_id):
+    """
+    O que o usuário logado pode fazer com o ticket:
+    ver / comentar / iniciar / fechar / ocultar / desocultar
+    """
+    oculto = ticket["is_hidden"] == 1
+    equipe = nivel in [1, 2]
 
-    nivel = session.get('nivel')
+    if nivel == 2:
+        ver = True
+        comentar = True
+    elif oculto:
+        # Ocultado: só admin
+        ver = False
+        comentar = False
+    elif nivel == 0:
+        # Usuário vê e comenta no próprio ticket
+        ver = ticket["user_id"] == user_id
+        comentar = ver
+    elif nivel == 1:
+        # Atendente vê a fila aberta + os seus; comenta se for o responsável
+        ver = ticket["status"] == 'Aberto' or ticket["attendant_id"] == user_id
+        comentar = ticket["attendant_id"] == user_id
+    else:
+        ver = False
+        comentar = False
 
-    conn = get_db_connection()
-    cursor = conn.cursor()
-
-    cursor.execute("""
-        SELECT
-            tickets.id,
-            tickets.status,
-            tickets.is_hidden,
-            tickets.user_id,
-            tickets.attendant_id,
-            attendant.username AS attendant_name
-        FROM tickets
-        LEFT JOIN users AS attendant ON tickets.attendant_id = attendant.id
-        WHERE tickets.id = ?
-    """, (ticket_id,))
-    info = cursor.fetchone()
-
-    if not info:
-        conn.close()
-        flash(f"Chamado Nº: {ticket_id} não encontrado.", "error")
-        return redirect(url_for('dashboard'))
+    return {
+        "ver": ver,
+        "comentar": comentar,
+        "iniciar": equipe and not oculto and ticket["status"] == 'Aberto',
+        "fechar": equipe and not oculto and ticket["status"] == 'Em andamento',
+        "ocultar": equipe and not oculto and ticket["status"] == 'Fechado',
+        "desocultar": nivel == 2 and oculto,
+    }
 
-    # Se ocultado:
-    if info["is_hidden"] == 1 and nivel != 2:
-        conn.close()
-        flash(f"Chamado Nº: {ticket_id} não encontrado.", "error")
-        return redirect(url_for('dashboard'))
 
-    # Carrega ticket com permissões
-    ticket = None
+def resolver_acesso_tickets(ticket_ids, travar=False):
+    """
+    Igual a resolver_acesso_ticket, para vários ids numa consulta só.
+    Retorna {ticket_id: (ticket, permissoes)}.
+    travar=True: os tickets vão ser alterados nesta transação.
+    """
+    memo = g.setdefault("acesso_tickets", {})
+    faltando = [ticket_id for ticket_id in ticket_ids if ticket_id not in memo]
 
-    if nivel == 2:
-        cursor.execute("""
-            SELECT
-                tickets.id,
-                tickets.titulo,
-                tickets.descricao,
-                tickets.status,
-                tickets.created_at,
-                tickets.started_at,
-                tickets.closed_at,
-                tickets.is_hidden,
-                creator.username AS creator_username,
-                attendant.username AS attendant_username,
-                hider.username AS hider_username,
-                tickets.hidden_at
-            FROM tickets
-            JOIN users AS creator ON tickets.user_id = creator.id
-            LEFT JOIN users AS attendant ON tickets.attendant_id = attendant.id
-            LEFT JOIN users AS hider ON tickets.hidden_by = hider.id
-            WHERE tickets.id = ?
-        """, (ticket_id,))
-        ticket = cursor.fetchone()
+    if faltando:
+        # Não achou na tabela quente: o repositório procura no arquivo
+        linhas = repositorios().tickets.acesso(faltando, session.get('user_id'), travar)
 
-    elif nivel == 0:
-        cursor.execute("""
-            SELECT
-                tickets.id,
-                tickets.titulo,
-                tickets.descricao,
-                tickets.status,
-                tickets.created_at,
-                tickets.started_at,
-                tickets.closed_at,
-                tickets.is_hidden,
-                creator.username AS creator_username,
-                attendant.username AS attendant_username,
-                hider.username AS hider_username,
-                tickets.hidden_at
-            FROM tickets
-            JOIN users AS creator ON tickets.user_id = creator.id
-            LEFT JOIN users AS attendant ON tickets.attendant_id = attendant.id
-            LEFT JOIN users AS hider ON tickets.hidden_by = hider.id
-            WHERE tickets.id = ?
-              AND tickets.user_id = ?
-              AND tickets.is_hidden = 0
-        """, (ticket_id, session['user_id']))
-        ticket = cursor.fetchone()
+        for ticket_id in faltando:
+            memo[ticket_id] = (None, None)
 
-    else:
-        cursor.execute("""
-            SELECT
-                tickets.id,
-                tickets.titulo,
-                tickets.descricao,
-                tickets.status,
-                tickets.created_at,
-                tickets.started_at,
-                tickets.closed_at,
-                tickets.is_hidden,
-                creator.username AS creator_username,
-                attendant.username AS attendant_username,
-                hider.username AS hider_username,
-                tickets.hidden_at
-            FROM tickets
-            JOIN users AS creator ON tickets.user_id = creator.id
-            LEFT JOIN users AS attendant ON tickets.attendant_id = attendant.id
-            LEFT JOIN users AS hider ON tickets.hidden_by = hider.id
-            WHERE tickets.id = ?
-              AND tickets.is_hidden = 0
-              AND (
-                    tickets.status = 'Aberto'
-                    OR tickets.attendant_id = ?
-                  )
-        """, (ticket_id, session['user_id']))
-        ticket = cursor.fetchone()
+        for ticket in linhas:
+            permissoes = calcular_permissoes(ticket, session.get('nivel'), session.get('user_id'))
 
-    if not ticket:
-        conn.close()
-        flash(f"Chamado Nº: {ticket_id} não encontrado.", "error")
-        return redirect(url_for('dashboard'))
+            # Arquivado: só leitura
+            if ticket["arquivado"]:
+                permissoes = {acao: acao == "ver" and pode for acao, pode in permissoes.items()}
+
+            memo[ticket["id"]] = (ticket, permissoes)
+
+    return {ticket_id: memo[ticket_id] for ticket_id in ticket_ids}
+
+
+def resolver_acesso_ticket(ticket_id):
+    """
+    Busca o ticket UMA vez (com criador/atendente/quem ocultou e a
+    leitura do usuário logado) e devolve (ticket, permissoes).
+    Ticket inexistente -> (None, None).
+
+    O resultado fica guardado em flask.g durante o request, então
+    detalhe, comentário e mudanças de status não repetem a consulta.
+    Quem altera o ticket deve chamar esquecer_acesso_ticket depois.
+    """
+    return resolver_acesso_tickets([ticket_id])[ticket_id]
 
-    # Comentários
-    cursor.execute("""
-        SELECT
-            tc.id,
-            tc.comment,
-            tc.created_at,
-            u.username AS author
-        FROM ticket_comments tc
-        JOIN users u ON tc.user_id = u.id
-        WHERE tc.ticket_id = ?
-        ORDER BY tc.id ASC
-    """, (ticket_id,))
-    comments = cursor.fetchall()
 
-    conn.close()
+def esquecer_acesso_ticket(ticket_id):
+    g.setdefault("acesso_tickets", {}).pop(ticket_id, None)
 
-    # ✅ Marca como visto só pra quem abriu (não afeta os outros)
-    marcar_ticket_como_visto(ticket_id)
 
-    return render_template('ticket_detail.html', ticket=ticket, comments=comments)
+def carregar_ticket_detalhe(ticket_id):
+    """
+    Retorna o ticket se o usuário logado pode vê-lo, ou None
+    (não existe / sem permissão).
+    """
+    ticket, permissoes = resolver_acesso_ticket(ticket_id)
+    if not ticket or not permissoes["ver"]:
+        return None
+    return ticket
 
 
 # ============================================================
-# PERMISSÃO DE COMENTAR
+# COMENTÁRIOS PAGINADOS (MAIS NOVOS PRIMEIRO, CURSOR POR id)
 # ============================================================
-def pode_comentar(ticket_id):
-    nivel = session.get("nivel")
-    user_id = session.get("user_id")
+def carregar_comentarios(ticket_id, before_id=None, after_id=None, arquivado=False,
+                         repos=None):
+    """
+    Retorna (comentarios, tem_mais), com os comentários sempre em ordem
+    crescente (como aparecem no chat) e no máximo COMMENTS_PER_PAGE:
+    - sem cursor: os mais recentes; tem_mais = existem mais antigos
+    - before_id: os anteriores a esse id; tem_mais = existem mais antigos
+    - after_id: os posteriores a esse id; tem_mais = existem mais novos
+
+    arquivado=True lê de ticket_comments_arquivo.
+    repos: repositórios de outra conexão (leituras em paralelo do asgi.py).
+    """
+    repos = repos or repositorios()
+    comentarios = repos.comentarios.pagina(ticket_id, COMMENTS_PER_PAGE,
+                                           before_id, after_id, arquivado)
 
-    conn = get_db_connection()
-    cursor = conn.cursor()
-
-    cursor.execute("""
-        SELECT
-            id,
-            user_id,
-            attendant_id,
-            is_hidden
-        FROM tickets
-        WHERE id = ?
-    """, (ticket_id,))
-    t = cursor.fetchone()
-    conn.close()
-
-    if not t:
-        return False
+    if after_id is not None:
+        return comentarios[:COMMENTS_PER_PAGE], len(comentarios) > COMMENTS_PER_PAGE
 
-    # Admin pode comentar em qualquer
-    if nivel == 2:
-        return True
+    tem_mais = len(comentarios) > COMMENTS_PER_PAGE
+    comentarios = comentarios[:COMMENTS_PER_PAGE]
+    comentarios.reverse()
 
-    # Ocultado: só admin
-    if t["is_hidden"] == 1:
-        return False
+    return comentarios, tem_mais
 
-    # Usuário comenta no próprio ticket
-    if nivel == 0:
-        return t["user_id"] == user_id
 
-    # Atendente comenta se for o responsável
-    if nivel == 1:
-        return t["attendant_id"] == user_id
+# ============================================================
+# DETALHE DO CHAMADO + MARCAR COMO VISTO AUTOMATICAMENTE
+# ============================================================
+@bp.route('/ticket/<int:ticket_id>')
+def ticket_detail(ticket_id):
+    if 'user_id' not in session:
+        return redirect(url_for('.login'))
 
-    return False
+    ticket, permissoes = resolver_acesso_ticket(ticket_id)
+
+    if not ticket or not permissoes["ver"]:
+        flash(f"Chamado Nº: {ticket_id} não encontrado.", "error")
+        return redirect(url_for('.dashboard'))
+
+    # Comentários: só a página mais recente (o resto vem pela API)
+    comments, has_older_comments = carregar_comentarios(ticket_id, arquivado=ticket["arquivado"])
+
+    # Linha do tempo (abertura, início, fechamento, ocultação...)
+    eventos = carregar_eventos(ticket_id, sem_comentarios=True)
+
+    # ✅ Marca como visto só pra quem abriu (não afeta os outros),
+    # e só se tinha novidade desde a última visita (arquivado: nunca tem)
+    if not ticket["arquivado"]:
+        marcar_ticket_como_visto(ticket)
+
+    return render_template('ticket_detail.html', ticket=ticket, permissoes=permissoes,
+                           comments=comments, has_older_comments=has_older_comments,
+                           eventos=eventos)
 
 
 # ============================================================
 # ADICIONAR COMENTÁRIO
 # ============================================================
-@app.route("/ticket/<int:ticket_id>/comment", methods=["POST"])
+@bp.route("/ticket/<int:ticket_id>/comment", methods=["POST"])
 def add_comment(ticket_id):
     if "user_id" not in session:
-        return redirect(url_for("login"))
+        return redirect(url_for(".login"))
 
     comment = request.form.get("comment", "").strip()
 
     if not comment:
         flash("Digite uma mensagem antes de enviar.", "warning")
-        return redirect(url_for("ticket_detail", ticket_id=ticket_id))
+        return redirect(url_for(".ticket_detail", ticket_id=ticket_id))
 
-    if not pode_comentar(ticket_id):
+    ticket, permissoes = resolver_acesso_ticket(ticket_id)
+
+    if not ticket or not permissoes["comentar"]:
         flash(f"Chamado Nº: {ticket_id} não permite comentário.", "error")
-        return redirect(url_for("dashboard"))
+        return redirect(url_for(".dashboard"))
 
     conn = get_db_connection()
-    cursor = conn.cursor()
-
-    cursor.execute("""
-        INSERT INTO ticket_comments (ticket_id, user_id, comment, created_at)
-        VALUES (?, ?, ?, ?)
-    """, (
-        ticket_id,
-        session["user_id"],
-        comment,
-        now_str()
-    ))
+    agora = now_str()
+
+    comment_id = repositorios().comentarios.criar(ticket_id, session["user_id"], comment, agora)
+    registrar_evento(conn, ticket_id, "comment_added", {"comment_id": comment_id}, agora)
 
     conn.commit()
-    conn.close()
+    esquecer_acesso_ticket(ticket_id)
 
     flash(f"Comentário enviado no Chamado Nº: {ticket_id}.", "success")
-    return redirect(url_for("ticket_detail", ticket_id=ticket_id))
+    return redirect(url_for(".ticket_detail", ticket_id=ticket_id))
 
 
 # ============================================================
 # BUSCAR CHAMADO PELO NÚMERO
 # ============================================================
-@app.route('/buscar-ticket', methods=['GET'])
+@bp.route('/buscar-ticket', methods=['GET'])
 def buscar_ticket():
     if 'user_id' not in session:
-        return redirect(url_for('login'))
-
-    ticket_id = request.args.get('ticket_id', '').strip()
+        return redirect(url_for('.login'))
 
-    if not ticket_id:
-        flash("Digite o número do chamado.", "warning")
-        return redirect(url_for('dashboard'))
+    busca = request.args.get('ticket_id', '').strip()
 
-    if not ticket_id.isdigit():
-        flash("Digite apenas o número do chamado. Ex: 12", "error")
-        return redirect(url_for('dashboard'))
+    if not busca:
+        flash("Digite o número do chamado ou um texto para buscar.", "warning")
+        return redirect(url_for('.dashboard'))
 
-    ticket_id = int(ticket_id)
+    # Texto: busca por palavras (título, descrição e comentários)
+    if not busca.isdigit():
+        resultados = buscar_por_texto(busca)
+        return render_template('busca.html', busca=busca, resultados=resultados)
 
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    ticket_id = int(busca)
 
-    cursor.execute("""
-        SELECT id, is_hidden
-        FROM tickets
-        WHERE id = ?
-    """, (ticket_id,))
-    ticket = cursor.fetchone()
-    conn.close()
+    ticket = repositorios().tickets.localizar(ticket_id)
 
     if not ticket:
         flash(f"Chamado Nº: {ticket_id} não encontrado.", "error")
-        return redirect(url_for('dashboard'))
+        return redirect(url_for('.dashboard'))
 
     if ticket["is_hidden"] == 1 and session.get("nivel") != 2:
         flash(f"Chamado Nº: {ticket_id} não encontrado.", "error")
-        return redirect(url_for('dashboard'))
+        return redirect(url_for('.dashboard'))
 
-    return redirect(url_for('ticket_detail', ticket_id=ticket_id))
+    return redirect(url_for('.ticket_detail', ticket_id=ticket_id))
 
 
 # ============================================================
-# PAGINAÇÃO
+# BUSCA POR TEXTO (SQLite: FTS5 / PostgreSQL: to_tsvector)
 # ============================================================
-def paginar_por_status(query_base, params_base, page):
-    offset = (page - 1) * PER_PAGE
+def buscar_por_texto(texto):
+    """
+    Título, descrição e comentários, só do que o perfil pode ver
+    (repositorios.montar_sql_busca / RepositorioTicketsPostgres).
+    """
+    return repositorios().tickets.buscar_texto(session.get('nivel'), session.get('user_id'),
+                                               texto, BUSCA_LIMITE)
 
-    conn = get_db_connection()
-    cursor = conn.cursor()
 
-    cursor.execute(f"SELECT COUNT(*) AS total FROM ({query_base})", params_base)
-    total = cursor.fetchone()['total']
+# ============================================================
+# PAGINAÇÃO (KEYSET / CURSOR POR tickets.id)
+# ============================================================
+#
+# Em vez de COUNT(*) + OFFSET (que fica mais caro a cada página),
+# cada coluna pagina pelo id do último/primeiro card mostrado:
+#
+# - <coluna>_before_id=N  -> próxima página (tickets com id < N)
+# - <coluna>_after_id=N   -> página anterior (tickets com id > N)
+#
+# Buscamos PER_PAGE + 1 linhas: se vier a linha extra, existe
+# mais uma página naquela direção. Página 50 custa igual à página 1.
+#
+def fechar_pagina(itens, before_id=None, after_id=None):
+    """
+    Recebe as até PER_PAGE + 1 linhas de uma coluna e retorna
+    (itens, prev_id, next_id):
+    - itens: no máximo PER_PAGE tickets, do mais novo pro mais antigo
+    - prev_id: valor de after_id para a página anterior (None = não tem)
+    - next_id: valor de before_id para a próxima página (None = não tem)
+    """
+    por_pagina = current_app.config["PER_PAGE"]
+    tem_mais = len(itens) > por_pagina
+    itens = itens[:por_pagina]
 
-    cursor.execute(query_base + " ORDER BY tickets.id DESC LIMIT ? OFFSET ?",
-                   params_base + (PER_PAGE, offset))
-    itens = cursor.fetchall()
+    if after_id is not None:
+        # Veio em ordem crescente: desvira para mostrar do mais novo ao mais antigo
+        itens.reverse()
+        prev_id = itens[0]["id"] if tem_mais else None
+        next_id = itens[-1]["id"] if itens else after_id + 1
+        return itens, prev_id, next_id
 
-    conn.close()
+    next_id = itens[-1]["id"] if tem_mais else None
 
-    has_prev = page > 1
-    has_next = (offset + PER_PAGE) < total
+    if before_id is None:
+        prev_id = None
+    else:
+        prev_id = itens[0]["id"] if itens else before_id - 1
+
+    return itens, prev_id, next_id
 
-    return itens, has_prev, has_next
+
+def ler_cursor(coluna):
+    """
+    Lê <coluna>_before_id / <coluna>_after_id da URL.
+    """
+    before_id = request.args.get(f"{coluna}_before_id", type=int)
+    after_id = request.args.get(f"{coluna}_after_id", type=int)
+    return before_id, after_id
+
+
+@bp.app_template_global()
+def url_pagina(coluna, before_id=None, after_id=None):
+    """
+    Monta o link de paginação de UMA coluna, mantendo o cursor das outras.
+    """
+    args = request.args.to_dict()
+    args.pop(f"{coluna}_before_id", None)
+    args.pop(f"{coluna}_after_id", None)
+
+    if before_id is not None:
+        args[f"{coluna}_before_id"] = before_id
+    if after_id is not None:
+        args[f"{coluna}_after_id"] = after_id
+
+    return url_for(request.endpoint, **args)
 
 
 # ============================================================
-# MEUS CHAMADOS (USUÁRIO)
+# CARREGAR BOARD INTEIRO (UMA QUERY PARA TODAS AS COLUNAS)
 # ============================================================
-@app.route('/meus-chamados')
-def meus_chamados():
-    if 'user_id' not in session:
-        return redirect(url_for('login'))
+def carregar_board(nivel, user_id):
+    """
+    Carrega todas as colunas do kanban do perfil com UMA query para os cards
+    e UMA para os contadores 🔴, e devolve o contexto pronto para o template:
+    {coluna: [cards], coluna_prev_id: ..., coluna_next_id: ...}
+    """
+    colunas = colunas_do_board(nivel, user_id)
+    cursores = {coluna: ler_cursor(coluna) for coluna in colunas}
 
-    if session.get('nivel') != 0:
-        return redirect(url_for('dashboard'))
-
-    abertos_page = int(request.args.get('abertos_page', 1))
-    andamento_page = int(request.args.get('andamento_page', 1))
-    fechados_page = int(request.args.get('fechados_page', 1))
-
-    base_select = """
-        SELECT
-            tickets.id,
-            tickets.titulo,
-            tickets.descricao,
-            tickets.status,
-            tickets.created_at,
-            tickets.started_at,
-            tickets.closed_at,
-            tickets.is_hidden,
-            creator.username AS creator_username,
-            attendant.username AS attendant_username,
-
-            tickets.last_status_at,
-            tickets.last_status_by,
-            tickets.user_seen_status_at,
-            tickets.attendant_seen_status_at,
-            tickets.admin_seen_status_at
-        FROM tickets
-        JOIN users AS creator ON tickets.user_id = creator.id
-        LEFT JOIN users AS attendant ON tickets.attendant_id = attendant.id
-        WHERE tickets.is_hidden = 0
-          AND tickets.user_id = ?
-    """
-
-    abertos, abertos_has_prev, abertos_has_next = paginar_por_status(
-        base_select + " AND tickets.status = 'Aberto'",
-        (session['user_id'],),
-        abertos_page
-    )
+    # repositorios.montar_sql_board: UNION ALL das páginas de cada coluna
+    linhas = repositorios().tickets.board(colunas, cursores, current_app.config["PER_PAGE"])
+
+    return contexto_do_board(colunas, cursores, linhas)
 
-    andamento, andamento_has_prev, andamento_has_next = paginar_por_status(
-        base_select + " AND tickets.status = 'Em andamento'",
-        (session['user_id'],),
-        andamento_page
-    )
 
-    fechados, fechados_has_prev, fechados_has_next = paginar_por_status(
-        base_select + " AND tickets.status = 'Fechado'",
-        (session['user_id'],),
-        fechados_page
+def contexto_do_board(colunas, cursores, linhas):
+    """
+    Separa as linhas do board por coluna, fecha a página de cada uma e
+    busca os 🔴. Também usado pelo asgi.py, que lê as colunas em paralelo.
+    """
+    por_coluna = {coluna: [] for coluna in colunas}
+    for linha in linhas:
+        por_coluna[linha["coluna"]].append(linha)
+
+    paginas = {}
+    for coluna, itens in por_coluna.items():
+        paginas[coluna] = fechar_pagina(itens, *cursores[coluna])
+
+    # 🔴 Contadores de todos os cards visíveis do board de uma vez
+    unread_counts = get_unread_comment_counts(
+        t["id"] for itens, _, _ in paginas.values() for t in itens
     )
 
-    return render_template(
-        'meus_chamados_kanban.html',
+    contexto = {}
+    for coluna, (itens, prev_id, next_id) in paginas.items():
+        contexto[coluna] = preparar_lista_com_badges(itens, unread_counts)
+        contexto[f"{coluna}_prev_id"] = prev_id
+        contexto[f"{coluna}_next_id"] = next_id
 
-        abertos=preparar_lista_com_badges(abertos),
-        andamento=preparar_lista_com_badges(andamento),
-        fechados=preparar_lista_com_badges(fechados),
+    return contexto
 
-        abertos_page=abertos_page,
-        abertos_has_prev=abertos_has_prev,
-        abertos_has_next=abertos_has_next,
 
-        andamento_page=andamento_page,
-        andamento_has_prev=andamento_has_prev,
-        andamento_has_next=andamento_has_next,
+# ============================================================
+# MEUS CHAMADOS (USUÁRIO)
+# ============================================================
+@bp.route('/meus-chamados')
+def meus_chamados():
+    if 'user_id' not in session:
+        return redirect(url_for('.login'))
 
-        fechados_page=fechados_page,
-        fechados_has_prev=fechados_has_prev,
-        fechados_has_next=fechados_has_next
+    if session.get('nivel') != 0:
+        return redirect(url_for('.dashboard'))
+
+    return render_template(
+        'meus_chamados_kanban.html',
+        **carregar_board(0, session['user_id'])
     )
 
 
 # ============================================================
 # FILA (ATENDENTE)
 # ============================================================
-@app.route('/fila')
+@bp.route('/fila')
 def fila():
     if 'user_id' not in session:
-        return redirect(url_for('login'))
+        return redirect(url_for('.login'))
 
     if session.get('nivel') != 1:
-        return redirect(url_for('dashboard'))
-
-    abertos_page = int(request.args.get('abertos_page', 1))
-    andamento_page = int(request.args.get('andamento_page', 1))
-    fechados_page = int(request.args.get('fechados_page', 1))
-
-    base_select = """
-        SELECT
-            tickets.id,
-            tickets.titulo,
-            tickets.descricao,
-            tickets.status,
-            tickets.created_at,
-            tickets.started_at,
-            tickets.closed_at,
-            tickets.is_hidden,
-            creator.username AS creator_username,
-            attendant.username AS attendant_username,
-
-            tickets.last_status_at,
-            tickets.last_status_by,
-            tickets.user_seen_status_at,
-            tickets.attendant_seen_status_at,
-            tickets.admin_seen_status_at
-        FROM tickets
-        JOIN users AS creator ON tickets.user_id = creator.id
-        LEFT JOIN users AS attendant ON tickets.attendant_id = attendant.id
-        WHERE tickets.is_hidden = 0
-    """
-
-    abertos, abertos_has_prev, abertos_has_next = paginar_por_status(
-        base_select + " AND tickets.status = 'Aberto'",
-        (),
-        abertos_page
-    )
+        return redirect(url_for('.dashboard'))
 
-    andamento, andamento_has_prev, andamento_has_next = paginar_por_status(
-        base_select + " AND tickets.status = 'Em andamento' AND tickets.attendant_id = ?",
-        (session['user_id'],),
-        andamento_page
+    return render_template(
+        'fila_kanban.html',
+        **carregar_board(1, session['user_id'])
     )
 
-    fechados, fechados_has_prev, fechados_has_next = paginar_por_status(
-        base_select + " AND tickets.status = 'Fechado' AND tickets.attendant_id = ?",
-        (session['user_id'],),
-        fechados_page
-    )
+
+# ============================================================
+# ADMIN
+# ============================================================
+@bp.route('/admin')
+def admin():
+    if 'user_id' not in session:
+        return redirect(url_for('.login'))
+
+    if session.get('nivel') != 2:
+        return redirect(url_for('.dashboard'))
 
     return render_template(
-        'fila_kanban.html',
+        'admin_kanban.html',
+        **carregar_board(2, session['user_id'])
+    )
+
 
-        abertos=preparar_lista_com_badges(abertos),
-        andamento=preparar_lista_com_badges(andamento),
-        fechados=preparar_lista_com_badges(fechados),
+# ============================================================
+# ESTATÍSTICAS (ADMIN) - LIDAS DO ROLLUP ticket_stats_dia
+# ============================================================
+#
+# ticket_stats_dia já vem agregada por dia x atendente x status
+# (triggers da migração 009), então a página soma algumas centenas
+# de linhas em vez de varrer os tickets.
+#
+@bp.route('/admin/stats')
+def admin_stats():
+    if 'user_id' not in session:
+        return redirect(url_for('.login'))
+
+    if session.get('nivel') != 2:
+        return redirect(url_for('.dashboard'))
 
-        abertos_page=abertos_page,
-        abertos_has_prev=abertos_has_prev,
-        abertos_has_next=abertos_has_next,
+    dias = request.args.get('dias', STATS_DIAS_PADRAO, type=int)
+    dias = max(1, min(dias, 3650))
 
-        andamento_page=andamento_page,
-        andamento_has_prev=andamento_has_prev,
-        andamento_has_next=andamento_has_next,
+    # Primeiro dia que entra (dia é "AAAA-MM-DD" nos dois bancos)
+    desde = (datetime.now() - timedelta(days=dias - 1)).strftime('%Y-%m-%d')
 
-        fechados_page=fechados_page,
-        fechados_has_prev=fechados_has_prev,
-        fechados_has_next=fechados_has_next
-    )
+    tickets = repositorios().tickets
+
+    # Por atendente: iniciados/fechados e tempos médios
+    por_atendente = tickets.estatisticas_por_atendente(desde)
+
+    # Por dia: criados / iniciados / fechados
+    por_dia = tickets.estatisticas_por_dia(desde)
+
+    return render_template('admin_stats.html', dias=dias,
+                           por_atendente=por_atendente, por_dia=por_dia)
 
 
 # ============================================================
-# ADMIN
+# API JSON (BOARDS E DETALHE) COM ETAG / 304
 # ============================================================
-@app.route('/admin')
-def admin():
+#
+# Para os painéis que ficam se atualizando sozinhos (TVs/monitores):
+# a resposta leva um ETag forte; se o cliente mandar If-None-Match
+# com o mesmo valor, volta 304 sem corpo (e sem montar o JSON).
+#
+# Abrir o ticket por aqui NÃO marca como visto.
+#
+PERFIS_API = {'usuario': 0, 'atendente': 1, 'admin': 2}
+
+
+def gerar_etag(*partes):
+    return hashlib.sha1(repr(partes).encode('utf-8')).hexdigest()
+
+
+def resposta_json_condicional(etag, montar_payload):
+    """
+    304 se o cliente já tem essa versão; senão monta o payload e responde 200.
+    """
+    if request.if_none_match.contains(etag):
+        resposta = Response(status=304)
+        resposta.set_etag(etag)
+        return resposta
+
+    resposta = jsonify(montar_payload())
+    resposta.set_etag(etag)
+    return resposta
+
+
+def card_json(item):
+    t = item["ticket"]
+    return {
+        "id": t["id"],
+        "titulo": t["titulo"],
+        "status": t["status"],
+        "is_hidden": t["is_hidden"],
+        "created_at": t["created_at"],
+        "creator": t["creator_username"],
+        "attendant": t["attendant_username"],
+        "unread_count": item["unread_count"],
+        "has_status_update": item["has_status_update"],
+    }
+
+
+def ticket_json(t):
+    """
+    Campos do /api/tickets/<id>. seen_* são da leitura de quem pediu
+    (a API não marca como visto).
+    """
+    return {
+        "id": t["id"],
+        "titulo": t["titulo"],
+        "descricao": t["descricao"],
+        "status": t["status"],
+        "is_hidden": t["is_hidden"],
+        "arquivado": t["arquivado"],
+        "created_at": t["created_at"],
+        "started_at": t["started_at"],
+        "closed_at": t["closed_at"],
+        "hidden_at": t["hidden_at"],
+        "creator": t["creator_username"],
+        "attendant": t["attendant_username"],
+        "hidden_by": t["hider_username"],
+        "last_status_at": t["last_status_at"],
+        "last_comment_id": t["last_comment_id"],
+        "comment_count": t["comment_count"],
+        "seen_comment_id": t["seen_comment_id"],
+        "seen_status_at": t["seen_status_at"],
+    }
+
+
+@bp.route('/api/boards/<perfil>')
+def api_board(perfil):
+    if 'user_id' not in session:
+        abort(401)
+
+    nivel = PERFIS_API.get(perfil)
+    if nivel is None:
+        abort(404)
+    if nivel != session.get('nivel'):
+        abort(403)
+
+    user_id = session['user_id']
+
+    # Versão barata do que pode mudar o board (último evento, totais,
+    # leituras do usuário) + a página pedida: 304 sai ANTES de rodar as
+    # queries das colunas e dos 🔴. Se algo mudar entre a versão e o
+    # board, o cliente só recebe de novo no próximo pedido.
+    etag = gerar_etag(perfil, user_id, current_app.config["PER_PAGE"],
+                      sorted(request.args.items(multi=True)),
+                      repositorios().tickets.versao_do_board(user_id))
+
+    def montar_payload():
+        contexto = carregar_board(nivel, user_id)
+        colunas = list(colunas_do_board(nivel, user_id))
+
+        return {
+            "perfil": perfil,
+            "colunas": {
+                coluna: {
+                    "cards": [card_json(item) for item in contexto[coluna]],
+                    "prev_id": contexto[f"{coluna}_prev_id"],
+                    "next_id": contexto[f"{coluna}_next_id"],
+                }
+                for coluna in colunas
+            },
+        }
+
+    return resposta_json_condicional(etag, montar_payload)
+
+
+@bp.route('/api/tickets/<int:ticket_id>')
+def api_ticket(ticket_id):
+    if 'user_id' not in session:
+        abort(401)
+
+    ticket = carregar_ticket_detalhe(ticket_id)
+    if not ticket:
+        abort(404)
+
+    # Tudo o que volta no "ticket" entra no ETag; os comentários mudam
+    # junto com last_comment_id / comment_count
+    dados = ticket_json(ticket)
+    etag = gerar_etag(dados)
+
+    def montar_payload():
+        comments, has_older_comments = carregar_comentarios(ticket_id, arquivado=ticket["arquivado"])
+
+        return {
+            "ticket": dados,
+            "comments": [dict(c) for c in comments],
+            "has_older_comments": has_older_comments,
+        }
+
+    return resposta_json_condicional(etag, montar_payload)
+
+
+@bp.route('/api/tickets/<int:ticket_id>/comments')
+def api_ticket_comments(ticket_id):
+    """
+    Páginas de comentários:
+    - ?before_id=N -> mais antigos que N (botão "mensagens anteriores")
+    - ?after_id=N  -> mais novos que N (o que chegou depois)
+    """
+    if 'user_id' not in session:
+        abort(401)
+
+    ticket = carregar_ticket_detalhe(ticket_id)
+    if not ticket:
+        abort(404)
+
+    before_id = request.args.get('before_id', type=int)
+    after_id = request.args.get('after_id', type=int)
+
+    comments, has_more = carregar_comentarios(ticket_id, before_id, after_id, ticket["arquivado"])
+
+    return jsonify({
+        "comments": [dict(c) for c in comments],
+        "has_more": has_more,
+    })
+
+
+@bp.route('/api/tickets/<int:ticket_id>/events')
+def api_ticket_events(ticket_id):
+    """
+    Linha do tempo de um ticket (ticket_events). ?after_id=N -> só os
+    eventos depois de N (para quem já tem o começo).
+    """
     if 'user_id' not in session:
-        return redirect(url_for('login'))
+        abort(401)
+
+    ticket = carregar_ticket_detalhe(ticket_id)
+    if not ticket:
+        abort(404)
+
+    after_id = request.args.get('after_id', 0, type=int)
 
+    return jsonify({"events": carregar_eventos(ticket_id, after_id)})
+
+
+@bp.route('/api/events')
+def api_events():
+    """
+    Feed único de TODOS os eventos, em ordem de id (só admin): auditoria,
+    integrações e réplicas leem daqui com ?after_id=<último id que viram>.
+    """
+    if 'user_id' not in session:
+        abort(401)
     if session.get('nivel') != 2:
-        return redirect(url_for('dashboard'))
-
-    abertos_page = int(request.args.get('abertos_page', 1))
-    andamento_page = int(request.args.get('andamento_page', 1))
-    fechados_page = int(request.args.get('fechados_page', 1))
-    ocultados_page = int(request.args.get('ocultados_page', 1))
-
-    base_admin = """
-        SELECT
-            tickets.id,
-            tickets.titulo,
-            tickets.descricao,
-            tickets.status,
-            tickets.created_at,
-            tickets.started_at,
-            tickets.closed_at,
-            tickets.is_hidden,
-            creator.username AS creator_username,
-            attendant.username AS attendant_username,
-            hider.username AS hider_username,
-            tickets.hidden_at,
-
-            tickets.last_status_at,
-            tickets.last_status_by,
-            tickets.user_seen_status_at,
-            tickets.attendant_seen_status_at,
-            tickets.admin_seen_status_at
-        FROM tickets
-        JOIN users AS creator ON tickets.user_id = creator.id
-        LEFT JOIN users AS attendant ON tickets.attendant_id = attendant.id
-        LEFT JOIN users AS hider ON tickets.hidden_by = hider.id
-        WHERE 1 = 1
-    """
-
-    abertos, abertos_has_prev, abertos_has_next = paginar_por_status(
-        base_admin + " AND tickets.status = 'Aberto' AND tickets.is_hidden = 0",
-        (),
-        abertos_page
-    )
+        abort(403)
 
-    andamento, andamento_has_prev, andamento_has_next = paginar_por_status(
-        base_admin + " AND tickets.status = 'Em andamento' AND tickets.is_hidden = 0",
-        (),
-        andamento_page
-    )
+    after_id = request.args.get('after_id', 0, type=int)
 
-    fechados, fechados_has_prev, fechados_has_next = paginar_por_status(
-        base_admin + " AND tickets.status = 'Fechado' AND tickets.is_hidden = 0",
-        (),
-        fechados_page
-    )
+    linhas = repositorios().tickets.eventos(after_id, EVENTOS_LOG_LIMITE + 1)
 
-    ocultados, ocultados_has_prev, ocultados_has_next = paginar_por_status(
-        base_admin + " AND tickets.is_hidden = 1",
-        (),
-        ocultados_page
-    )
+    eventos = [evento_do_log(linha) for linha in linhas[:EVENTOS_LOG_LIMITE]]
+
+    return jsonify({
+        "events": eventos,
+        "last_id": eventos[-1]["id"] if eventos else after_id,
+        "has_more": len(linhas) > EVENTOS_LOG_LIMITE,
+    })
 
-    return render_template(
-        'admin_kanban.html',
 
-        abertos=preparar_lista_com_badges(abertos),
-        andamento=preparar_lista_com_badges(andamento),
-        fechados=preparar_lista_com_badges(fechados),
-        ocultados=preparar_lista_com_badges(ocultados),
+# ============================================================
+# API: AÇÕES EM LOTE (start / close / hide)
+# ============================================================
+@bp.route('/api/tickets/lote', methods=['POST'])
+def api_tickets_lote():
+    """
+    POST {"acao": "close", "ids": [12, 13, 99]}
+    -> {"acao": "close", "resultados": {"12": "ok", "13": "nao_permitido", "99": "nao_encontrado"}}
+
+    Tudo numa transação só: fechar 200 chamados = 1 commit, não 200.
+    """
+    if 'user_id' not in session:
+        abort(401)
 
-        abertos_page=abertos_page,
-        abertos_has_prev=abertos_has_prev,
-        abertos_has_next=abertos_has_next,
+    if session.get('nivel') not in [1, 2]:
+        abort(403)
 
-        andamento_page=andamento_page,
-        andamento_has_prev=andamento_has_prev,
-        andamento_has_next=andamento_has_next,
+    dados = request.get_json(silent=True) or {}
+    acao = dados.get("acao")
+    ids = dados.get("ids")
 
-        fechados_page=fechados_page,
-        fechados_has_prev=fechados_has_prev,
-        fechados_has_next=fechados_has_next,
+    if acao not in ACOES_STATUS:
+        return jsonify({"erro": f"acao deve ser uma de: {', '.join(ACOES_STATUS)}"}), 400
 
-        ocultados_page=ocultados_page,
-        ocultados_has_prev=ocultados_has_prev,
-        ocultados_has_next=ocultados_has_next
-    )
+    if not isinstance(ids, list) or not all(isinstance(i, int) and not isinstance(i, bool) for i in ids):
+        return jsonify({"erro": "ids deve ser uma lista de números"}), 400
+
+    if len(ids) > LOTE_MAX:
+        return jsonify({"erro": f"máximo de {LOTE_MAX} ids por vez"}), 400
+
+    resultados = aplicar_acao_status(acao, ids)
+
+    return jsonify({
+        "acao": acao,
+        "resultados": {str(ticket_id): resultado for ticket_id, resultado in resultados.items()},
+    })
+
+
+# ============================================================
+# MÉTRICAS (/metrics NO FORMATO TEXTO DO PROMETHEUS)
+# ============================================================
+#
+# Tudo em memória do app (RecursosDoApp: cada worker expõe o seu), menos
+# os totais de tickets: esses vêm de ticket_totais, que os triggers da
+# migração 008 mantêm a cada INSERT/UPDATE/DELETE em tickets (criar,
+# iniciar, fechar, ocultar, desocultar, lote e arquivamento). O scrape
+# lê 4 linhas pela chave, sem COUNT(*).
+#
+ESTADOS_METRICAS = {
+    "Aberto": "abertos",
+    "Em andamento": "andamento",
+    "Fechado": "fechados",
+    "ocultados": "ocultados",
+}
+
+
+def somar_metrica(nome, valor=1):
+    # Fora do app (checagem do schema no create_app): não conta
+    if not has_app_context():
+        return
+
+    estado = recursos()
+    with estado.metricas_lock:
+        estado.metricas[nome] += valor
+
+
+def observar_tempo(rota, segundos):
+    estado = recursos()
+    with estado.metricas_lock:
+        histograma = estado.histogramas.setdefault(
+            rota, {"baldes": [0] * len(METRICAS_BUCKETS), "soma": 0.0, "total": 0}
+        )
+        for posicao, limite in enumerate(METRICAS_BUCKETS):
+            if segundos <= limite:
+                histograma["baldes"][posicao] += 1
+        histograma["soma"] += segundos
+        histograma["total"] += 1
+
+
+@bp.after_app_request
+def registrar_metricas(resposta):
+    # "helpdesk.fila" -> "fila": o nome do blueprint não entra no rótulo
+    rota = request.endpoint and request.endpoint.rsplit(".", 1)[-1]
+    if rota in (None, "static", "metrics") or "inicio_request" not in g:
+        return resposta
+
+    observar_tempo(rota, time.perf_counter() - g.inicio_request)
+    somar_metrica("comandos_sql", len(g.get("consultas", [])))
+    return resposta
+
+
+def totais_de_tickets():
+    totais = repositorios().tickets.totais_por_estado()
+    return {nome: totais.get(estado, 0) for estado, nome in ESTADOS_METRICAS.items()}
+
+
+@bp.route('/metrics')
+def metrics():
+    linhas = []
+
+    def metrica(nome, tipo, ajuda, valores):
+        linhas.append(f"# HELP {nome} {ajuda}")
+        linhas.append(f"# TYPE {nome} {tipo}")
+        for rotulos, valor in valores:
+            linhas.append(f"{nome}{rotulos} {valor}")
+
+    estado = recursos()
+    with estado.metricas_lock:
+        contadores = dict(estado.metricas)
+        histogramas = {rota: {**h, "baldes": list(h["baldes"])}
+                       for rota, h in estado.histogramas.items()}
+
+    valores = []
+    for rota, h in sorted(histogramas.items()):
+        for limite, quantidade in zip(METRICAS_BUCKETS, h["baldes"]):
+            valores.append((f'_bucket{{rota="{rota}",le="{limite}"}}', quantidade))
+        valores.append((f'_bucket{{rota="{rota}",le="+Inf"}}', h["total"]))
+        valores.append((f'_sum{{rota="{rota}"}}', f"{h['soma']:.6f}"))
+        valores.append((f'_count{{rota="{rota}"}}', h["total"]))
+    metrica("helpdesk_request_duration_seconds", "histogram",
+            "Tempo de resposta por rota (endpoint do Flask)", valores)
+
+    metrica("helpdesk_db_conexoes_abertas_total", "counter",
+            "Conexoes SQLite abertas desde o inicio", [("", contadores["conexoes_abertas"])])
+    metrica("helpdesk_db_conexoes_fechadas_total", "counter",
+            "Conexoes fechadas porque o pool estava cheio", [("", contadores["conexoes_fechadas"])])
+    metrica("helpdesk_db_conexoes_em_uso", "gauge",
+            "Conexoes emprestadas a requests agora", [("", contadores["conexoes_em_uso"])])
+    metrica("helpdesk_db_conexoes_ociosas", "gauge",
+            "Conexoes paradas no pool", [("", conexoes_ociosas())])
+    metrica("helpdesk_db_comandos_total", "counter",
+            "Comandos SQL executados pelos requests", [("", contadores["comandos_sql"])])
+
+    with estado.assinantes_lock:
+        assinantes = len(estado.assinantes)
+    metrica("helpdesk_sse_conexoes", "gauge",
+            "Abas conectadas em /events", [("", assinantes)])
+
+    metrica("helpdesk_tickets", "gauge", "Tickets na tabela quente por estado", [
+        (f'{{estado="{nome}"}}', total) for nome, total in totais_de_tickets().items()
+    ])
+
+    return Response("\n".join(linhas) + "\n", mimetype="text/plain; version=0.0.4")
+
+
+# ============================================================
+# APLICAÇÃO (create_app: CONFIG + CHECAGEM DO SCHEMA)
+# ============================================================
+#
+# Produção: gunicorn -c gunicorn.conf.py wsgi:app   (wsgi.py chama create_app)
+#
+# Cada chamada monta um Flask NOVO, com a sua config e o seu pool:
+# dois apps no mesmo processo (testes, por exemplo) não se misturam.
+#
+# Variáveis de ambiente (sem elas, valem os valores de CONFIG_PADRAO):
+#   HELPDESK_DATABASE       caminho do banco SQLite
+#   HELPDESK_SECRET_KEY     chave das sessões (OBRIGATÓRIA em produção)
+#   HELPDESK_PER_PAGE       cards por página em cada coluna
+#   HELPDESK_DB_POOL_SIZE   conexões no pool de cada processo
+#   HELPDESK_BANCO          "sqlite" ou "postgres"
+#   HELPDESK_POSTGRES_DSN   conexão do PostgreSQL
+#
+CHAVE_PADRAO = CONFIG_PADRAO["SECRET_KEY"]
+
+# ":memory:" puro daria um banco vazio para cada conexão do pool
+BANCO_MEMORIA_COMPARTILHADO = "file::memory:?cache=shared"
+
+CONFIG_DO_AMBIENTE = {
+    "DATABASE": ("HELPDESK_DATABASE", str),
+    "SECRET_KEY": ("HELPDESK_SECRET_KEY", str),
+    "PER_PAGE": ("HELPDESK_PER_PAGE", int),
+    "DB_POOL_SIZE": ("HELPDESK_DB_POOL_SIZE", int),
+    "BANCO": ("HELPDESK_BANCO", str),
+    "POSTGRES_DSN": ("HELPDESK_POSTGRES_DSN", str),
+    "SENHA_METODO": ("HELPDESK_SENHA_METODO", str),
+}
+
+
+def ler_config_do_ambiente():
+    """
+    {nome: valor} só das variáveis HELPDESK_* que existem.
+    """
+    config = {}
+    for nome, (variavel, tipo) in CONFIG_DO_AMBIENTE.items():
+        if variavel in os.environ:
+            try:
+                config[nome] = tipo(os.environ[variavel])
+            except ValueError:
+                raise RuntimeError(f"{variavel} inválida: {os.environ[variavel]!r}") from None
+    return config
+
+
+def montar_config(config=None):
+    """
+    CONFIG_PADRAO < variáveis HELPDESK_* < config (dict).
+    Scripts que precisam dos mesmos valores do app (checar_planos.py) usam daqui.
+    """
+    valores = dict(CONFIG_PADRAO)
+    valores.update(ler_config_do_ambiente())
+
+    for nome, valor in (config or {}).items():
+        if nome not in CONFIG_PADRAO:
+            raise RuntimeError(f"Configuração desconhecida: {nome}")
+        valores[nome] = valor
+
+    if valores["PER_PAGE"] < 1 or valores["DB_POOL_SIZE"] < 1:
+        raise RuntimeError("PER_PAGE e DB_POOL_SIZE precisam ser maiores que zero")
+
+    try:
+        parametros_do_metodo(valores["SENHA_METODO"])
+    except ValueError as erro:
+        raise RuntimeError(f"{erro} (SENHA_METODO: scrypt[:n:r:p] ou pbkdf2[:hash:iterações])") from None
+
+    if valores["DATABASE"] == ":memory:":
+        valores["DATABASE"] = BANCO_MEMORIA_COMPARTILHADO
+
+    return valores
+
+
+def versao_do_schema(config):
+    """
+    Versão do schema do banco configurado (SQLite: PRAGMA user_version;
+    PostgreSQL: tabela versao_schema do schema_postgres.sql).
+    """
+    # sqlite3.connect criaria um arquivo vazio no lugar
+    if (config["BANCO"] == "sqlite" and not sqlite_em_memoria(config["DATABASE"])
+            and not os.path.exists(config["DATABASE"])):
+        raise RuntimeError(f"Banco {config['DATABASE']} não encontrado (HELPDESK_DATABASE)")
+
+    conn = abrir_conexao(config)
+    try:
+        if config["BANCO"] == "postgres":
+            linha = conn.execute("SELECT versao FROM versao_schema").fetchone()
+            return linha["versao"] if linha else 0
+        return conn.execute("PRAGMA user_version").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def conferir_versao_do_schema(config):
+    """
+    Falha AGORA (na subida) se o banco não estiver na versão que este
+    código espera, em vez de estourar na primeira query de um request.
+    """
+    versao = versao_do_schema(config)
+
+    if versao < VERSAO_ATUAL:
+        raise RuntimeError(f"Banco na versão {versao}, o app precisa da {VERSAO_ATUAL}: "
+                           "rode python migrar_db.py (PostgreSQL: schema_postgres.sql)")
+    if versao > VERSAO_ATUAL:
+        raise RuntimeError(f"Banco na versão {versao}, mais nova que a deste código "
+                           f"({VERSAO_ATUAL}): atualize o app")
+
+
+def create_app(config=None):
+    """
+    Monta um app novo pronto para o servidor WSGI (ou para os testes).
+    Prioridade: config (dict) > variáveis HELPDESK_* > CONFIG_PADRAO.
+    """
+    app = Flask(__name__)
+    app.config.update(montar_config(config))
+
+    estado = RecursosDoApp(app.config)
+    app.extensions["helpdesk"] = estado
+
+    app.register_blueprint(bp)
+    app.teardown_appcontext(liberar_conexao)
+    app.jinja_env.globals["modelo_card"] = MODELO_CARD
+
+    if app.config["BANCO"] == "sqlite" and sqlite_em_memoria(app.config["DATABASE"]):
+        # Segura o banco em memória vivo enquanto o app existir
+        estado.conexao_memoria = abrir_conexao(app.config)
+
+    conferir_versao_do_schema(app.config)
+
+    if app.secret_key == CHAVE_PADRAO and not app.debug:
+        app.logger.warning("HELPDESK_SECRET_KEY não definida: usando a chave padrão "
+                           "(só para desenvolvimento)")
+
+    return app
 
 
 # ============================================================
-# RUN
+# RUN (SERVIDOR DE DESENVOLVIMENTO)
 # ============================================================
 if __name__ == '__main__':
-    app.run(debug=True)
+    create_app().run(debug=True)
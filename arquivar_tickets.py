@@ -0,0 +1,127 @@
+import sqlite3
+import sys
+from datetime import datetime, timedelta
+
+from app import FORMATO_DATA_BANCO
+
+# ============================================================
+# ARQUIVAMENTO DE TICKETS ANTIGOS
+# ============================================================
+#
+# Move para tickets_arquivo / ticket_comments_arquivo (migração 007)
+# os tickets:
+# - fechados há mais de N dias (closed_at), ou
+# - ocultados há mais de N dias (hidden_at)
+#
+# Assim a tabela quente (tickets) e os seus índices ficam pequenos
+# para os boards. O admin continua vendo os arquivados na coluna
+# "Arquivados" e o detalhe do chamado abre normalmente (só leitura).
+# A busca por texto também continua achando: o INSERT no arquivo
+# indexa no tickets_arquivo_fts / comments_arquivo_fts (migração 012).
+#
+# Rodar (de madrugada, por exemplo):
+#   python arquivar_tickets.py                 (180 dias, database.db)
+#   python arquivar_tickets.py 90
+#   python arquivar_tickets.py 90 outro_banco.db
+#
+# Cada lote de tickets é movido numa transação curta, para não
+# segurar o lock de escrita do banco enquanto o sistema está em uso.
+#
+# ============================================================
+
+ARQUIVAR_APOS_DIAS = 180
+LOTE = 500
+
+
+def colunas_em_comum(cursor, tabela, arquivo):
+    """
+    Colunas que existem nas duas tabelas (se "tickets" ganhar coluna
+    nova depois da migração 007, o arquivo só não guarda ela).
+    """
+    origem = [linha[1] for linha in cursor.execute(f"PRAGMA table_info({tabela})")]
+    destino = {linha[1] for linha in cursor.execute(f"PRAGMA table_info({arquivo})")}
+    return ", ".join(coluna for coluna in origem if coluna in destino)
+
+
+def arquivar_lote(conn, limite, agora):
+    """
+    Move até LOTE tickets (e os comentários deles). Retorna quantos moveu.
+    """
+    cursor = conn.cursor()
+    cursor.execute("BEGIN IMMEDIATE")
+
+    try:
+        cursor.execute("""
+            SELECT id
+            FROM tickets
+            WHERE (status = 'Fechado' AND is_hidden = 0 AND closed_at < ?)
+               OR (is_hidden = 1 AND hidden_at < ?)
+            ORDER BY id
+            LIMIT ?
+        """, (limite, limite, LOTE))
+        ids = [linha[0] for linha in cursor.fetchall()]
+
+        if not ids:
+            conn.rollback()
+            return 0
+
+        marcadores = ", ".join("?" for _ in ids)
+
+        colunas = colunas_em_comum(cursor, "tickets", "tickets_arquivo")
+        cursor.execute(f"""
+            INSERT INTO tickets_arquivo ({colunas}, arquivado_em)
+            SELECT {colunas}, ? FROM tickets WHERE id IN ({marcadores})
+        """, (agora, *ids))
+
+        colunas = colunas_em_comum(cursor, "ticket_comments", "ticket_comments_arquivo")
+        cursor.execute(f"""
+            INSERT INTO ticket_comments_arquivo ({colunas}, arquivado_em)
+            SELECT {colunas}, ? FROM ticket_comments WHERE ticket_id IN ({marcadores})
+        """, (agora, *ids))
+
+        # Apaga o ticket ANTES dos comentários: o trigger de DELETE em
+        # ticket_comments (contadores) não acha mais o ticket e não faz nada.
+        # Os triggers do FTS tiram da busca da tabela quente (o arquivo já
+        # indexou nos INSERTs acima)
+        cursor.execute(f"DELETE FROM tickets WHERE id IN ({marcadores})", ids)
+        cursor.execute(f"DELETE FROM ticket_comments WHERE ticket_id IN ({marcadores})", ids)
+
+        # Leitura (🔴/🟡) de ticket arquivado não serve mais para nada
+        cursor.execute(f"DELETE FROM comment_reads WHERE ticket_id IN ({marcadores})", ids)
+
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+    return len(ids)
+
+
+def arquivar(conn, dias=ARQUIVAR_APOS_DIAS):
+    """
+    Arquiva tudo que passou de "dias". Retorna o total de tickets movidos.
+    """
+    limite = (datetime.now() - timedelta(days=dias)).strftime(FORMATO_DATA_BANCO)
+    agora = datetime.now().strftime(FORMATO_DATA_BANCO)
+
+    total = 0
+    while True:
+        movidos = arquivar_lote(conn, limite, agora)
+        if not movidos:
+            return total
+        total += movidos
+        print(f"📦 {total} ticket(s) arquivado(s)...")
+
+
+if __name__ == "__main__":
+    dias = int(sys.argv[1]) if len(sys.argv) > 1 else ARQUIVAR_APOS_DIAS
+    caminho = sys.argv[2] if len(sys.argv) > 2 else "database.db"
+
+    conn = sqlite3.connect(caminho, timeout=30)
+    total = arquivar(conn, dias)
+    conn.close()
+
+    if total:
+        print(f"\n✅ {total} ticket(s) fechados/ocultados há mais de {dias} dias foram arquivados!")
+    else:
+        print(f"ℹ️ Nenhum ticket fechado/ocultado há mais de {dias} dias.")
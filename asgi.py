@@ -0,0 +1,327 @@
+import asyncio
+import io
+import json
+import re
+import sys
+
+from flask import current_app, redirect, render_template, session, url_for, flash
+
+import app as helpdesk
+
+# ============================================================
+# ENTRADA ASGI (SSE BARATO + ROTAS QUENTES EM asyncio)
+# ============================================================
+#
+# Alternativa ao wsgi.py para quem tem muita aba aberta em /events:
+# - /events: cada conexão é só uma asyncio.Queue no event loop (o
+#   broker do app.py entrega nela), não uma thread do gunicorn parada
+#   esperando evento. Um worker segura milhares de abas abertas.
+# - /admin, /fila, /meus-chamados e /ticket/<id> (GET): as leituras
+#   independentes rodam AO MESMO TEMPO, cada uma numa thread com a sua
+#   conexão do pool:
+#     board: uma query por coluna (no wsgi é um UNION ALL só), depois os 🔴
+#     detalhe: comentários + linha do tempo + "marcar como visto"
+# - Todo o resto vai para o app Flask de sempre (asgiref.WsgiToAsgi).
+#
+# Mesmas rotas, templates, sessão, métricas e Server-Timing do app.py.
+# O broker de cada processo é alimentado pelo ticket_events (ver EVENTOS
+# AO VIVO no app.py): vale com vários --workers.
+#
+# Dependências (só para este modo): pip install uvicorn asgiref
+#
+# Rodar:
+#   HELPDESK_SECRET_KEY=... uvicorn asgi:app --workers 4
+#
+# ============================================================
+
+flask_app = helpdesk.create_app()
+
+BOARDS = {
+    "/meus-chamados": (0, "meus_chamados_kanban.html"),
+    "/fila": (1, "fila_kanban.html"),
+    "/admin": (2, "admin_kanban.html"),
+}
+ROTA_TICKET = re.compile(r"^/ticket/(\d+)$")
+
+
+def _importar_asgiref():
+    try:
+        from asgiref.wsgi import WsgiToAsgi
+    except ImportError as erro:
+        raise RuntimeError("asgi.py precisa do asgiref: pip install asgiref") from erro
+    return WsgiToAsgi
+
+
+_app_wsgi = None
+
+
+def app_wsgi():
+    """Flask embrulhado em ASGI (criado no primeiro request que não é nosso)."""
+    global _app_wsgi
+    if _app_wsgi is None:
+        _app_wsgi = _importar_asgiref()(flask_app)
+    return _app_wsgi
+
+
+# ============================================================
+# LEITURAS EM PARALELO (CADA UMA COM A SUA CONEXÃO)
+# ============================================================
+async def ler_em_thread(funcao, *args):
+    """
+    Roda funcao(repos, *args) numa thread do executor com uma conexão
+    só dela (a do request, em flask.g, não pode ser usada por duas
+    threads ao mesmo tempo). to_thread leva junto o contexto do Flask:
+    session, request.args e o registro das consultas para o Server-Timing.
+    """
+    def rodar():
+        conn = helpdesk.pegar_conexao_do_pool()
+        try:
+            return funcao(helpdesk.repositorios(conn), *args)
+        finally:
+            helpdesk.devolver_conexao_ao_pool(conn)
+
+    return await asyncio.to_thread(rodar)
+
+
+async def carregar_board_async(nivel, user_id):
+    """
+    Mesmo contexto do helpdesk.carregar_board, mas com uma query por
+    coluna, todas ao mesmo tempo. Os 🔴 dependem dos ids e vêm depois.
+    """
+    colunas = helpdesk.colunas_do_board(nivel, user_id)
+    cursores = {coluna: helpdesk.ler_cursor(coluna) for coluna in colunas}
+
+    def ler_coluna(repos, coluna):
+        return repos.tickets.board({coluna: colunas[coluna]}, cursores,
+                                   current_app.config["PER_PAGE"])
+
+    resultados = await asyncio.gather(*(ler_em_thread(ler_coluna, coluna) for coluna in colunas))
+    linhas = [linha for linhas_coluna in resultados for linha in linhas_coluna]
+
+    return await asyncio.to_thread(helpdesk.contexto_do_board, colunas, cursores, linhas)
+
+
+async def board_async(nivel, template):
+    if 'user_id' not in session:
+        return redirect(url_for('.login'))
+
+    if session.get('nivel') != nivel:
+        return redirect(url_for('.dashboard'))
+
+    return render_template(template, **await carregar_board_async(nivel, session['user_id']))
+
+
+async def ticket_detail_async(ticket_id):
+    if 'user_id' not in session:
+        return redirect(url_for('.login'))
+
+    # Na conexão do request (memo de acesso em g, igual ao app.py)
+    ticket, permissoes = await asyncio.to_thread(helpdesk.resolver_acesso_ticket, ticket_id)
+
+    if not ticket or not permissoes["ver"]:
+        flash(f"Chamado Nº: {ticket_id} não encontrado.", "error")
+        return redirect(url_for('.dashboard'))
+
+    leituras = [
+        ler_em_thread(lambda repos: helpdesk.carregar_comentarios(
+            ticket_id, arquivado=ticket["arquivado"], repos=repos)),
+        ler_em_thread(lambda repos: helpdesk.carregar_eventos(
+            ticket_id, sem_comentarios=True, repos=repos)),
+    ]
+    # Marcar como visto não depende das leituras: vai junto, na conexão do request
+    if not ticket["arquivado"]:
+        leituras.append(asyncio.to_thread(helpdesk.marcar_ticket_como_visto, ticket))
+
+    (comments, has_older_comments), eventos, *_ = await asyncio.gather(*leituras)
+
+    return render_template('ticket_detail.html', ticket=ticket, permissoes=permissoes,
+                           comments=comments, has_older_comments=has_older_comments,
+                           eventos=eventos)
+
+
+# ============================================================
+# PONTE ASGI -> CONTEXTO DO FLASK
+# ============================================================
+def environ_do_scope(scope):
+    """Environ WSGI mínimo de um GET (sem corpo) para o request_context."""
+    environ = {
+        "REQUEST_METHOD": scope["method"],
+        "SCRIPT_NAME": scope.get("root_path", "").encode("utf-8").decode("latin-1"),
+        "PATH_INFO": scope["path"].encode("utf-8").decode("latin-1"),
+        "QUERY_STRING": scope.get("query_string", b"").decode("latin-1"),
+        "SERVER_PROTOCOL": f"HTTP/{scope.get('http_version', '1.1')}",
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": scope.get("scheme", "http"),
+        "wsgi.input": io.BytesIO(b""),
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": True,
+        "wsgi.run_once": False,
+    }
+
+    servidor = scope.get("server") or ("localhost", 80)
+    environ["SERVER_NAME"] = servidor[0]
+    environ["SERVER_PORT"] = str(servidor[1] or 80)
+    if scope.get("client"):
+        environ["REMOTE_ADDR"] = scope["client"][0]
+
+    for nome, valor in scope.get("headers", []):
+        nome = nome.decode("latin-1").upper().replace("-", "_")
+        valor = valor.decode("latin-1")
+        if nome not in ("CONTENT_TYPE", "CONTENT_LENGTH"):
+            nome = f"HTTP_{nome}"
+        environ[nome] = f"{environ[nome]},{valor}" if nome in environ else valor
+
+    return environ
+
+
+async def enviar_resposta(send, resposta):
+    await send({
+        "type": "http.response.start",
+        "status": resposta.status_code,
+        "headers": [(nome.lower().encode("latin-1"), valor.encode("latin-1"))
+                    for nome, valor in resposta.headers.items()],
+    })
+    await send({"type": "http.response.body", "body": resposta.get_data()})
+
+
+async def responder(scope, send, rota, *args):
+    """
+    O que o Flask faz num request (before_request, view, after_request,
+    salvar sessão, teardown), com a view async. O contexto do Flask vive
+    em contextvars: fica com esta task e vai junto para as threads do to_thread.
+    """
+    ctx = flask_app.request_context(environ_do_scope(scope))
+    ctx.push()
+    erro = None
+    try:
+        try:
+            try:
+                resposta = flask_app.preprocess_request()
+                if resposta is None:
+                    resposta = await rota(*args)
+            except Exception as e:
+                # Como no full_dispatch_request: abort(404/403) e os
+                # errorhandler viram resposta; o resto sobe para o 500
+                resposta = flask_app.handle_user_exception(e)
+            resposta = flask_app.finalize_request(resposta)
+        except Exception as e:
+            erro = e
+            resposta = flask_app.make_response(flask_app.handle_exception(e))
+    finally:
+        # teardown: devolve a conexão do request ao pool
+        ctx.pop(erro)
+
+    await enviar_resposta(send, resposta)
+
+
+# ============================================================
+# EVENTOS AO VIVO (SSE) SEM THREAD POR CONEXÃO 📡
+# ============================================================
+class FilaAsync:
+    """
+    Assinante do broker do app.py: publicar_evento roda na thread que
+    lê o ticket_events e só agenda a entrega no event loop desta conexão.
+    """
+
+    def __init__(self, loop):
+        self.loop = loop
+        self.fila = asyncio.Queue(maxsize=helpdesk.EVENTOS_FILA_MAX)
+
+    def put_nowait(self, evento):
+        self.loop.call_soon_threadsafe(self._entregar, evento)
+
+    def _entregar(self, evento):
+        try:
+            self.fila.put_nowait(evento)
+        except asyncio.QueueFull:
+            # Aba parada/lenta: perde o evento, o próximo F5 corrige
+            pass
+
+
+async def esperar_desconexao(receive):
+    while (await receive())["type"] != "http.disconnect":
+        pass
+
+
+async def eventos_sse(scope, receive, send):
+    with flask_app.request_context(environ_do_scope(scope)):
+        user_id = session.get('user_id')
+        nivel = session.get('nivel')
+
+    if user_id is None:
+        await send({"type": "http.response.start", "status": 401, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+        return
+
+    with flask_app.app_context():
+        assinante = helpdesk.assinar_eventos(FilaAsync(asyncio.get_running_loop()))
+    desconectou = asyncio.ensure_future(esperar_desconexao(receive))
+
+    async def enviar(texto):
+        await send({"type": "http.response.body", "body": texto.encode("utf-8"), "more_body": True})
+
+    try:
+        await send({
+            "type": "http.response.start",
+            "status": 200,
+            "headers": [
+                (b"content-type", b"text/event-stream; charset=utf-8"),
+                (b"cache-control", b"no-cache"),
+                (b"x-accel-buffering", b"no"),
+            ],
+        })
+        await enviar("retry: 5000\n\n")
+
+        while not desconectou.done():
+            proximo = asyncio.ensure_future(assinante.fila.get())
+            await asyncio.wait({proximo, desconectou}, timeout=helpdesk.EVENTOS_HEARTBEAT_SEG,
+                               return_when=asyncio.FIRST_COMPLETED)
+
+            if not proximo.done():
+                proximo.cancel()
+                if not desconectou.done():
+                    await enviar(": ping\n\n")
+                continue
+
+            evento = proximo.result()
+            dados = helpdesk.evento_para_usuario(evento, nivel, user_id)
+            if dados is not None:
+                await enviar(f"event: {evento['tipo']}\ndata: {json.dumps(dados)}\n\n")
+    finally:
+        desconectou.cancel()
+        with flask_app.app_context():
+            helpdesk.cancelar_assinatura(assinante)
+
+
+# ============================================================
+# APP ASGI
+# ============================================================
+async def lifespan(receive, send):
+    while True:
+        mensagem = await receive()
+        if mensagem["type"] == "lifespan.startup":
+            await send({"type": "lifespan.startup.complete"})
+        elif mensagem["type"] == "lifespan.shutdown":
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def app(scope, receive, send):
+    if scope["type"] == "lifespan":
+        return await lifespan(receive, send)
+
+    if scope["type"] == "http" and scope["method"] == "GET":
+        caminho = scope["path"]
+
+        if caminho == "/events":
+            return await eventos_sse(scope, receive, send)
+
+        if caminho in BOARDS:
+            return await responder(scope, send, board_async, *BOARDS[caminho])
+
+        encontrado = ROTA_TICKET.match(caminho)
+        if encontrado:
+            return await responder(scope, send, ticket_detail_async, int(encontrado.group(1)))
+
+    return await app_wsgi()(scope, receive, send)
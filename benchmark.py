@@ -0,0 +1,291 @@
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+
+from werkzeug.security import generate_password_hash
+
+import app as helpdesk
+from app import FORMATO_DATA_BANCO
+from checar_planos import banco_em_memoria
+
+# ============================================================
+# BENCHMARK / GERADOR DE CARGA
+# ============================================================
+#
+# 1) Cria um banco de RASCUNHO (nunca mexe no database.db):
+#    schema do database.db + migrações, e enche com usuários,
+#    tickets e comentários na quantidade pedida.
+# 2) Dispara vários workers em paralelo (threads, cada uma com o seu
+#    test client do Flask) contra /admin, /fila, /meus-chamados,
+#    /ticket/<id> e o POST de comentário.
+# 3) Mostra, por rota: p50 / p95 / p99 / máximo, requisições por
+#    segundo e queries por request.
+#
+# Rodar (antes de subir uma versão nova):
+#   python benchmark.py
+#   python benchmark.py --tickets 50000 --comentarios 200000 --workers 16
+#   python benchmark.py --max-p95 150      (exit code 1 se alguma rota passar)
+#
+# ============================================================
+
+STATUS = ['Aberto', 'Em andamento', 'Fechado']
+
+# Peso de cada cenário no sorteio de cada request
+CENARIOS_PESO = {
+    "admin": 2,
+    "fila": 3,
+    "meus_chamados": 3,
+    "ticket_detail": 6,
+    "add_comment": 1,
+}
+
+
+# ============================================================
+# BANCO DE RASCUNHO
+# ============================================================
+def popular_banco(caminho, usuarios, atendentes, tickets, comentarios, semente):
+    """
+    Retorna os ids criados: {"admins": [...], "atendentes": [...], "usuarios": [...], "tickets": [...]}
+    """
+    rnd = random.Random(semente)
+    conn = sqlite3.connect(caminho)
+    cursor = conn.cursor()
+
+    # Um hash só para todo mundo (senha "bench@123"): gerar 1000 scrypt
+    # levaria minutos e não é o que está sendo medido
+    senha_hash = generate_password_hash("bench@123")
+
+    pessoas = [("bench.admin", 2)]
+    pessoas += [(f"bench.atendente{i}", 1) for i in range(atendentes)]
+    pessoas += [(f"bench.usuario{i}", 0) for i in range(usuarios)]
+
+    cursor.executemany(
+        "INSERT INTO users (username, email, senha, is_admin) VALUES (?, ?, ?, ?)",
+        [(username, None, senha_hash, nivel) for username, nivel in pessoas]
+    )
+
+    ids = {"admins": [], "atendentes": [], "usuarios": []}
+    for user_id, nivel in cursor.execute("SELECT id, is_admin FROM users"):
+        ids[["usuarios", "atendentes", "admins"][nivel]].append(user_id)
+
+    # Tickets espalhados no último ano, do mais antigo pro mais novo
+    inicio = datetime.now() - timedelta(days=365)
+    passo = timedelta(days=365) / max(tickets, 1)
+
+    linhas = []
+    for i in range(tickets):
+        criado = inicio + passo * i
+        status = rnd.choices(STATUS, weights=[2, 2, 6])[0]
+        atendente = rnd.choice(ids["atendentes"]) if status != 'Aberto' and ids["atendentes"] else None
+        oculto = 1 if status == 'Fechado' and rnd.random() < 0.2 else 0
+        data = criado.strftime(FORMATO_DATA_BANCO)
+        linhas.append((
+            f"Chamado de carga {i}",
+            f"Descrição gerada {i}: impressora, rede, senha ou sistema lento",
+            status,
+            rnd.choice(ids["usuarios"]),
+            atendente,
+            data,
+            data if atendente else None,
+            data if status == 'Fechado' else None,
+            oculto,
+            ids["admins"][0] if oculto else None,
+            data if oculto else None,
+            data,
+            atendente or ids["admins"][0],
+        ))
+
+    cursor.executemany("""
+        INSERT INTO tickets
+        (titulo, descricao, status, user_id, attendant_id, created_at, started_at,
+         closed_at, is_hidden, hidden_by, hidden_at, last_status_at, last_status_by)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """, linhas)
+
+    ticket_ids = [linha[0] for linha in cursor.execute("SELECT id FROM tickets")]
+    todos = ids["usuarios"] + ids["atendentes"] + ids["admins"]
+
+    cursor.executemany("""
+        INSERT INTO ticket_comments (ticket_id, user_id, comment, created_at)
+        VALUES (?, ?, ?, ?)
+    """, (
+        (rnd.choice(ticket_ids), rnd.choice(todos), f"Comentário de carga {i}",
+         datetime.now().strftime(FORMATO_DATA_BANCO))
+        for i in range(comentarios)
+    ))
+
+    conn.commit()
+    conn.close()
+
+    ids["tickets"] = ticket_ids
+    return ids
+
+
+# ============================================================
+# CONTADOR DE QUERIES (POR THREAD)
+# ============================================================
+_contador = threading.local()
+
+
+def contar_queries():
+    """
+    Faz toda conexão nova do app contar os comandos SQL executados
+    na thread atual (_contador.total).
+    """
+    abrir_original = helpdesk.abrir_conexao
+
+    def abrir_contando(config=None):
+        conn = abrir_original(config)
+
+        def rastrear(_sql):
+            _contador.total = getattr(_contador, "total", 0) + 1
+
+        conn.set_trace_callback(rastrear)
+        return conn
+
+    helpdesk.abrir_conexao = abrir_contando
+
+
+# ============================================================
+# CARGA
+# ============================================================
+def cliente_logado(app, user_id, nivel, username):
+    cliente = app.test_client()
+    with cliente.session_transaction() as sessao:
+        sessao['user_id'] = user_id
+        sessao['nivel'] = nivel
+        sessao['username'] = username
+    return cliente
+
+
+def rodar_worker(app, ids, requisicoes, semente, resultados, lock):
+    rnd = random.Random(semente)
+
+    admin = cliente_logado(app, ids["admins"][0], 2, "bench.admin")
+    atendente = cliente_logado(app, rnd.choice(ids["atendentes"]), 1, "bench.atendente")
+    usuario = cliente_logado(app, rnd.choice(ids["usuarios"]), 0, "bench.usuario")
+
+    cenarios = {
+        "admin": lambda: admin.get('/admin'),
+        "fila": lambda: atendente.get('/fila'),
+        "meus_chamados": lambda: usuario.get('/meus-chamados'),
+        "ticket_detail": lambda: admin.get(f'/ticket/{rnd.choice(ids["tickets"])}'),
+        "add_comment": lambda: admin.post(f'/ticket/{rnd.choice(ids["tickets"])}/comment',
+                                          data={"comment": "comentário do benchmark"}),
+    }
+    nomes = list(CENARIOS_PESO)
+    pesos = list(CENARIOS_PESO.values())
+
+    medidas = []
+    for _ in range(requisicoes):
+        nome = rnd.choices(nomes, weights=pesos)[0]
+
+        _contador.total = 0
+        inicio = time.perf_counter()
+        resposta = cenarios[nome]()
+        duracao_ms = (time.perf_counter() - inicio) * 1000
+
+        medidas.append((nome, duracao_ms, _contador.total, resposta.status_code))
+
+    with lock:
+        resultados.extend(medidas)
+
+
+def percentil(valores_ordenados, p):
+    if not valores_ordenados:
+        return 0.0
+    posicao = max(0, min(len(valores_ordenados) - 1, round(p / 100 * len(valores_ordenados)) - 1))
+    return valores_ordenados[posicao]
+
+
+def relatorio(resultados, segundos):
+    print("\nTempos em ms | q/req = comandos SQL por request (inclui triggers)")
+    print(f"{'rota':<15}{'n':>7}{'p50':>9}{'p95':>9}{'p99':>9}{'máx':>9}{'req/s':>9}{'q/req':>8}{'erros':>7}")
+
+    por_rota = {}
+    for nome, duracao_ms, queries, status in resultados:
+        por_rota.setdefault(nome, []).append((duracao_ms, queries, status))
+
+    p95_por_rota = {}
+    for nome in CENARIOS_PESO:
+        medidas = por_rota.get(nome, [])
+        if not medidas:
+            continue
+
+        tempos = sorted(m[0] for m in medidas)
+        queries = sum(m[1] for m in medidas) / len(medidas)
+        erros = sum(1 for m in medidas if m[2] >= 400)
+        p95_por_rota[nome] = percentil(tempos, 95)
+
+        print(f"{nome:<15}{len(medidas):>7}"
+              f"{percentil(tempos, 50):>9.1f}{p95_por_rota[nome]:>9.1f}"
+              f"{percentil(tempos, 99):>9.1f}{tempos[-1]:>9.1f}"
+              f"{len(medidas) / segundos:>9.1f}{queries:>8.1f}{erros:>7}")
+
+    print(f"\nTotal: {len(resultados)} requests em {segundos:.2f}s "
+          f"= {len(resultados) / segundos:.1f} req/s")
+
+    return p95_por_rota
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark das rotas do Help Desk")
+    parser.add_argument("--usuarios", type=int, default=200)
+    parser.add_argument("--atendentes", type=int, default=20)
+    parser.add_argument("--tickets", type=int, default=20000)
+    parser.add_argument("--comentarios", type=int, default=100000)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--requisicoes", type=int, default=250, help="por worker")
+    parser.add_argument("--banco", default="benchmark.db", help="banco de rascunho (recriado)")
+    parser.add_argument("--schema", default="database.db", help="de onde copiar o schema")
+    parser.add_argument("--semente", type=int, default=42)
+    parser.add_argument("--max-p95", type=float, help="falha (exit 1) se alguma rota passar (ms)")
+    args = parser.parse_args()
+
+    for sufixo in ["", "-wal", "-shm"]:
+        if os.path.exists(args.banco + sufixo):
+            os.remove(args.banco + sufixo)
+
+    print(f"🛠️ Criando {args.banco}...")
+    banco_em_memoria(args.schema, args.banco).close()
+
+    inicio = time.perf_counter()
+    ids = popular_banco(args.banco, args.usuarios, args.atendentes,
+                        args.tickets, args.comentarios, args.semente)
+    print(f"✅ {len(ids['usuarios'])} usuários, {len(ids['atendentes'])} atendentes, "
+          f"{len(ids['tickets'])} tickets e {args.comentarios} comentários "
+          f"em {time.perf_counter() - inicio:.1f}s")
+
+    contar_queries()
+    app = helpdesk.create_app({"DATABASE": args.banco})
+
+    resultados = []
+    lock = threading.Lock()
+    workers = [
+        threading.Thread(target=rodar_worker,
+                         args=(app, ids, args.requisicoes, args.semente + i, resultados, lock))
+        for i in range(args.workers)
+    ]
+
+    print(f"🚀 {args.workers} workers x {args.requisicoes} requests...")
+    inicio = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    segundos = time.perf_counter() - inicio
+
+    p95_por_rota = relatorio(resultados, segundos)
+
+    if args.max_p95 is not None:
+        estouradas = {nome: p95 for nome, p95 in p95_por_rota.items() if p95 > args.max_p95}
+        if estouradas:
+            print(f"\n❌ p95 acima de {args.max_p95:.0f} ms: "
+                  + ", ".join(f"{nome} ({p95:.1f} ms)" for nome, p95 in estouradas.items()))
+            sys.exit(1)
+        print(f"\n✅ Todas as rotas com p95 até {args.max_p95:.0f} ms.")
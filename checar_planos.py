@@ -0,0 +1,143 @@
+import re
+import sqlite3
+import sys
+
+from app import BUSCA_LIMITE, montar_config
+from repositorios import colunas_do_board, montar_sql_board, montar_sql_busca
+from migrar_db import migrar
+
+# ============================================================
+# CHECAGEM DOS PLANOS DE EXECUÇÃO DOS BOARDS
+# ============================================================
+#
+# Roda EXPLAIN QUERY PLAN em todas as queries dos kanbans
+# (usuário, atendente e admin), do jeito que a paginação executa,
+# e na busca por texto de cada perfil, e FALHA (exit code 1) se alguma delas fizer SCAN completo de tabela
+# ou se a busca deixar de usar algum dos índices de texto (tickets e arquivo).
+#
+# O schema do banco informado é copiado para um banco em memória
+# e as migrações pendentes são aplicadas lá, então o banco real
+# não é alterado.
+#
+# Rodar (antes de subir uma versão nova):
+#   python checar_planos.py                (usa database.db)
+#   python checar_planos.py outro_banco.db
+#
+# ============================================================
+
+# "SCAN tabela" (com ou sem índice) = leu a tabela inteira.
+# "SCAN (subquery...)" / "SCAN CONSTANT ROW" não contam, nem o SCAN de
+# subqueries nomeadas (CO-ROUTINE / MATERIALIZE), que já vêm com LIMIT.
+# "SCAN x VIRTUAL TABLE INDEX" é o FTS5 usando o próprio índice.
+PADRAO_SCAN = re.compile(r"^SCAN (?!\(|CONSTANT ROW|SUBQUERY)(\S+)(?!\S| VIRTUAL TABLE INDEX)")
+PADRAO_SUBQUERY = re.compile(r"^(?:CO-ROUTINE|MATERIALIZE) (\S+)")
+PADRAO_FTS = re.compile(r"^SCAN (\S+) VIRTUAL TABLE INDEX")
+
+# A busca tem que passar pelos quatro índices de texto: sem os do
+# arquivo (migração 012), chamado arquivado some da busca
+FTS_DA_BUSCA = ("tickets_fts", "comments_fts", "tickets_arquivo_fts", "comments_arquivo_fts")
+
+
+def banco_em_memoria(caminho, destino=":memory:"):
+    """
+    Banco vazio com o schema de "caminho" + migrações pendentes.
+    destino = arquivo para gerar um banco de rascunho (benchmark.py).
+    """
+    origem = sqlite3.connect(caminho)
+    schema = origem.execute("""
+        SELECT name, sql
+        FROM sqlite_master
+        WHERE sql IS NOT NULL
+          AND name NOT LIKE 'sqlite_%'
+        ORDER BY CASE
+            WHEN sql LIKE 'CREATE VIRTUAL TABLE%' THEN 0
+            WHEN type = 'table' THEN 1
+            ELSE 2
+        END
+    """).fetchall()
+    versao = origem.execute("PRAGMA user_version").fetchone()[0]
+    origem.close()
+
+    # uri=True: destino pode ser "file:...?mode=memory&cache=shared" (testes)
+    conn = sqlite3.connect(destino, uri=True)
+    for nome, sql in schema:
+        # Tabelas internas do FTS5 (tickets_fts_data...) já nascem
+        # junto com a tabela virtual
+        existe = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE name = ?", (nome,)
+        ).fetchone()
+        if not existe:
+            conn.execute(sql)
+    conn.execute(f"PRAGMA user_version = {versao}")
+    conn.commit()
+
+    migrar(conn)
+    return conn
+
+
+def consultas_para_checar():
+    """
+    Gera (nome, sql, params, índices de texto obrigatórios) com a mesma
+    query que carregar_board roda (todas as colunas na primeira página,
+    na próxima e na anterior) e a busca por texto.
+    """
+    perfis = {0: "usuario", 1: "atendente", 2: "admin"}
+    por_pagina = montar_config()["PER_PAGE"]
+    cursores = {
+        "inicio": (None, None),
+        "before_id": (100, None),
+        "after_id": (None, 100),
+    }
+
+    for nivel, perfil in perfis.items():
+        colunas = colunas_do_board(nivel, 1)
+        for nome_cursor, cursor in cursores.items():
+            sql, params = montar_sql_board(
+                colunas, {coluna: cursor for coluna in colunas}, por_pagina
+            )
+            yield f"{perfil} ({nome_cursor})", sql, params, ()
+
+        sql, params = montar_sql_busca(nivel, 1, '"impressora"*', BUSCA_LIMITE)
+        yield f"{perfil} (busca)", sql, params, FTS_DA_BUSCA
+
+
+def checar(conn):
+    problemas = []
+
+    for nome, sql, params, fts_obrigatorios in consultas_para_checar():
+        plano = conn.execute("EXPLAIN QUERY PLAN " + sql, params).fetchall()
+
+        usados = {m.group(1) for m in (PADRAO_FTS.match(linha[3]) for linha in plano) if m}
+        for fts in fts_obrigatorios:
+            if fts not in usados:
+                problemas.append((nome, f"não usa o índice de texto {fts}"))
+
+        subqueries = set()
+        for linha in plano:
+            m = PADRAO_SUBQUERY.match(linha[3])
+            if m:
+                subqueries.add(m.group(1))
+
+        for linha in plano:
+            detalhe = linha[3]
+            m = PADRAO_SCAN.match(detalhe)
+            if m and m.group(1) not in subqueries:
+                problemas.append((nome, detalhe))
+
+    return problemas
+
+
+if __name__ == "__main__":
+    caminho = sys.argv[1] if len(sys.argv) > 1 else "database.db"
+
+    conn = banco_em_memoria(caminho)
+    problemas = checar(conn)
+    conn.close()
+
+    if problemas:
+        print("\n❌ Queries de board/busca com SCAN completo ou sem índice de texto:")
+        for nome, detalhe in problemas:
+            print(f" - {nome}: {detalhe}")
+        sys.exit(1)
+
+    print("\n✅ Nenhum board/busca faz SCAN completo de tabela.")
@@ -0,0 +1,43 @@
+import multiprocessing
+import os
+
+# ============================================================
+# GUNICORN (VÁRIOS PROCESSOS x VÁRIAS THREADS)
+# ============================================================
+#
+#   gunicorn -c gunicorn.conf.py wsgi:app
+#
+# - gthread: cada processo atende HELPDESK_THREADS requests ao mesmo
+#   tempo. O hash de senha e o SQLite soltam o GIL, e cada thread pega
+#   a sua conexão do pool (HELPDESK_DB_POOL_SIZE >= HELPDESK_THREADS,
+#   senão as que sobram abrem conexão avulsa a cada request)
+# - preload_app: create_app (e a checagem do schema) roda UMA vez no
+#   processo mestre, antes do fork; se o banco estiver desatualizado
+#   o gunicorn nem sobe
+# - Cada aba aberta em /events (SSE) prende uma thread enquanto estiver
+#   conectada: conte com isso ao escolher HELPDESK_THREADS (ou use o
+#   asgi.py, onde uma aba não prende thread)
+# - Cada processo tem as suas métricas (/metrics). Os eventos ao vivo
+#   não dependem do processo: cada um lê o ticket_events do banco
+#
+# ============================================================
+
+bind = os.environ.get("HELPDESK_BIND", "0.0.0.0:8000")
+
+workers = int(os.environ.get("HELPDESK_WORKERS", min(multiprocessing.cpu_count() * 2 + 1, 9)))
+worker_class = "gthread"
+threads = int(os.environ.get("HELPDESK_THREADS", 8))
+
+preload_app = True
+
+# Recicla o processo de tempos em tempos (memória / cache do SQLite)
+max_requests = 2000
+max_requests_jitter = 200
+
+# Worker sem dar sinal de vida por "timeout" segundos é reiniciado
+timeout = 60
+graceful_timeout = 30
+keepalive = 5
+
+accesslog = "-"
+errorlog = "-"
@@ -0,0 +1,755 @@
+import sqlite3
+import sys
+
+# ============================================================
+# MIGRAÇÕES VERSIONADAS DO BANCO
+# ============================================================
+#
+# A versão atual do schema fica gravada no próprio arquivo do banco,
+# em PRAGMA user_version (começa em 0 num banco novo).
+#
+# Cada migração tem:
+# - versao: número sequencial (nunca reutilizar / renumerar)
+# - descricao: o que ela faz (aparece no terminal)
+# - funcao: recebe o cursor e aplica as mudanças
+#
+# Rodar:
+#   python migrar_db.py                (usa database.db)
+#   python migrar_db.py outro_banco.db
+#
+# Só as migrações com versão MAIOR que a atual são aplicadas,
+# cada uma dentro da sua própria transação. Banco na versão 0 (novo ou
+# só com os create_*.py) passa antes pela 000 (schema base).
+#
+# ============================================================
+
+
+def adicionar_coluna(cursor, tabela, coluna, tipo):
+    """
+    ALTER TABLE ADD COLUMN que não quebra se a coluna já existir
+    (bancos antigos ganharam colunas "na mão" com scripts avulsos).
+    """
+    existentes = [linha[1] for linha in cursor.execute(f"PRAGMA table_info({tabela})")]
+    if coluna not in existentes:
+        cursor.execute(f"ALTER TABLE {tabela} ADD COLUMN {coluna} {tipo}")
+
+
+# ============================================================
+# 0) SCHEMA BASE (O QUE OS SCRIPTS AVULSOS CRIAVAM)
+# ============================================================
+def migracao_000_schema_base(cursor):
+    # Mesmas tabelas do create_db.py / create_tickets.py / create_comments.py:
+    # com elas (ou sem nada), o migrar_db.py sozinho deixa o banco pronto
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT NOT NULL UNIQUE,
+            email TEXT,
+            senha TEXT NOT NULL,
+            is_admin INTEGER NOT NULL
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS tickets (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            titulo TEXT NOT NULL,
+            descricao TEXT NOT NULL,
+            status TEXT NOT NULL,
+            user_id INTEGER NOT NULL,
+            attendant_id INTEGER,
+            created_at TEXT NOT NULL,
+            started_at TEXT,
+            closed_at TEXT,
+            is_hidden INTEGER NOT NULL,
+            hidden_by INTEGER,
+            hidden_at TEXT
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS ticket_comments (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            ticket_id INTEGER NOT NULL,
+            user_id INTEGER NOT NULL,
+            comment TEXT NOT NULL,
+            created_at TEXT NOT NULL
+        )
+    """)
+
+    # Quem mudou o status por último (🟡)
+    adicionar_coluna(cursor, "tickets", "last_status_at", "TEXT")
+    adicionar_coluna(cursor, "tickets", "last_status_by", "INTEGER")
+
+    # Do atualizar_db_notificacoes.py: leitura por perfil, que a 004 copia
+    # para o comment_reads
+    for perfil in ("user", "attendant", "admin"):
+        adicionar_coluna(cursor, "tickets", f"{perfil}_seen_comment_id", "INTEGER")
+        adicionar_coluna(cursor, "tickets", f"{perfil}_seen_status_at", "TEXT")
+
+
+# ============================================================
+# 1) ÍNDICES DOS BOARDS E DOS COMENTÁRIOS
+# ============================================================
+def migracao_001_indices(cursor):
+    # Admin (abertos/andamento/fechados/ocultados) e fila "Abertos":
+    # WHERE is_hidden = ? AND status = ? ORDER BY id DESC
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_tickets_hidden_status_id
+        ON tickets (is_hidden, status, id)
+    """)
+
+    # Meus chamados (usuário):
+    # WHERE user_id = ? AND is_hidden = 0 AND status = ? ORDER BY id DESC
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_tickets_user_hidden_status_id
+        ON tickets (user_id, is_hidden, status, id)
+    """)
+
+    # Fila do atendente (andamento/fechados):
+    # WHERE attendant_id = ? AND is_hidden = 0 AND status = ? ORDER BY id DESC
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_tickets_attendant_hidden_status_id
+        ON tickets (attendant_id, is_hidden, status, id)
+    """)
+
+    # Contador 🔴, último comentário e histórico do detalhe:
+    # WHERE ticket_id = ? AND id > ? (AND user_id != ?) / ORDER BY id
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_comments_ticket_id_user
+        ON ticket_comments (ticket_id, id, user_id)
+    """)
+
+
+# ============================================================
+# 2) ÍNDICE DA COLUNA "OCULTADOS" (PAGINAÇÃO POR CURSOR)
+# ============================================================
+def migracao_002_indice_ocultados(cursor):
+    # Admin "Ocultados": WHERE is_hidden = 1 AND id < ? ORDER BY id DESC
+    # (o índice com status no meio não serve para o cursor por id)
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_tickets_hidden_id
+        ON tickets (is_hidden, id)
+    """)
+
+
+# ============================================================
+# 3) CONTADORES DE COMENTÁRIOS NO PRÓPRIO TICKET (TRIGGERS)
+# ============================================================
+def migracao_003_contadores_comentarios(cursor):
+    # last_comment_id / last_comment_user_id / comment_count ficam no ticket,
+    # assim o 🔴 e o "marcar como visto" não precisam varrer ticket_comments
+    adicionar_coluna(cursor, "tickets", "last_comment_id", "INTEGER")
+    adicionar_coluna(cursor, "tickets", "last_comment_user_id", "INTEGER")
+    adicionar_coluna(cursor, "tickets", "comment_count", "INTEGER NOT NULL DEFAULT 0")
+
+    # Preenche com o que já existe
+    cursor.execute("""
+        UPDATE tickets
+        SET last_comment_id = (
+                SELECT MAX(tc.id) FROM ticket_comments tc
+                WHERE tc.ticket_id = tickets.id
+            ),
+            comment_count = (
+                SELECT COUNT(*) FROM ticket_comments tc
+                WHERE tc.ticket_id = tickets.id
+            )
+    """)
+    cursor.execute("""
+        UPDATE tickets
+        SET last_comment_user_id = (
+            SELECT tc.user_id FROM ticket_comments tc
+            WHERE tc.id = tickets.last_comment_id
+        )
+        WHERE last_comment_id IS NOT NULL
+    """)
+
+    # Novo comentário: atualiza o ticket na mesma transação do INSERT
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_ticket_comments_insert
+        AFTER INSERT ON ticket_comments
+        BEGIN
+            UPDATE tickets
+            SET last_comment_id = NEW.id,
+                last_comment_user_id = NEW.user_id,
+                comment_count = comment_count + 1
+            WHERE id = NEW.ticket_id;
+        END
+    """)
+
+    # Comentário apagado (manutenção manual): recalcula só aquele ticket
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_ticket_comments_delete
+        AFTER DELETE ON ticket_comments
+        BEGIN
+            UPDATE tickets
+            SET comment_count = comment_count - 1,
+                last_comment_id = (
+                    SELECT MAX(tc.id) FROM ticket_comments tc
+                    WHERE tc.ticket_id = OLD.ticket_id
+                ),
+                last_comment_user_id = (
+                    SELECT tc.user_id FROM ticket_comments tc
+                    WHERE tc.ticket_id = OLD.ticket_id
+                    ORDER BY tc.id DESC
+                    LIMIT 1
+                )
+            WHERE id = OLD.ticket_id;
+        END
+    """)
+
+
+# ============================================================
+# 4) LEITURA POR USUÁRIO (comment_reads)
+# ============================================================
+def migracao_004_leitura_por_usuario(cursor):
+    # Mesma tabela do create_comment_reads.py (caso ainda não exista)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS comment_reads (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            ticket_id INTEGER NOT NULL,
+            user_id INTEGER NOT NULL,
+            last_seen_comment_id INTEGER NOT NULL DEFAULT 0,
+            updated_at TEXT NOT NULL,
+            UNIQUE(ticket_id, user_id)
+        )
+    """)
+
+    # 🟡 também passa a ser por usuário
+    adicionar_coluna(cursor, "comment_reads", "last_seen_status_at", "TEXT")
+
+    # Copia o que estava nas colunas por perfil do ticket:
+    # - user_*: dono do ticket
+    # - attendant_*: atendente responsável
+    # - admin_*: era compartilhado, vai para todos os admins
+    origens = [
+        ("user", "tickets.user_id", "", ""),
+        ("attendant", "tickets.attendant_id", "", "AND tickets.attendant_id IS NOT NULL"),
+        ("admin", "admins.id", "JOIN users AS admins ON admins.is_admin = 2", ""),
+    ]
+
+    for perfil, leitor, join, filtro in origens:
+        cursor.execute(f"""
+            INSERT OR IGNORE INTO comment_reads
+            (ticket_id, user_id, last_seen_comment_id, last_seen_status_at, updated_at)
+            SELECT
+                tickets.id,
+                {leitor},
+                COALESCE(tickets.{perfil}_seen_comment_id, 0),
+                tickets.{perfil}_seen_status_at,
+                COALESCE(tickets.{perfil}_seen_status_at, tickets.created_at)
+            FROM tickets
+            {join}
+            WHERE (tickets.{perfil}_seen_comment_id IS NOT NULL
+                   OR tickets.{perfil}_seen_status_at IS NOT NULL)
+              {filtro}
+        """)
+
+
+# ============================================================
+# 5) DATAS EM ISO-8601 (dd/mm/YYYY HH:MM -> YYYY-MM-DD HH:MM:SS)
+# ============================================================
+COLUNAS_DE_DATA = {
+    "tickets": [
+        "created_at", "started_at", "closed_at", "hidden_at",
+        "last_status_at", "last_comment_at",
+        "user_seen_at", "attendant_seen_at", "admin_seen_at",
+        "user_seen_status_at", "attendant_seen_status_at", "admin_seen_status_at",
+    ],
+    "ticket_comments": ["created_at"],
+    "comment_reads": ["updated_at", "last_seen_status_at"],
+}
+
+
+def migracao_005_datas_iso(cursor):
+    for tabela, colunas in COLUNAS_DE_DATA.items():
+        existentes = [linha[1] for linha in cursor.execute(f"PRAGMA table_info({tabela})")]
+
+        for coluna in colunas:
+            if coluna not in existentes:
+                continue
+
+            # "13/01/2026 11:10" -> "2026-01-13 11:10:00"
+            cursor.execute(f"""
+                UPDATE {tabela}
+                SET {coluna} = substr({coluna}, 7, 4) || '-' ||
+                               substr({coluna}, 4, 2) || '-' ||
+                               substr({coluna}, 1, 2) || ' ' ||
+                               substr({coluna}, 12, 5) || ':00'
+                WHERE {coluna} LIKE '__/__/____ __:__'
+            """)
+
+
+# ============================================================
+# 6) BUSCA POR TEXTO (FTS5)
+# ============================================================
+def migracao_006_busca_texto(cursor):
+    # Índices de texto "external content": o texto continua só em
+    # tickets / ticket_comments, o FTS guarda só o índice.
+    # remove_diacritics: "impressao" acha "impressão"
+    cursor.execute("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS tickets_fts USING fts5(
+            titulo, descricao,
+            content = 'tickets', content_rowid = 'id',
+            tokenize = 'unicode61 remove_diacritics 2'
+        )
+    """)
+    cursor.execute("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS comments_fts USING fts5(
+            comment,
+            content = 'ticket_comments', content_rowid = 'id',
+            tokenize = 'unicode61 remove_diacritics 2'
+        )
+    """)
+
+    # Tickets: só mexe no índice quando título/descrição mudam
+    # (mudança de status não toca no FTS)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_tickets_fts_insert
+        AFTER INSERT ON tickets
+        BEGIN
+            INSERT INTO tickets_fts (rowid, titulo, descricao)
+            VALUES (NEW.id, NEW.titulo, NEW.descricao);
+        END
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_tickets_fts_delete
+        AFTER DELETE ON tickets
+        BEGIN
+            INSERT INTO tickets_fts (tickets_fts, rowid, titulo, descricao)
+            VALUES ('delete', OLD.id, OLD.titulo, OLD.descricao);
+        END
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_tickets_fts_update
+        AFTER UPDATE OF titulo, descricao ON tickets
+        BEGIN
+            INSERT INTO tickets_fts (tickets_fts, rowid, titulo, descricao)
+            VALUES ('delete', OLD.id, OLD.titulo, OLD.descricao);
+            INSERT INTO tickets_fts (rowid, titulo, descricao)
+            VALUES (NEW.id, NEW.titulo, NEW.descricao);
+        END
+    """)
+
+    # Comentários
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_comments_fts_insert
+        AFTER INSERT ON ticket_comments
+        BEGIN
+            INSERT INTO comments_fts (rowid, comment)
+            VALUES (NEW.id, NEW.comment);
+        END
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_comments_fts_delete
+        AFTER DELETE ON ticket_comments
+        BEGIN
+            INSERT INTO comments_fts (comments_fts, rowid, comment)
+            VALUES ('delete', OLD.id, OLD.comment);
+        END
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_comments_fts_update
+        AFTER UPDATE OF comment ON ticket_comments
+        BEGIN
+            INSERT INTO comments_fts (comments_fts, rowid, comment)
+            VALUES ('delete', OLD.id, OLD.comment);
+            INSERT INTO comments_fts (rowid, comment)
+            VALUES (NEW.id, NEW.comment);
+        END
+    """)
+
+    # Indexa o que já existe
+    cursor.execute("INSERT INTO tickets_fts (tickets_fts) VALUES ('rebuild')")
+    cursor.execute("INSERT INTO comments_fts (comments_fts) VALUES ('rebuild')")
+
+
+# ============================================================
+# 7) TABELAS DE ARQUIVO (tickets antigos saem da tabela quente)
+# ============================================================
+def criar_tabela_arquivo(cursor, tabela, arquivo):
+    """
+    Cria "arquivo" com as mesmas colunas de "tabela" (id continua sendo
+    a chave) + arquivado_em. Sem defaults/NOT NULL: é só uma cópia.
+    """
+    colunas = [
+        f"{linha[1]} {linha[2]}"
+        for linha in cursor.execute(f"PRAGMA table_info({tabela})")
+        if linha[1] != "id"
+    ]
+    cursor.execute(f"""
+        CREATE TABLE IF NOT EXISTS {arquivo} (
+            id INTEGER PRIMARY KEY,
+            {", ".join(colunas)},
+            arquivado_em TEXT
+        )
+    """)
+
+
+def migracao_007_arquivo(cursor):
+    criar_tabela_arquivo(cursor, "tickets", "tickets_arquivo")
+    criar_tabela_arquivo(cursor, "ticket_comments", "ticket_comments_arquivo")
+
+    # Histórico do ticket arquivado: WHERE ticket_id = ? ORDER BY id
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_comments_arquivo_ticket_id
+        ON ticket_comments_arquivo (ticket_id, id)
+    """)
+
+
+# ============================================================
+# 8) TOTAIS DE TICKETS POR ESTADO (PARA O /metrics)
+# ============================================================
+# Estado: "ocultados" se is_hidden = 1, senão o próprio status
+ESTADO_DO_TICKET = "CASE WHEN {t}.is_hidden = 1 THEN 'ocultados' ELSE {t}.status END"
+
+
+def migracao_008_totais_tickets(cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS ticket_totais (
+            estado TEXT PRIMARY KEY,
+            total INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+
+    # Contagem inicial (a única vez que precisa de COUNT(*))
+    cursor.execute("DELETE FROM ticket_totais")
+    cursor.execute(f"""
+        INSERT INTO ticket_totais (estado, total)
+        SELECT {ESTADO_DO_TICKET.format(t="tickets")}, COUNT(*)
+        FROM tickets
+        GROUP BY 1
+    """)
+
+    # Daqui pra frente: +1 / -1 na mesma transação de quem mexeu no ticket
+    somar = """
+        INSERT INTO ticket_totais (estado, total) VALUES ({estado}, {delta})
+        ON CONFLICT (estado) DO UPDATE SET total = total + {delta};
+    """
+
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_ticket_totais_insert
+        AFTER INSERT ON tickets
+        BEGIN
+            {somar.format(estado=ESTADO_DO_TICKET.format(t="NEW"), delta=1)}
+        END
+    """)
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_ticket_totais_delete
+        AFTER DELETE ON tickets
+        BEGIN
+            {somar.format(estado=ESTADO_DO_TICKET.format(t="OLD"), delta=-1)}
+        END
+    """)
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_ticket_totais_update
+        AFTER UPDATE OF status, is_hidden ON tickets
+        WHEN {ESTADO_DO_TICKET.format(t="OLD")} IS NOT {ESTADO_DO_TICKET.format(t="NEW")}
+        BEGIN
+            {somar.format(estado=ESTADO_DO_TICKET.format(t="OLD"), delta=-1)}
+            {somar.format(estado=ESTADO_DO_TICKET.format(t="NEW"), delta=1)}
+        END
+    """)
+
+
+# ============================================================
+# 9) ESTATÍSTICAS POR DIA x ATENDENTE x STATUS (ROLLUP)
+# ============================================================
+#
+# Uma linha por (dia, atendente, status) com quantos tickets ENTRARAM
+# naquele status naquele dia e a soma dos segundos até chegar nele:
+# - 'Aberto': criados (atendente 0)
+# - 'Em andamento': iniciados, segundos = started_at - created_at
+# - 'Fechado': fechados, segundos = closed_at - created_at
+#
+# Ticket apagado/arquivado não desconta: é histórico.
+#
+SEGUNDOS_ENTRE = "CAST(ROUND((julianday({fim}) - julianday({inicio})) * 86400) AS INTEGER)"
+
+
+def preencher_estatisticas(cursor):
+    """
+    Recalcula ticket_stats_dia do zero (tickets + tickets_arquivo).
+    Usada pela migração 009 e pelo recalcular_estatisticas.py.
+    """
+    cursor.execute("DELETE FROM ticket_stats_dia")
+
+    todos = """
+        SELECT created_at, started_at, closed_at, attendant_id FROM tickets
+        UNION ALL
+        SELECT created_at, started_at, closed_at, attendant_id FROM tickets_arquivo
+    """
+
+    partes = [
+        ("created_at", "0", "'Aberto'", "0"),
+        ("started_at", "COALESCE(attendant_id, 0)", "'Em andamento'",
+         SEGUNDOS_ENTRE.format(fim="started_at", inicio="created_at")),
+        ("closed_at", "COALESCE(attendant_id, 0)", "'Fechado'",
+         SEGUNDOS_ENTRE.format(fim="closed_at", inicio="created_at")),
+    ]
+
+    for data, atendente, status, segundos in partes:
+        cursor.execute(f"""
+            INSERT INTO ticket_stats_dia (dia, attendant_id, status, quantidade, segundos_total)
+            SELECT date({data}), {atendente}, {status}, COUNT(*), COALESCE(SUM({segundos}), 0)
+            FROM ({todos})
+            WHERE date({data}) IS NOT NULL
+            GROUP BY 1, 2
+            ON CONFLICT (dia, attendant_id, status) DO UPDATE
+            SET quantidade = quantidade + excluded.quantidade,
+                segundos_total = segundos_total + excluded.segundos_total
+        """)
+
+
+def migracao_009_estatisticas(cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS ticket_stats_dia (
+            dia TEXT NOT NULL,
+            attendant_id INTEGER NOT NULL,
+            status TEXT NOT NULL,
+            quantidade INTEGER NOT NULL DEFAULT 0,
+            segundos_total INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (dia, attendant_id, status)
+        )
+    """)
+
+    preencher_estatisticas(cursor)
+
+    somar = """
+        INSERT INTO ticket_stats_dia (dia, attendant_id, status, quantidade, segundos_total)
+        VALUES (date({data}), {atendente}, {status}, 1, {segundos})
+        ON CONFLICT (dia, attendant_id, status) DO UPDATE
+        SET quantidade = quantidade + 1,
+            segundos_total = segundos_total + excluded.segundos_total;
+    """
+
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_ticket_stats_criado
+        AFTER INSERT ON tickets
+        WHEN date(NEW.created_at) IS NOT NULL
+        BEGIN
+            {somar.format(data="NEW.created_at", atendente="0", status="'Aberto'", segundos="0")}
+        END
+    """)
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_ticket_stats_iniciado
+        AFTER UPDATE OF status ON tickets
+        WHEN NEW.status = 'Em andamento' AND OLD.status IS NOT 'Em andamento'
+         AND date(NEW.started_at) IS NOT NULL
+        BEGIN
+            {somar.format(data="NEW.started_at", atendente="COALESCE(NEW.attendant_id, 0)",
+                          status="'Em andamento'",
+                          segundos=SEGUNDOS_ENTRE.format(fim="NEW.started_at", inicio="NEW.created_at"))}
+        END
+    """)
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_ticket_stats_fechado
+        AFTER UPDATE OF status ON tickets
+        WHEN NEW.status = 'Fechado' AND OLD.status IS NOT 'Fechado'
+         AND date(NEW.closed_at) IS NOT NULL
+        BEGIN
+            {somar.format(data="NEW.closed_at", atendente="COALESCE(NEW.attendant_id, 0)",
+                          status="'Fechado'",
+                          segundos=SEGUNDOS_ENTRE.format(fim="NEW.closed_at", inicio="NEW.created_at"))}
+        END
+    """)
+
+
+def migracao_010_eventos(cursor):
+    # Log só de inserção: cada mudança do ticket vira uma linha, na mesma
+    # transação do UPDATE. As colunas de status do tickets continuam lá
+    # como "foto" do estado atual (os boards leem delas).
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS ticket_events (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            ticket_id INTEGER NOT NULL,
+            tipo TEXT NOT NULL,
+            actor_id INTEGER,
+            created_at TEXT NOT NULL,
+            payload TEXT NOT NULL DEFAULT '{}'
+        )
+    """)
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_ticket_events_ticket
+        ON ticket_events (ticket_id, id)
+    """)
+
+    # Histórico que já existe (tickets + arquivo), em ordem de data
+    todos = """
+        SELECT id, titulo, user_id, attendant_id, created_at, started_at, closed_at,
+               is_hidden, hidden_by, hidden_at
+        FROM tickets
+        UNION ALL
+        SELECT id, titulo, user_id, attendant_id, created_at, started_at, closed_at,
+               is_hidden, hidden_by, hidden_at
+        FROM tickets_arquivo
+    """
+    comentarios = """
+        SELECT id, ticket_id, user_id, created_at FROM ticket_comments
+        UNION ALL
+        SELECT id, ticket_id, user_id, created_at FROM ticket_comments_arquivo
+    """
+
+    cursor.execute(f"""
+        INSERT INTO ticket_events (ticket_id, tipo, actor_id, created_at, payload)
+        SELECT ticket_id, tipo, actor_id, created_at, payload
+        FROM (
+            SELECT id AS ticket_id, 'ticket_created' AS tipo, user_id AS actor_id,
+                   created_at, json_object('titulo', titulo, 'status', 'Aberto') AS payload,
+                   1 AS ordem
+            FROM ({todos})
+            UNION ALL
+            SELECT id, 'ticket_started', attendant_id, started_at,
+                   json_object('status', 'Em andamento', 'antes', 'Aberto'), 2
+            FROM ({todos}) WHERE started_at IS NOT NULL
+            UNION ALL
+            SELECT id, 'ticket_closed', attendant_id, closed_at,
+                   json_object('status', 'Fechado', 'antes', 'Em andamento'), 3
+            FROM ({todos}) WHERE closed_at IS NOT NULL
+            UNION ALL
+            SELECT id, 'ticket_hidden', hidden_by, hidden_at, '{{}}', 4
+            FROM ({todos}) WHERE is_hidden = 1 AND hidden_at IS NOT NULL
+            UNION ALL
+            SELECT ticket_id, 'comment_added', user_id, created_at,
+                   json_object('comment_id', id), 5
+            FROM ({comentarios})
+        )
+        WHERE created_at IS NOT NULL
+        ORDER BY created_at, ticket_id, ordem
+    """)
+
+
+# ============================================================
+# 11) VERSÃO DAS LEITURAS DE CADA USUÁRIO (ETag DA API DOS BOARDS)
+# ============================================================
+def migracao_011_versao_leituras(cursor):
+    # +1 a cada leitura gravada (os 🔴/🟡 daquele usuário podem ter
+    # mudado). Junto com o último ticket_events.id e os ticket_totais, a
+    # API dos boards sabe se o board mudou sem montar o board.
+    adicionar_coluna(cursor, "users", "leituras_versao", "INTEGER NOT NULL DEFAULT 0")
+
+    # Vale também para o DO UPDATE do upsert do gravar_leituras
+    for operacao in ("INSERT", "UPDATE"):
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_comment_reads_versao_{operacao.lower()}
+            AFTER {operacao} ON comment_reads
+            BEGIN
+                UPDATE users
+                SET leituras_versao = leituras_versao + 1
+                WHERE id = NEW.user_id;
+            END
+        """)
+
+
+# ============================================================
+# 12) BUSCA POR TEXTO NO ARQUIVO (FTS5)
+# ============================================================
+def migracao_012_busca_arquivo(cursor):
+    # O arquivamento apaga de tickets/ticket_comments (e os triggers da
+    # 006 tiram do tickets_fts/comments_fts): o arquivo ganha índices
+    # próprios, no mesmo formato, e a busca junta os dois
+    cursor.execute("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS tickets_arquivo_fts USING fts5(
+            titulo, descricao,
+            content = 'tickets_arquivo', content_rowid = 'id',
+            tokenize = 'unicode61 remove_diacritics 2'
+        )
+    """)
+    cursor.execute("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS comments_arquivo_fts USING fts5(
+            comment,
+            content = 'ticket_comments_arquivo', content_rowid = 'id',
+            tokenize = 'unicode61 remove_diacritics 2'
+        )
+    """)
+
+    # O arquivo só recebe INSERT (arquivar_tickets.py); DELETE para
+    # limpeza manual
+    for fts, tabela, colunas in (
+        ("tickets_arquivo_fts", "tickets_arquivo", ("titulo", "descricao")),
+        ("comments_arquivo_fts", "ticket_comments_arquivo", ("comment",)),
+    ):
+        lista = ", ".join(colunas)
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_{fts}_insert
+            AFTER INSERT ON {tabela}
+            BEGIN
+                INSERT INTO {fts} (rowid, {lista})
+                VALUES (NEW.id, {", ".join(f"NEW.{c}" for c in colunas)});
+            END
+        """)
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_{fts}_delete
+            AFTER DELETE ON {tabela}
+            BEGIN
+                INSERT INTO {fts} ({fts}, rowid, {lista})
+                VALUES ('delete', OLD.id, {", ".join(f"OLD.{c}" for c in colunas)});
+            END
+        """)
+
+        # Indexa o que já foi arquivado
+        cursor.execute(f"INSERT INTO {fts} ({fts}) VALUES ('rebuild')")
+
+
+# Roda só em banco na versão 0 (não tem PRAGMA user_version próprio)
+SCHEMA_BASE = (0, "schema base (users, tickets, ticket_comments)", migracao_000_schema_base)
+
+MIGRACOES = [
+    (1, "índices dos boards e dos comentários", migracao_001_indices),
+    (2, "índice da coluna de ocultados", migracao_002_indice_ocultados),
+    (3, "contadores de comentários no ticket", migracao_003_contadores_comentarios),
+    (4, "leitura de comentários/status por usuário", migracao_004_leitura_por_usuario),
+    (5, "datas em ISO-8601", migracao_005_datas_iso),
+    (6, "busca por texto (FTS5) em tickets e comentários", migracao_006_busca_texto),
+    (7, "tabelas de arquivo de tickets e comentários", migracao_007_arquivo),
+    (8, "totais de tickets por estado", migracao_008_totais_tickets),
+    (9, "estatísticas por dia, atendente e status", migracao_009_estatisticas),
+    (10, "log de eventos dos tickets", migracao_010_eventos),
+    (11, "versão das leituras de cada usuário", migracao_011_versao_leituras),
+    (12, "busca por texto (FTS5) no arquivo", migracao_012_busca_arquivo),
+]
+
+VERSAO_ATUAL = MIGRACOES[-1][0]
+
+
+def versao_do_banco(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrar(conn):
+    """
+    Aplica as migrações pendentes. Retorna a lista de versões aplicadas.
+    """
+    aplicadas = []
+    versao = versao_do_banco(conn)
+    pendentes = [migracao for migracao in MIGRACOES if migracao[0] > versao]
+    if versao == 0:
+        pendentes.insert(0, SCHEMA_BASE)
+
+    for numero, descricao, funcao in pendentes:
+        cursor = conn.cursor()
+        try:
+            cursor.execute("BEGIN")
+            funcao(cursor)
+            cursor.execute(f"PRAGMA user_version = {numero}")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+        aplicadas.append(numero)
+        print(f"✅ Migração {numero:03d} aplicada: {descricao}")
+
+    return aplicadas
+
+
+if __name__ == "__main__":
+    caminho = sys.argv[1] if len(sys.argv) > 1 else "database.db"
+
+    conn = sqlite3.connect(caminho)
+    antes = versao_do_banco(conn)
+    aplicadas = migrar(conn)
+    conn.close()
+
+    if aplicadas:
+        print(f"\n✅ Banco migrado da versão {antes} para {aplicadas[-1]}!")
+    else:
+        print(f"ℹ️ Banco já está na versão {antes}, nada a fazer.")
@@ -0,0 +1,38 @@
+import sqlite3
+import sys
+
+from migrar_db import preencher_estatisticas
+
+# ============================================================
+# RECALCULA AS ESTATÍSTICAS (ticket_stats_dia) DO ZERO
+# ============================================================
+#
+# A tabela é mantida pelos triggers da migração 009 a cada criar /
+# iniciar / fechar. Este script refaz tudo a partir de tickets +
+# tickets_arquivo (backfill), por exemplo depois de corrigir datas
+# na mão ou importar tickets de outro sistema.
+#
+# Rodar:
+#   python recalcular_estatisticas.py                (usa database.db)
+#   python recalcular_estatisticas.py outro_banco.db
+#
+# ============================================================
+
+if __name__ == "__main__":
+    caminho = sys.argv[1] if len(sys.argv) > 1 else "database.db"
+
+    conn = sqlite3.connect(caminho, timeout=30)
+    cursor = conn.cursor()
+
+    try:
+        cursor.execute("BEGIN IMMEDIATE")
+        preencher_estatisticas(cursor)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+    linhas = cursor.execute("SELECT COUNT(*) FROM ticket_stats_dia").fetchone()[0]
+    conn.close()
+
+    print(f"✅ Estatísticas recalculadas: {linhas} linha(s) em ticket_stats_dia.")
@@ -0,0 +1,884 @@
+import re
+from collections import namedtuple
+
+# ============================================================
+# REPOSITÓRIOS (ACESSO A DADOS): SQLite E PostgreSQL
+# ============================================================
+#
+# As rotas do app.py não montam SQL: pedem para os repositórios de
+# usuários, tickets e comentários, que trabalham na conexão do request.
+#
+# - SQLite (padrão): database.db + migrar_db.py, um servidor só
+# - PostgreSQL: vários nós do app atrás de um balanceador, mesmo banco.
+#   O SQL é o mesmo; as classes *Postgres só trocam o que muda de
+#   dialeto (placeholders, RETURNING id, GREATEST, FOR UPDATE e a
+#   busca por texto). Schema em schema_postgres.sql.
+#   Driver: psycopg 3 + psycopg_pool, importados só quando usados:
+#     pip install "psycopg[binary]" psycopg_pool
+#
+# Os repositórios NÃO fazem commit: quem chama sabe onde a transação
+# termina (ex: UPDATE do ticket + evento no log, juntos).
+#
+# ============================================================
+
+
+# ============================================================
+# CONEXÃO POSTGRESQL (OPCIONAL)
+# ============================================================
+def _importar_psycopg():
+    try:
+        import psycopg
+        from psycopg.rows import dict_row
+    except ImportError as erro:
+        raise RuntimeError(
+            'BANCO = "postgres" precisa do psycopg 3: pip install "psycopg[binary]" psycopg_pool'
+        ) from erro
+    return psycopg, dict_row
+
+
+def classe_cursor_postgres():
+    """
+    psycopg.Cursor (o app herda dele o cursor que mede os comandos).
+    """
+    psycopg, _ = _importar_psycopg()
+    return psycopg.Cursor
+
+
+def conectar_postgres(dsn, cursor_factory=None):
+    """
+    Conexão avulsa (scripts, thread de leituras). Linhas como dict,
+    igual ao sqlite3.Row para quem lê linha["coluna"].
+    cursor_factory: classe dos cursores (None = psycopg.Cursor).
+    """
+    psycopg, dict_row = _importar_psycopg()
+    return psycopg.connect(dsn, row_factory=dict_row, cursor_factory=cursor_factory)
+
+
+def criar_pool_postgres(dsn, tamanho_min, tamanho_max, espera_seg, cursor_factory=None):
+    """
+    Pool de conexões do processo (cada nó do app tem o seu).
+    espera_seg: quanto um request espera por uma conexão livre.
+    """
+    _, dict_row = _importar_psycopg()
+    try:
+        from psycopg_pool import ConnectionPool
+    except ImportError as erro:
+        raise RuntimeError('BANCO = "postgres" precisa do psycopg_pool: pip install psycopg_pool') from erro
+
+    return ConnectionPool(dsn, min_size=tamanho_min, max_size=tamanho_max, timeout=espera_seg,
+                          kwargs={"row_factory": dict_row, "cursor_factory": cursor_factory},
+                          open=True)
+
+
+# ============================================================
+# BASE
+# ============================================================
+class Repositorio:
+    """
+    SQL escrito no formato do sqlite3: "?" e ":nome".
+    """
+    # SELECT ... FOR UPDATE das linhas que vão ser alteradas (SQLite
+    # não tem: o lock de escrita vem do BEGIN IMMEDIATE)
+    TRAVA_LINHAS = ""
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def sql(self, texto):
+        return texto
+
+    def executar(self, texto, params=()):
+        return self.conn.execute(self.sql(texto), params)
+
+    def executar_varios(self, texto, lista_params):
+        cursor = self.conn.cursor()
+        cursor.executemany(self.sql(texto), lista_params)
+        return cursor
+
+    def um(self, texto, params=()):
+        return self.executar(texto, params).fetchone()
+
+    def todos(self, texto, params=()):
+        return self.executar(texto, params).fetchall()
+
+    def inserir(self, texto, params=()):
+        """
+        INSERT de uma linha. Retorna o id criado.
+        """
+        return self.executar(texto, params).lastrowid
+
+    def travar_para_escrita(self):
+        """
+        Pega o lock de escrita ANTES de ler o que vai ser alterado.
+        """
+        self.executar("BEGIN IMMEDIATE")
+
+
+class DialetoPostgres:
+    """
+    Vai na frente da classe SQLite (class X(DialetoPostgres, RepositorioX)):
+    mesmo SQL, convertido para o psycopg.
+    """
+    TRAVA_LINHAS = " FOR UPDATE OF tickets"
+
+    def sql(self, texto):
+        texto = texto.replace("%", "%%")
+        texto = re.sub(r"(?<!:):([a-z_]+)", r"%(\1)s", texto)
+        return texto.replace("?", "%s")
+
+    def inserir(self, texto, params=()):
+        return self.executar(texto + " RETURNING id", params).fetchone()["id"]
+
+    def travar_para_escrita(self):
+        # O psycopg abre a transação sozinho no primeiro comando; as
+        # linhas são travadas pelo SELECT ... FOR UPDATE (TRAVA_LINHAS)
+        pass
+
+
+def marcadores(valores):
+    return ", ".join("?" for _ in valores)
+
+
+# ============================================================
+# USUÁRIOS
+# ============================================================
+class RepositorioUsuarios(Repositorio):
+    def por_username(self, username):
+        return self.um("SELECT * FROM users WHERE username = ?", (username,))
+
+    def username_existe(self, username):
+        return self.um("SELECT id FROM users WHERE username = ?", (username,)) is not None
+
+    def criar(self, username, senha_hash, nivel=0):
+        return self.inserir(
+            "INSERT INTO users (username, email, senha, is_admin) VALUES (?, ?, ?, ?)",
+            (username, None, senha_hash, nivel)
+        )
+
+    def trocar_senha(self, user_id, senha_hash):
+        self.executar("UPDATE users SET senha = ? WHERE id = ?", (senha_hash, user_id))
+
+
+# ============================================================
+# TICKETS: SQL
+# ============================================================
+SELECT_ACESSO_TICKET = """
+    SELECT
+        tickets.id,
+        tickets.titulo,
+        tickets.descricao,
+        tickets.status,
+        tickets.user_id,
+        tickets.attendant_id,
+        tickets.created_at,
+        tickets.started_at,
+        tickets.closed_at,
+        tickets.is_hidden,
+        creator.username AS creator_username,
+        attendant.username AS attendant_username,
+        hider.username AS hider_username,
+        tickets.hidden_at,
+        tickets.last_status_at,
+        tickets.last_status_by,
+        tickets.last_comment_id,
+        tickets.comment_count,
+        leitura.last_seen_comment_id AS seen_comment_id,
+        leitura.last_seen_status_at AS seen_status_at
+    FROM tickets
+    JOIN users AS creator ON tickets.user_id = creator.id
+    LEFT JOIN users AS attendant ON tickets.attendant_id = attendant.id
+    LEFT JOIN users AS hider ON tickets.hidden_by = hider.id
+    LEFT JOIN comment_reads AS leitura
+           ON leitura.ticket_id = tickets.id AND leitura.user_id = ?
+"""
+
+# Mesmo SELECT em tickets_arquivo (alias "tickets": o resto da query não muda)
+SELECT_ACESSO_TICKET_ARQUIVO = SELECT_ACESSO_TICKET.replace(
+    "FROM tickets\n", "FROM tickets_arquivo AS tickets\n", 1)
+
+# UPDATE de cada ação com as mesmas travas de status (se outra pessoa
+# mudou o ticket antes, o WHERE não casa)
+SQL_ACOES_STATUS = {
+    "start": """
+        UPDATE tickets
+        SET status = 'Em andamento',
+            attendant_id = :user_id,
+            started_at = :agora,
+            last_status_at = :agora,
+            last_status_by = :user_id
+        WHERE id = :id
+          AND status = 'Aberto'
+          AND is_hidden = 0
+    """,
+    "close": """
+        UPDATE tickets
+        SET status = 'Fechado',
+            closed_at = :agora,
+            last_status_at = :agora,
+            last_status_by = :user_id
+        WHERE id = :id
+          AND status = 'Em andamento'
+          AND is_hidden = 0
+    """,
+    "hide": """
+        UPDATE tickets
+        SET is_hidden = 1,
+            hidden_by = :user_id,
+            hidden_at = :agora
+        WHERE id = :id
+          AND status = 'Fechado'
+          AND is_hidden = 0
+    """,
+}
+
+SELECT_KANBAN = """
+    SELECT
+        tickets.id,
+        tickets.titulo,
+        tickets.descricao,
+        tickets.status,
+        tickets.created_at,
+        tickets.started_at,
+        tickets.closed_at,
+        tickets.is_hidden,
+        creator.username AS creator_username,
+        attendant.username AS attendant_username,
+
+        tickets.last_status_at,
+        tickets.last_status_by,
+        tickets.last_comment_id,
+        leitura.last_seen_status_at AS seen_status_at
+    FROM tickets
+    JOIN users AS creator ON tickets.user_id = creator.id
+    LEFT JOIN users AS attendant ON tickets.attendant_id = attendant.id
+    LEFT JOIN comment_reads AS leitura
+           ON leitura.ticket_id = tickets.id
+          AND leitura.user_id = ?
+"""
+
+SELECT_KANBAN_ADMIN = """
+    SELECT
+        tickets.id,
+        tickets.titulo,
+        tickets.descricao,
+        tickets.status,
+        tickets.created_at,
+        tickets.started_at,
+        tickets.closed_at,
+        tickets.is_hidden,
+        creator.username AS creator_username,
+        attendant.username AS attendant_username,
+        hider.username AS hider_username,
+        tickets.hidden_at,
+
+        tickets.last_status_at,
+        tickets.last_status_by,
+        tickets.last_comment_id,
+        leitura.last_seen_status_at AS seen_status_at
+    FROM tickets
+    JOIN users AS creator ON tickets.user_id = creator.id
+    LEFT JOIN users AS attendant ON tickets.attendant_id = attendant.id
+    LEFT JOIN users AS hider ON tickets.hidden_by = hider.id
+    LEFT JOIN comment_reads AS leitura
+           ON leitura.ticket_id = tickets.id
+          AND leitura.user_id = ?
+"""
+
+
+# Coluna "Arquivados" do admin: mesmo SELECT em tickets_arquivo.
+# Arquivado não tem novidade: seen_status_at = last_status_at (sem 🟡)
+# e o 🔴 só olha tickets (sem contador).
+SELECT_KANBAN_ARQUIVO = SELECT_KANBAN_ADMIN.replace(
+    "FROM tickets\n", "FROM tickets_arquivo AS tickets\n", 1
+).replace(
+    "leitura.last_seen_status_at AS seen_status_at", "tickets.last_status_at AS seen_status_at", 1
+)
+
+
+def colunas_do_board(nivel, user_id):
+    """
+    Retorna as colunas do kanban de cada perfil, na ordem da tela:
+    {nome_coluna: (query, params)}
+
+    O primeiro parâmetro de todas é o user_id do LEFT JOIN em
+    comment_reads (leitura do próprio usuário, para o 🟡).
+
+    As queries ficam aqui (e não dentro das rotas) para o
+    checar_planos.py conseguir rodar EXPLAIN QUERY PLAN nelas.
+    """
+    if nivel == 0:
+        return {
+            "abertos": (SELECT_KANBAN + """
+                WHERE tickets.is_hidden = 0
+                  AND tickets.user_id = ?
+                  AND tickets.status = 'Aberto'
+            """, (user_id, user_id)),
+            "andamento": (SELECT_KANBAN + """
+                WHERE tickets.is_hidden = 0
+                  AND tickets.user_id = ?
+                  AND tickets.status = 'Em andamento'
+            """, (user_id, user_id)),
+            "fechados": (SELECT_KANBAN + """
+                WHERE tickets.is_hidden = 0
+                  AND tickets.user_id = ?
+                  AND tickets.status = 'Fechado'
+            """, (user_id, user_id)),
+        }
+
+    if nivel == 1:
+        return {
+            "abertos": (SELECT_KANBAN + """
+                WHERE tickets.is_hidden = 0
+                  AND tickets.status = 'Aberto'
+            """, (user_id,)),
+            "andamento": (SELECT_KANBAN + """
+                WHERE tickets.is_hidden = 0
+                  AND tickets.status = 'Em andamento'
+                  AND tickets.attendant_id = ?
+            """, (user_id, user_id)),
+            "fechados": (SELECT_KANBAN + """
+                WHERE tickets.is_hidden = 0
+                  AND tickets.status = 'Fechado'
+                  AND tickets.attendant_id = ?
+            """, (user_id, user_id)),
+        }
+
+    return {
+        "abertos": (SELECT_KANBAN_ADMIN + """
+            WHERE tickets.is_hidden = 0
+              AND tickets.status = 'Aberto'
+        """, (user_id,)),
+        "andamento": (SELECT_KANBAN_ADMIN + """
+            WHERE tickets.is_hidden = 0
+              AND tickets.status = 'Em andamento'
+        """, (user_id,)),
+        "fechados": (SELECT_KANBAN_ADMIN + """
+            WHERE tickets.is_hidden = 0
+              AND tickets.status = 'Fechado'
+        """, (user_id,)),
+        "ocultados": (SELECT_KANBAN_ADMIN + """
+            WHERE tickets.is_hidden = 1
+        """, (user_id,)),
+        # id > 0: vira SEARCH pela chave (mesmo plano da página com cursor)
+        "arquivados": (SELECT_KANBAN_ARQUIVO + """
+            WHERE tickets.id > 0
+        """, (user_id,)),
+    }
+
+
+def montar_sql_pagina(query_base, params_base, por_pagina, before_id=None, after_id=None):
+    """
+    Uma página (por_pagina + 1 linhas) de uma coluna, pelo cursor
+    tickets.id (ver PAGINAÇÃO no app.py).
+    """
+    if after_id is not None:
+        return (query_base + " AND tickets.id > ? ORDER BY tickets.id ASC LIMIT ?",
+                params_base + (after_id, por_pagina + 1))
+
+    if before_id is not None:
+        return (query_base + " AND tickets.id < ? ORDER BY tickets.id DESC LIMIT ?",
+                params_base + (before_id, por_pagina + 1))
+
+    return (query_base + " ORDER BY tickets.id DESC LIMIT ?",
+            params_base + (por_pagina + 1,))
+
+
+def montar_sql_board(colunas, cursores, por_pagina):
+    """
+    Junta a página de cada coluna num único SELECT com UNION ALL.
+    Cada parte continua usando o seu índice + cursor (LIMIT por_pagina + 1);
+    a coluna de origem vem em "coluna".
+    """
+    partes = []
+    params = ()
+
+    for coluna, (query, params_base) in colunas.items():
+        before_id, after_id = cursores.get(coluna, (None, None))
+        sql, params_pagina = montar_sql_pagina(query, params_base, por_pagina, before_id, after_id)
+
+        partes.append(f"SELECT '{coluna}' AS coluna, pagina.* FROM ({sql}) AS pagina")
+        params += params_pagina
+
+    return "\nUNION ALL\n".join(partes), params
+
+
+def filtro_visibilidade(nivel, user_id):
+    """
+    Quem vê o quê (mesmas regras dos boards / calcular_permissoes["ver"]).
+    Retorna (sql, params) para usar no WHERE.
+    """
+    if nivel == 2:
+        return "1 = 1", ()
+    if nivel == 0:
+        return "tickets.user_id = ? AND tickets.is_hidden = 0", (user_id,)
+    if nivel == 1:
+        return ("tickets.is_hidden = 0 AND (tickets.status = 'Aberto' OR tickets.attendant_id = ?)",
+                (user_id,))
+    return "0 = 1", ()
+
+
+def termos_da_busca(texto):
+    """
+    Texto digitado -> consulta FTS5 segura.
+    Cada palavra vira um prefixo entre aspas ("impres"* acha impressora),
+    todas obrigatórias. Aspas/operadores digitados não quebram a consulta.
+    """
+    palavras = re.findall(r"\w+", texto.lower())[:10]
+    return " ".join(f'"{palavra}"*' for palavra in palavras)
+
+
+def montar_sql_busca(nivel, user_id, termos, limite):
+    """
+    Junta os achados no ticket e nos comentários, da tabela quente e do
+    arquivo, fica com a melhor nota (bm25: menor = mais relevante) e o
+    trecho dela por ticket, e filtra pelo que o perfil pode ver.
+    """
+    filtro, params_filtro = filtro_visibilidade(nivel, user_id)
+
+    # Mesmo SELECT para tickets e tickets_arquivo (alias "tickets": o
+    # filtro de visibilidade não muda); cada ticket está em um dos dois
+    select_tickets = f"""
+        SELECT
+            tickets.id AS id,
+            tickets.titulo,
+            tickets.status,
+            tickets.is_hidden,
+            tickets.created_at,
+            creator.username AS creator_username,
+            melhor.trecho,
+            melhor.arquivado,
+            melhor.nota
+        FROM melhor
+        JOIN {{tabela}} AS tickets ON tickets.id = melhor.ticket_id
+        JOIN users AS creator ON tickets.user_id = creator.id
+        WHERE melhor.arquivado = {{arquivado}}
+          AND {filtro}
+    """
+
+    sql = f"""
+        WITH achados AS (
+            SELECT rowid AS ticket_id, 0 AS arquivado,
+                   bm25(tickets_fts, 10.0, 1.0) AS nota,
+                   snippet(tickets_fts, -1, '', '', '…', 12) AS trecho
+            FROM tickets_fts
+            WHERE tickets_fts MATCH ?
+
+            UNION ALL
+
+            SELECT tc.ticket_id, 0,
+                   bm25(comments_fts) AS nota,
+                   snippet(comments_fts, 0, '', '', '…', 12) AS trecho
+            FROM comments_fts
+            JOIN ticket_comments AS tc ON tc.id = comments_fts.rowid
+            WHERE comments_fts MATCH ?
+
+            UNION ALL
+
+            SELECT rowid, 1,
+                   bm25(tickets_arquivo_fts, 10.0, 1.0),
+                   snippet(tickets_arquivo_fts, -1, '', '', '…', 12)
+            FROM tickets_arquivo_fts
+            WHERE tickets_arquivo_fts MATCH ?
+
+            UNION ALL
+
+            SELECT tc.ticket_id, 1,
+                   bm25(comments_arquivo_fts),
+                   snippet(comments_arquivo_fts, 0, '', '', '…', 12)
+            FROM comments_arquivo_fts
+            JOIN ticket_comments_arquivo AS tc ON tc.id = comments_arquivo_fts.rowid
+            WHERE comments_arquivo_fts MATCH ?
+        ),
+        melhor AS (
+            SELECT ticket_id, arquivado, MIN(nota) AS nota, trecho
+            FROM achados
+            GROUP BY ticket_id
+        )
+        {select_tickets.format(tabela="tickets", arquivado=0)}
+
+        UNION ALL
+
+        {select_tickets.format(tabela="tickets_arquivo", arquivado=1)}
+
+        ORDER BY nota, id DESC
+        LIMIT ?
+    """
+    return sql, (termos, termos, termos, termos, *params_filtro, *params_filtro, limite)
+
+
+# ============================================================
+# TICKETS
+# ============================================================
+class RepositorioTickets(Repositorio):
+    def acesso(self, ticket_ids, user_id, travar=False):
+        """
+        Tickets (tabela quente; o que não achar lá, no arquivo) com
+        criador/atendente/quem ocultou e a leitura de user_id.
+        Cada linha volta como dict com "arquivado".
+        travar=True: vai alterar esses tickets (FOR UPDATE no PostgreSQL).
+        """
+        linhas = self.todos(
+            SELECT_ACESSO_TICKET + f" WHERE tickets.id IN ({marcadores(ticket_ids)})"
+            + (self.TRAVA_LINHAS if travar else ""),
+            (user_id, *ticket_ids)
+        )
+        achados = {linha["id"] for linha in linhas}
+
+        no_arquivo = [ticket_id for ticket_id in ticket_ids if ticket_id not in achados]
+        if no_arquivo:
+            linhas += self.todos(
+                SELECT_ACESSO_TICKET_ARQUIVO + f" WHERE tickets.id IN ({marcadores(no_arquivo)})",
+                (user_id, *no_arquivo)
+            )
+
+        return [{**dict(linha), "arquivado": linha["id"] not in achados} for linha in linhas]
+
+    def localizar(self, ticket_id):
+        """
+        (id, is_hidden) do ticket na tabela quente ou no arquivo, ou None.
+        """
+        return self.um("""
+            SELECT id, is_hidden FROM tickets WHERE id = ?
+            UNION ALL
+            SELECT id, is_hidden FROM tickets_arquivo WHERE id = ?
+        """, (ticket_id, ticket_id))
+
+    def criar(self, titulo, descricao, user_id, agora):
+        return self.inserir("""
+            INSERT INTO tickets
+            (titulo, descricao, status, user_id, created_at, is_hidden,
+             last_status_at, last_status_by)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        """, (titulo, descricao, 'Aberto', user_id, agora, 0, agora, user_id))
+
+    def aplicar_acao(self, acao, ticket_ids, user_id, agora):
+        self.executar_varios(SQL_ACOES_STATUS[acao], [
+            {"id": ticket_id, "user_id": user_id, "agora": agora}
+            for ticket_id in ticket_ids
+        ])
+
+    def desocultar(self, ticket_id):
+        self.executar("""
+            UPDATE tickets
+            SET is_hidden = 0,
+                hidden_by = NULL,
+                hidden_at = NULL
+            WHERE id = ?
+        """, (ticket_id,))
+
+    def board(self, colunas, cursores, por_pagina):
+        sql, params = montar_sql_board(colunas, cursores, por_pagina)
+        return self.todos(sql, params)
+
+    def buscar_texto(self, nivel, user_id, texto, limite):
+        termos = termos_da_busca(texto)
+        if not termos:
+            return []
+        return self.todos(*montar_sql_busca(nivel, user_id, termos, limite))
+
+    def versao_do_board(self, user_id):
+        """
+        Muda sempre que um board de user_id pode ter mudado: evento novo
+        (criar, status, ocultar, comentário), ticket saindo da tabela
+        (arquivo: ticket_totais) ou leitura nova do próprio usuário.
+        Três leituras por chave, sem olhar os tickets.
+        """
+        linha = self.um("""
+            SELECT
+                (SELECT MAX(id) FROM ticket_events) AS ultimo_evento,
+                (SELECT SUM(total) FROM ticket_totais) AS total_tickets,
+                (SELECT leituras_versao FROM users WHERE id = ?) AS leituras
+        """, (user_id,))
+        return linha["ultimo_evento"], linha["total_tickets"], linha["leituras"]
+
+    # ---------- log de eventos (ticket_events) ----------
+    def registrar_eventos(self, linhas):
+        """
+        linhas = [(ticket_id, tipo, actor_id, created_at, payload_json), ...]
+        """
+        self.executar_varios("""
+            INSERT INTO ticket_events (ticket_id, tipo, actor_id, created_at, payload)
+            VALUES (?, ?, ?, ?, ?)
+        """, linhas)
+
+    def eventos_do_ticket(self, ticket_id, after_id=0, sem_comentarios=False):
+        filtro = "AND e.tipo != 'comment_added'" if sem_comentarios else ""
+        return self.todos(f"""
+            SELECT e.id, e.ticket_id, e.tipo, e.actor_id, u.username AS actor_username,
+                   e.created_at, e.payload
+            FROM ticket_events e
+            LEFT JOIN users u ON u.id = e.actor_id
+            WHERE e.ticket_id = ?
+              AND e.id > ?
+              {filtro}
+            ORDER BY e.id
+        """, (ticket_id, after_id))
+
+    def ultimo_evento_id(self):
+        return self.um("SELECT COALESCE(MAX(id), 0) AS id FROM ticket_events")["id"]
+
+    def eventos(self, after_id, limite):
+        return self.todos("""
+            SELECT e.id, e.ticket_id, e.tipo, e.actor_id, u.username AS actor_username,
+                   e.created_at, e.payload
+            FROM ticket_events e
+            LEFT JOIN users u ON u.id = e.actor_id
+            WHERE e.id > ?
+            ORDER BY e.id
+            LIMIT ?
+        """, (after_id, limite))
+
+    # ---------- números (ticket_totais / ticket_stats_dia) ----------
+    def totais_por_estado(self):
+        return {linha["estado"]: linha["total"]
+                for linha in self.todos("SELECT estado, total FROM ticket_totais")}
+
+    def estatisticas_por_atendente(self, desde):
+        """
+        desde = "AAAA-MM-DD" (primeiro dia que entra).
+        """
+        return self.todos("""
+            SELECT
+                stats.attendant_id,
+                COALESCE(users.username, '—') AS atendente,
+                SUM(CASE WHEN stats.status = 'Em andamento' THEN stats.quantidade ELSE 0 END) AS iniciados,
+                SUM(CASE WHEN stats.status = 'Fechado' THEN stats.quantidade ELSE 0 END) AS fechados,
+                SUM(CASE WHEN stats.status = 'Em andamento' THEN stats.segundos_total ELSE 0 END) * 1.0
+                    / NULLIF(SUM(CASE WHEN stats.status = 'Em andamento' THEN stats.quantidade ELSE 0 END), 0)
+                    AS media_para_iniciar,
+                SUM(CASE WHEN stats.status = 'Fechado' THEN stats.segundos_total ELSE 0 END) * 1.0
+                    / NULLIF(SUM(CASE WHEN stats.status = 'Fechado' THEN stats.quantidade ELSE 0 END), 0)
+                    AS media_para_fechar
+            FROM ticket_stats_dia AS stats
+            LEFT JOIN users ON users.id = stats.attendant_id
+            WHERE stats.dia >= ?
+              AND stats.status IN ('Em andamento', 'Fechado')
+            GROUP BY stats.attendant_id, users.username
+            ORDER BY fechados DESC, iniciados DESC
+        """, (desde,))
+
+    def estatisticas_por_dia(self, desde):
+        return self.todos("""
+            SELECT
+                dia,
+                SUM(CASE WHEN status = 'Aberto' THEN quantidade ELSE 0 END) AS criados,
+                SUM(CASE WHEN status = 'Em andamento' THEN quantidade ELSE 0 END) AS iniciados,
+                SUM(CASE WHEN status = 'Fechado' THEN quantidade ELSE 0 END) AS fechados
+            FROM ticket_stats_dia
+            WHERE dia >= ?
+            GROUP BY dia
+            ORDER BY dia DESC
+        """, (desde,))
+
+
+# ============================================================
+# COMENTÁRIOS (E LEITURAS 🔴/🟡)
+# ============================================================
+class RepositorioComentarios(Repositorio):
+    # MAX para nunca voltar a leitura (a gravação em segundo plano pode
+    # chegar depois de uma mais nova)
+    SQL_GRAVAR_LEITURAS = """
+        INSERT INTO comment_reads
+        (ticket_id, user_id, last_seen_comment_id, last_seen_status_at, updated_at)
+        VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT (ticket_id, user_id) DO UPDATE
+        SET last_seen_comment_id = MAX(comment_reads.last_seen_comment_id,
+                                       excluded.last_seen_comment_id),
+            last_seen_status_at = MAX(COALESCE(comment_reads.last_seen_status_at, ''),
+                                      excluded.last_seen_status_at),
+            updated_at = excluded.updated_at
+    """
+
+    def criar(self, ticket_id, user_id, comment, agora):
+        return self.inserir("""
+            INSERT INTO ticket_comments (ticket_id, user_id, comment, created_at)
+            VALUES (?, ?, ?, ?)
+        """, (ticket_id, user_id, comment, agora))
+
+    def pagina(self, ticket_id, por_pagina, before_id=None, after_id=None, arquivado=False):
+        """
+        Até por_pagina + 1 comentários a partir do cursor:
+        - after_id: crescente (os posteriores)
+        - before_id / sem cursor: decrescente (os anteriores / os mais novos)
+        """
+        tabela = "ticket_comments_arquivo" if arquivado else "ticket_comments"
+
+        select = f"""
+            SELECT
+                tc.id,
+                tc.comment,
+                tc.created_at,
+                u.username AS author
+            FROM {tabela} tc
+            JOIN users u ON tc.user_id = u.id
+            WHERE tc.ticket_id = ?
+        """
+
+        if after_id is not None:
+            return self.todos(select + " AND tc.id > ? ORDER BY tc.id ASC LIMIT ?",
+                              (ticket_id, after_id, por_pagina + 1))
+
+        if before_id is not None:
+            return self.todos(select + " AND tc.id < ? ORDER BY tc.id DESC LIMIT ?",
+                              (ticket_id, before_id, por_pagina + 1))
+
+        return self.todos(select + " ORDER BY tc.id DESC LIMIT ?",
+                          (ticket_id, por_pagina + 1))
+
+    def nao_lidos(self, ticket_ids, user_id):
+        """
+        {ticket_id: comentários de OUTRAS pessoas depois da leitura de
+        user_id}. Ticket cujo last_comment_id (do trigger) não passou do que
+        o usuário viu é descartado só olhando tickets + comment_reads; o
+        COUNT só roda para quem tem comentário novo e lê só o trecho do
+        índice (ticket_id, id, user_id) depois da leitura.
+        """
+        linhas = self.todos(f"""
+            SELECT
+                tickets.id AS ticket_id,
+                (
+                    SELECT COUNT(*)
+                    FROM ticket_comments tc
+                    WHERE tc.ticket_id = tickets.id
+                      AND tc.id > COALESCE(leitura.last_seen_comment_id, 0)
+                      AND tc.user_id != ?
+                ) AS total
+            FROM tickets
+            LEFT JOIN comment_reads AS leitura
+                   ON leitura.ticket_id = tickets.id
+                  AND leitura.user_id = ?
+            WHERE tickets.id IN ({marcadores(ticket_ids)})
+              AND tickets.last_comment_id > COALESCE(leitura.last_seen_comment_id, 0)
+        """, (user_id, user_id, *ticket_ids))
+
+        return {linha["ticket_id"]: linha["total"] for linha in linhas if linha["total"]}
+
+    def gravar_leituras(self, linhas):
+        """
+        linhas = [(ticket_id, user_id, last_seen_comment_id, agora), ...]
+        """
+        self.executar_varios(self.SQL_GRAVAR_LEITURAS, [
+            (ticket_id, user_id, seen_id, agora, agora)
+            for ticket_id, user_id, seen_id, agora in linhas
+        ])
+
+
+# ============================================================
+# POSTGRESQL
+# ============================================================
+class RepositorioUsuariosPostgres(DialetoPostgres, RepositorioUsuarios):
+    pass
+
+
+class RepositorioTicketsPostgres(DialetoPostgres, RepositorioTickets):
+    # Mesmas expressões dos índices GIN do schema_postgres.sql (tickets e
+    # arquivo usam o alias "tickets"/"tc": uma expressão para os dois)
+    TEXTO_TICKET = "to_tsvector('portuguese', tickets.titulo || ' ' || tickets.descricao)"
+    TEXTO_COMENTARIO = "to_tsvector('portuguese', tc.comment)"
+
+    def buscar_texto(self, nivel, user_id, texto, limite):
+        """
+        Full-text do PostgreSQL no lugar do FTS5 (tabela quente e arquivo):
+        cada palavra vira prefixo (impres:* acha impressora), todas
+        obrigatórias; ts_rank maior = mais relevante.
+        """
+        palavras = re.findall(r"\w+", texto.lower())[:10]
+        if not palavras:
+            return []
+
+        termos = " & ".join(f"{palavra}:*" for palavra in palavras)
+        filtro, params_filtro = filtro_visibilidade(nivel, user_id)
+        trecho = "'StartSel=\"\", StopSel=\"\", MaxWords=12, MinWords=4'"
+
+        def achados(tabela_tickets, tabela_comentarios, arquivado):
+            return f"""
+                SELECT tickets.id AS ticket_id, {arquivado} AS arquivado,
+                       ts_rank({self.TEXTO_TICKET}, consulta.q) * 10 AS nota,
+                       ts_headline('portuguese', tickets.titulo || ' ' || tickets.descricao,
+                                   consulta.q, {trecho}) AS trecho
+                FROM {tabela_tickets} AS tickets, consulta
+                WHERE {self.TEXTO_TICKET} @@ consulta.q
+
+                UNION ALL
+
+                SELECT tc.ticket_id, {arquivado},
+                       ts_rank({self.TEXTO_COMENTARIO}, consulta.q),
+                       ts_headline('portuguese', tc.comment, consulta.q, {trecho})
+                FROM {tabela_comentarios} AS tc, consulta
+                WHERE {self.TEXTO_COMENTARIO} @@ consulta.q
+            """
+
+        def resultado(tabela_tickets, arquivado):
+            return f"""
+                SELECT
+                    tickets.id,
+                    tickets.titulo,
+                    tickets.status,
+                    tickets.is_hidden,
+                    tickets.created_at,
+                    creator.username AS creator_username,
+                    melhor.trecho,
+                    melhor.arquivado,
+                    melhor.nota
+                FROM melhor
+                JOIN {tabela_tickets} AS tickets ON tickets.id = melhor.ticket_id
+                JOIN users AS creator ON tickets.user_id = creator.id
+                WHERE melhor.arquivado = {arquivado}
+                  AND {filtro}
+            """
+
+        return self.todos(f"""
+            WITH consulta AS (
+                SELECT to_tsquery('portuguese', ?) AS q
+            ),
+            achados AS (
+                {achados("tickets", "ticket_comments", 0)}
+
+                UNION ALL
+
+                {achados("tickets_arquivo", "ticket_comments_arquivo", 1)}
+            ),
+            melhor AS (
+                SELECT DISTINCT ON (ticket_id) ticket_id, arquivado, nota, trecho
+                FROM achados
+                ORDER BY ticket_id, nota DESC
+            )
+            {resultado("tickets", 0)}
+
+            UNION ALL
+
+            {resultado("tickets_arquivo", 1)}
+
+            ORDER BY nota DESC, id DESC
+            LIMIT ?
+        """, (termos, *params_filtro, *params_filtro, limite))
+
+
+class RepositorioComentariosPostgres(DialetoPostgres, RepositorioComentarios):
+    # MAX(a, b) de duas colunas no PostgreSQL é GREATEST
+    SQL_GRAVAR_LEITURAS = RepositorioComentarios.SQL_GRAVAR_LEITURAS.replace(
+        "MAX(", "GREATEST("
+    )
+
+
+# ============================================================
+# FÁBRICA
+# ============================================================
+Repositorios = namedtuple("Repositorios", ["usuarios", "tickets", "comentarios"])
+
+CLASSES_POR_BANCO = {
+    "sqlite": (RepositorioUsuarios, RepositorioTickets, RepositorioComentarios),
+    "postgres": (RepositorioUsuariosPostgres, RepositorioTicketsPostgres,
+                 RepositorioComentariosPostgres),
+}
+
+
+def criar_repositorios(banco, conn):
+    """
+    Os três repositórios do banco ("sqlite" | "postgres") na mesma conexão.
+    """
+    if banco not in CLASSES_POR_BANCO:
+        raise ValueError(f"BANCO deve ser um de: {', '.join(CLASSES_POR_BANCO)}")
+
+    usuarios, tickets, comentarios = CLASSES_POR_BANCO[banco]
+    return Repositorios(usuarios(conn), tickets(conn), comentarios(conn))
@@ -0,0 +1,289 @@
+-- ============================================================
+-- SCHEMA DO HELP DESK NO POSTGRESQL (BANCO = "postgres")
+-- ============================================================
+--
+-- Equivalente ao database.db depois de todas as migrações do
+-- migrar_db.py (versão 12), para rodar vários nós do app atrás de
+-- um balanceador usando o mesmo banco.
+--
+-- - Datas continuam TEXT em ISO-8601 ("2026-01-13 11:10:00"): o app
+--   compara e ordena como texto igual no SQLite
+-- - Os triggers do SQLite (contadores de comentários, ticket_totais,
+--   ticket_stats_dia, versão das leituras) viraram funções plpgsql
+-- - Busca por texto: índices GIN de to_tsvector('portuguese', ...)
+--   no lugar das tabelas FTS5
+--
+-- Criar:
+--   psql "$HELPDESK_POSTGRES_DSN" -f schema_postgres.sql
+--
+-- versao_schema faz o papel do PRAGMA user_version: o create_app()
+-- do app.py recusa subir se não for igual a migrar_db.VERSAO_ATUAL.
+-- Mudou o schema? Atualize este arquivo E o número lá embaixo.
+--
+-- ============================================================
+
+CREATE TABLE IF NOT EXISTS users (
+    id BIGSERIAL PRIMARY KEY,
+    username TEXT NOT NULL UNIQUE,
+    email TEXT,
+    senha TEXT NOT NULL,
+    is_admin INTEGER NOT NULL,
+    leituras_versao INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS tickets (
+    id BIGSERIAL PRIMARY KEY,
+    titulo TEXT NOT NULL,
+    descricao TEXT NOT NULL,
+    status TEXT NOT NULL,
+    user_id BIGINT NOT NULL,
+    attendant_id BIGINT,
+    created_at TEXT NOT NULL,
+    started_at TEXT,
+    closed_at TEXT,
+    is_hidden INTEGER NOT NULL,
+    hidden_by BIGINT,
+    hidden_at TEXT,
+    last_status_at TEXT,
+    last_status_by BIGINT,
+    last_comment_id BIGINT,
+    last_comment_user_id BIGINT,
+    comment_count INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS ticket_comments (
+    id BIGSERIAL PRIMARY KEY,
+    ticket_id BIGINT NOT NULL,
+    user_id BIGINT NOT NULL,
+    comment TEXT NOT NULL,
+    created_at TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS comment_reads (
+    id BIGSERIAL PRIMARY KEY,
+    ticket_id BIGINT NOT NULL,
+    user_id BIGINT NOT NULL,
+    last_seen_comment_id BIGINT NOT NULL DEFAULT 0,
+    last_seen_status_at TEXT,
+    updated_at TEXT NOT NULL,
+    UNIQUE (ticket_id, user_id)
+);
+
+CREATE TABLE IF NOT EXISTS tickets_arquivo (
+    id BIGINT PRIMARY KEY,
+    titulo TEXT, descricao TEXT, status TEXT, user_id BIGINT, attendant_id BIGINT,
+    created_at TEXT, started_at TEXT, closed_at TEXT, is_hidden INTEGER,
+    hidden_by BIGINT, hidden_at TEXT, last_status_at TEXT, last_status_by BIGINT,
+    last_comment_id BIGINT, last_comment_user_id BIGINT, comment_count INTEGER,
+    arquivado_em TEXT
+);
+
+CREATE TABLE IF NOT EXISTS ticket_comments_arquivo (
+    id BIGINT PRIMARY KEY,
+    ticket_id BIGINT, user_id BIGINT, comment TEXT, created_at TEXT,
+    arquivado_em TEXT
+);
+
+CREATE TABLE IF NOT EXISTS ticket_totais (
+    estado TEXT PRIMARY KEY,
+    total INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS ticket_stats_dia (
+    dia TEXT NOT NULL,
+    attendant_id BIGINT NOT NULL,
+    status TEXT NOT NULL,
+    quantidade INTEGER NOT NULL DEFAULT 0,
+    segundos_total BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (dia, attendant_id, status)
+);
+
+CREATE TABLE IF NOT EXISTS ticket_events (
+    id BIGSERIAL PRIMARY KEY,
+    ticket_id BIGINT NOT NULL,
+    tipo TEXT NOT NULL,
+    actor_id BIGINT,
+    created_at TEXT NOT NULL,
+    payload TEXT NOT NULL DEFAULT '{}'
+);
+
+
+-- ============================================================
+-- ÍNDICES (OS MESMOS DAS MIGRAÇÕES 001, 002, 007 E 010)
+-- ============================================================
+CREATE INDEX IF NOT EXISTS idx_tickets_hidden_status_id
+    ON tickets (is_hidden, status, id);
+CREATE INDEX IF NOT EXISTS idx_tickets_user_hidden_status_id
+    ON tickets (user_id, is_hidden, status, id);
+CREATE INDEX IF NOT EXISTS idx_tickets_attendant_hidden_status_id
+    ON tickets (attendant_id, is_hidden, status, id);
+CREATE INDEX IF NOT EXISTS idx_tickets_hidden_id
+    ON tickets (is_hidden, id);
+CREATE INDEX IF NOT EXISTS idx_comments_ticket_id_user
+    ON ticket_comments (ticket_id, id, user_id);
+CREATE INDEX IF NOT EXISTS idx_comments_arquivo_ticket_id
+    ON ticket_comments_arquivo (ticket_id, id);
+CREATE INDEX IF NOT EXISTS idx_ticket_events_ticket
+    ON ticket_events (ticket_id, id);
+
+-- Busca por texto: as expressões têm que ser IGUAIS às do
+-- RepositorioTicketsPostgres para o índice ser usado
+CREATE INDEX IF NOT EXISTS idx_tickets_busca
+    ON tickets USING GIN (to_tsvector('portuguese', titulo || ' ' || descricao));
+CREATE INDEX IF NOT EXISTS idx_comments_busca
+    ON ticket_comments USING GIN (to_tsvector('portuguese', comment));
+-- Arquivo (migração 012: chamado arquivado continua na busca)
+CREATE INDEX IF NOT EXISTS idx_tickets_arquivo_busca
+    ON tickets_arquivo USING GIN (to_tsvector('portuguese', titulo || ' ' || descricao));
+CREATE INDEX IF NOT EXISTS idx_comments_arquivo_busca
+    ON ticket_comments_arquivo USING GIN (to_tsvector('portuguese', comment));
+
+
+-- ============================================================
+-- CONTADORES DE COMENTÁRIOS NO TICKET (MIGRAÇÃO 003)
+-- ============================================================
+CREATE OR REPLACE FUNCTION trg_ticket_comments_insert() RETURNS trigger AS $$
+BEGIN
+    UPDATE tickets
+    SET last_comment_id = NEW.id,
+        last_comment_user_id = NEW.user_id,
+        comment_count = comment_count + 1
+    WHERE id = NEW.ticket_id;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION trg_ticket_comments_delete() RETURNS trigger AS $$
+BEGIN
+    UPDATE tickets
+    SET comment_count = comment_count - 1,
+        last_comment_id = (
+            SELECT MAX(tc.id) FROM ticket_comments tc
+            WHERE tc.ticket_id = OLD.ticket_id
+        ),
+        last_comment_user_id = (
+            SELECT tc.user_id FROM ticket_comments tc
+            WHERE tc.ticket_id = OLD.ticket_id
+            ORDER BY tc.id DESC
+            LIMIT 1
+        )
+    WHERE id = OLD.ticket_id;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_ticket_comments_insert ON ticket_comments;
+CREATE TRIGGER trg_ticket_comments_insert
+    AFTER INSERT ON ticket_comments
+    FOR EACH ROW EXECUTE FUNCTION trg_ticket_comments_insert();
+
+DROP TRIGGER IF EXISTS trg_ticket_comments_delete ON ticket_comments;
+CREATE TRIGGER trg_ticket_comments_delete
+    AFTER DELETE ON ticket_comments
+    FOR EACH ROW EXECUTE FUNCTION trg_ticket_comments_delete();
+
+
+-- ============================================================
+-- TOTAIS POR ESTADO (MIGRAÇÃO 008)
+-- ============================================================
+CREATE OR REPLACE FUNCTION somar_ticket_total(estado_ TEXT, valor INTEGER) RETURNS void AS $$
+BEGIN
+    INSERT INTO ticket_totais (estado, total) VALUES (estado_, valor)
+    ON CONFLICT (estado) DO UPDATE SET total = ticket_totais.total + valor;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION trg_ticket_totais() RETURNS trigger AS $$
+DECLARE
+    antes TEXT;
+    depois TEXT;
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        antes := CASE WHEN OLD.is_hidden = 1 THEN 'ocultados' ELSE OLD.status END;
+    END IF;
+    IF TG_OP IN ('UPDATE', 'INSERT') THEN
+        depois := CASE WHEN NEW.is_hidden = 1 THEN 'ocultados' ELSE NEW.status END;
+    END IF;
+
+    IF antes IS DISTINCT FROM depois THEN
+        IF antes IS NOT NULL THEN
+            PERFORM somar_ticket_total(antes, -1);
+        END IF;
+        IF depois IS NOT NULL THEN
+            PERFORM somar_ticket_total(depois, 1);
+        END IF;
+    END IF;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_ticket_totais ON tickets;
+CREATE TRIGGER trg_ticket_totais
+    AFTER INSERT OR DELETE OR UPDATE OF status, is_hidden ON tickets
+    FOR EACH ROW EXECUTE FUNCTION trg_ticket_totais();
+
+
+-- ============================================================
+-- ESTATÍSTICAS POR DIA, ATENDENTE E STATUS (MIGRAÇÃO 009)
+-- ============================================================
+CREATE OR REPLACE FUNCTION somar_ticket_stats(quando TEXT, atendente BIGINT, status_ TEXT,
+                                              desde TEXT) RETURNS void AS $$
+BEGIN
+    IF quando IS NULL THEN
+        RETURN;
+    END IF;
+
+    INSERT INTO ticket_stats_dia (dia, attendant_id, status, quantidade, segundos_total)
+    VALUES (left(quando, 10), COALESCE(atendente, 0), status_, 1,
+            COALESCE(EXTRACT(EPOCH FROM (quando::timestamp - desde::timestamp))::BIGINT, 0))
+    ON CONFLICT (dia, attendant_id, status) DO UPDATE
+    SET quantidade = ticket_stats_dia.quantidade + 1,
+        segundos_total = ticket_stats_dia.segundos_total + excluded.segundos_total;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION trg_ticket_stats() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        PERFORM somar_ticket_stats(NEW.created_at, 0, 'Aberto', NEW.created_at);
+    ELSIF NEW.status = 'Em andamento' AND OLD.status IS DISTINCT FROM 'Em andamento' THEN
+        PERFORM somar_ticket_stats(NEW.started_at, NEW.attendant_id, 'Em andamento', NEW.created_at);
+    ELSIF NEW.status = 'Fechado' AND OLD.status IS DISTINCT FROM 'Fechado' THEN
+        PERFORM somar_ticket_stats(NEW.closed_at, NEW.attendant_id, 'Fechado', NEW.created_at);
+    END IF;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_ticket_stats ON tickets;
+CREATE TRIGGER trg_ticket_stats
+    AFTER INSERT OR UPDATE OF status ON tickets
+    FOR EACH ROW EXECUTE FUNCTION trg_ticket_stats();
+
+
+-- ============================================================
+-- VERSÃO DAS LEITURAS DE CADA USUÁRIO (MIGRAÇÃO 011)
+-- ============================================================
+CREATE OR REPLACE FUNCTION trg_comment_reads_versao() RETURNS trigger AS $$
+BEGIN
+    UPDATE users
+    SET leituras_versao = leituras_versao + 1
+    WHERE id = NEW.user_id;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_comment_reads_versao ON comment_reads;
+CREATE TRIGGER trg_comment_reads_versao
+    AFTER INSERT OR UPDATE ON comment_reads
+    FOR EACH ROW EXECUTE FUNCTION trg_comment_reads_versao();
+
+
+-- ============================================================
+-- VERSÃO DO SCHEMA (= migrar_db.VERSAO_ATUAL)
+-- ============================================================
+CREATE TABLE IF NOT EXISTS versao_schema (
+    versao INTEGER NOT NULL
+);
+DELETE FROM versao_schema;
+INSERT INTO versao_schema (versao) VALUES (12);
@@ -0,0 +1,99 @@
+import itertools
+import os
+import sqlite3
+
+import pytest
+from werkzeug.security import generate_password_hash
+
+import app as helpdesk
+from checar_planos import banco_em_memoria
+from repositorios import criar_repositorios
+
+# ============================================================
+# BANCO E APP DE TESTE (SQLite EM MEMÓRIA) 🧪
+# ============================================================
+#
+# Cada teste ganha um banco em memória próprio, com o schema do
+# database.db + todas as migrações, compartilhado (cache=shared) entre
+# a conexão do teste e as conexões do pool do app.
+#
+# Rodar:
+#   python -m pytest -q
+#
+# ============================================================
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+AGORA = "2024-01-01 10:00:00"
+
+_numero_do_banco = itertools.count(1)
+
+# Senha barata: o scrypt de verdade deixaria cada teste lento
+SENHA = "senha-de-teste"
+SENHA_HASH = generate_password_hash(SENHA, "pbkdf2:sha256:1")
+
+USUARIOS = {
+    "admin": 2,
+    "atendente": 1,
+    "atendente2": 1,
+    "usuario": 0,
+    "usuario2": 0,
+}
+
+
+@pytest.fixture
+def uri_banco():
+    return f"file:helpdesk_teste_{next(_numero_do_banco)}?mode=memory&cache=shared"
+
+
+@pytest.fixture
+def db(uri_banco):
+    """
+    Conexão do teste (segura o banco vivo). Depois de escrever, commit:
+    no cache compartilhado, transação aberta trava as tabelas para o app.
+    """
+    conn = banco_em_memoria(os.path.join(RAIZ, "database.db"), uri_banco)
+    conn.row_factory = sqlite3.Row
+    yield conn
+    conn.close()
+
+
+@pytest.fixture
+def repos(db):
+    return criar_repositorios("sqlite", db)
+
+
+@pytest.fixture
+def usuarios(repos, db):
+    """
+    {"admin": id, "atendente": id, ...}
+    """
+    ids = {nome: repos.usuarios.criar(nome, SENHA_HASH, nivel) for nome, nivel in USUARIOS.items()}
+    db.commit()
+    return ids
+
+
+@pytest.fixture
+def app(uri_banco, db):
+    return helpdesk.create_app({"DATABASE": uri_banco, "SECRET_KEY": "chave-dos-testes"})
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+def logar(client, usuarios, nome):
+    """
+    Loga direto na sessão (sem passar pelo hash de senha do /login).
+    """
+    with client.session_transaction() as sessao:
+        sessao["user_id"] = usuarios[nome]
+        sessao["nivel"] = USUARIOS[nome]
+        sessao["username"] = nome
+    return client
+
+
+def criar_ticket(repos, user_id, titulo="Impressora não liga", descricao="Luz apagada", agora=AGORA):
+    ticket_id = repos.tickets.criar(titulo, descricao, user_id, agora)
+    repos.tickets.conn.commit()
+    return ticket_id
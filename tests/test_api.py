@@ -0,0 +1,119 @@
+import pytest
+
+import app as helpdesk
+
+from conftest import AGORA, criar_ticket, logar
+
+
+@pytest.fixture
+def ticket_id(repos, usuarios):
+    return criar_ticket(repos, usuarios["usuario"])
+
+
+def pedir(client, url, etag=None):
+    headers = {"If-None-Match": f'"{etag}"'} if etag else {}
+    return client.get(url, headers=headers)
+
+
+def registrar(db, repos, usuarios, ticket_id, tipo="comment_added"):
+    # As rotas de escrita gravam o evento junto; aqui direto no banco
+    repos.tickets.registrar_eventos([(ticket_id, tipo, usuarios["atendente"], AGORA, "{}")])
+    db.commit()
+
+
+# ============================================================
+# /api/boards/<perfil>
+# ============================================================
+def test_board_responde_304_sem_montar_o_board(client, usuarios, ticket_id, monkeypatch):
+    logar(client, usuarios, "usuario")
+
+    primeira = pedir(client, "/api/boards/usuario")
+    assert primeira.status_code == 200
+    assert [c["id"] for c in primeira.get_json()["colunas"]["abertos"]["cards"]] == [ticket_id]
+
+    def nao_era_para_montar(*args):
+        raise AssertionError("board montado num 304")
+
+    monkeypatch.setattr(helpdesk, "carregar_board", nao_era_para_montar)
+    segunda = pedir(client, "/api/boards/usuario", primeira.get_etag()[0])
+    assert segunda.status_code == 304
+    assert segunda.get_etag() == primeira.get_etag()
+
+
+def test_etag_do_board_muda_com_evento_leitura_arquivo_e_pagina(client, db, repos, usuarios, ticket_id):
+    logar(client, usuarios, "usuario")
+    etags = [pedir(client, "/api/boards/usuario").get_etag()[0]]
+
+    def etag_mudou(url="/api/boards/usuario"):
+        resposta = pedir(client, url, etags[-1])
+        etags.append(resposta.get_etag()[0])
+        return resposta.status_code == 200 and etags[-1] != etags[-2]
+
+    # Comentário do atendente (trigger + evento)
+    repos.comentarios.criar(ticket_id, usuarios["atendente"], "oi", AGORA)
+    registrar(db, repos, usuarios, ticket_id)
+    assert etag_mudou()
+
+    # Usuário leu (🔴 some): leituras_versao
+    repos.comentarios.gravar_leituras([(ticket_id, usuarios["usuario"], 999, AGORA)])
+    db.commit()
+    assert etag_mudou()
+
+    # Ticket saiu da tabela (arquivo): ticket_totais
+    db.execute("DELETE FROM tickets WHERE id = ?", (ticket_id,))
+    db.commit()
+    assert etag_mudou()
+
+    # Outra página do mesmo board
+    assert etag_mudou("/api/boards/usuario?abertos_after_id=1")
+
+    # Nada mudou
+    assert pedir(client, "/api/boards/usuario?abertos_after_id=1", etags[-1]).status_code == 304
+
+
+def test_board_de_outro_perfil(client, usuarios):
+    assert pedir(client, "/api/boards/admin").status_code == 401
+    logar(client, usuarios, "usuario")
+    assert pedir(client, "/api/boards/admin").status_code == 403
+    assert pedir(client, "/api/boards/chefe").status_code == 404
+
+
+# ============================================================
+# /api/tickets/<id>
+# ============================================================
+def test_ticket_volta_lista_explicita_e_304(client, usuarios, ticket_id):
+    logar(client, usuarios, "usuario")
+
+    resposta = pedir(client, f"/api/tickets/{ticket_id}")
+    ticket = resposta.get_json()["ticket"]
+    assert resposta.status_code == 200
+    assert ticket["creator"] == "usuario" and ticket["arquivado"] is False
+    assert "senha" not in ticket and "creator_username" not in ticket
+
+    assert pedir(client, f"/api/tickets/{ticket_id}", resposta.get_etag()[0]).status_code == 304
+
+
+def test_etag_do_ticket_inclui_a_leitura_de_quem_pede(client, db, repos, usuarios, ticket_id):
+    repos.comentarios.criar(ticket_id, usuarios["atendente"], "oi", AGORA)
+    db.commit()
+    logar(client, usuarios, "usuario")
+
+    antes = pedir(client, f"/api/tickets/{ticket_id}")
+    assert antes.get_json()["ticket"]["seen_comment_id"] is None
+
+    # Abrir a página marca como visto: seen_comment_id muda -> ETag muda
+    client.get(f"/ticket/{ticket_id}")
+    depois = pedir(client, f"/api/tickets/{ticket_id}", antes.get_etag()[0])
+    assert depois.status_code == 200
+    assert depois.get_json()["ticket"]["seen_comment_id"] == depois.get_json()["ticket"]["last_comment_id"]
+
+    # Comentário novo também
+    repos.comentarios.criar(ticket_id, usuarios["atendente"], "de novo", AGORA)
+    db.commit()
+    novo = pedir(client, f"/api/tickets/{ticket_id}", depois.get_etag()[0])
+    assert novo.status_code == 200 and novo.get_json()["ticket"]["comment_count"] == 2
+
+
+def test_ticket_de_outro_usuario_nao_aparece(client, usuarios, ticket_id):
+    logar(client, usuarios, "usuario2")
+    assert pedir(client, f"/api/tickets/{ticket_id}").status_code == 404
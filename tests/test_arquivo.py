@@ -0,0 +1,82 @@
+import pytest
+
+from arquivar_tickets import arquivar
+from checar_planos import checar
+
+from conftest import criar_ticket, logar
+
+ANTIGO = "2020-01-01 10:00:00"
+
+
+@pytest.fixture
+def antigo(repos, db, usuarios):
+    """
+    Ticket fechado em 2020, com um comentário e uma leitura.
+    """
+    ticket_id = criar_ticket(repos, usuarios["usuario"], titulo="Impressora do RH atolando",
+                             agora=ANTIGO)
+    repos.tickets.aplicar_acao("start", [ticket_id], usuarios["atendente"], ANTIGO)
+    repos.tickets.aplicar_acao("close", [ticket_id], usuarios["atendente"], ANTIGO)
+    comentario = repos.comentarios.criar(ticket_id, usuarios["atendente"], "Troquei o rolete", ANTIGO)
+    repos.comentarios.gravar_leituras([(ticket_id, usuarios["usuario"], comentario, ANTIGO)])
+    db.commit()
+    return ticket_id
+
+
+def contar(db, tabela, ticket_id, coluna="id"):
+    return db.execute(f"SELECT COUNT(*) FROM {tabela} WHERE {coluna} = ?", (ticket_id,)).fetchone()[0]
+
+
+def test_arquiva_ticket_comentarios_e_leituras(db, repos, usuarios, antigo, capsys):
+    recente = criar_ticket(repos, usuarios["usuario"])
+
+    assert arquivar(db, dias=30) == 1
+
+    assert contar(db, "tickets", antigo) == 0
+    assert contar(db, "tickets_arquivo", antigo) == 1
+    assert contar(db, "ticket_comments", antigo, "ticket_id") == 0
+    assert contar(db, "ticket_comments_arquivo", antigo, "ticket_id") == 1
+    assert contar(db, "comment_reads", antigo, "ticket_id") == 0
+    assert contar(db, "tickets", recente) == 1
+
+    [ticket] = repos.tickets.acesso([antigo], usuarios["usuario"])
+    assert ticket["arquivado"] is True and ticket["comment_count"] == 1
+    assert repos.tickets.totais_por_estado()["Fechado"] == 0
+
+    # Nada mais para arquivar
+    assert arquivar(db, dias=30) == 0
+
+
+def test_busca_continua_achando_o_arquivado(db, repos, usuarios, antigo, capsys):
+    arquivar(db, dias=30)
+
+    for texto in ("impressora", "rolete"):
+        [achado] = repos.tickets.buscar_texto(2, None, texto, 30)
+        assert (achado["id"], achado["arquivado"]) == (antigo, 1)
+
+    # Mesmo filtro de visibilidade da tabela quente
+    assert [r["id"] for r in repos.tickets.buscar_texto(0, usuarios["usuario"], "rolete", 30)] == [antigo]
+    assert repos.tickets.buscar_texto(0, usuarios["usuario2"], "rolete", 30) == []
+    assert [r["id"] for r in repos.tickets.buscar_texto(1, usuarios["atendente"], "rolete", 30)] == [antigo]
+
+
+def test_busca_junta_quente_e_arquivo_por_relevancia(db, repos, usuarios, antigo, capsys):
+    arquivar(db, dias=30)
+    novo = criar_ticket(repos, usuarios["usuario"], titulo="Outra impressora", descricao="Sem toner")
+
+    assert {r["id"]: r["arquivado"] for r in repos.tickets.buscar_texto(2, None, "impressora", 30)} == {
+        antigo: 1, novo: 0}
+    assert len(repos.tickets.buscar_texto(2, None, "impressora", 1)) == 1
+
+
+def test_pagina_de_busca_marca_arquivado(client, db, usuarios, antigo, capsys):
+    arquivar(db, dias=30)
+    logar(client, usuarios, "admin")
+
+    pagina = client.get("/buscar-ticket?ticket_id=rolete", follow_redirects=True).get_data(as_text=True)
+
+    assert f"Chamado #{antigo}" in pagina and "📦 arquivado" in pagina
+
+
+def test_planos_da_busca_usam_os_indices_do_arquivo(db):
+    assert checar(db) == []
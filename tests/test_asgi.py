@@ -0,0 +1,135 @@
+import asyncio
+import importlib
+import sys
+
+import pytest
+from flask import abort
+
+from conftest import AGORA, criar_ticket, logar
+
+
+@pytest.fixture
+def asgi(monkeypatch, uri_banco, db):
+    """
+    asgi.py cria o app no import: aponta o HELPDESK_DATABASE para o
+    banco em memória do teste e importa de novo.
+    """
+    monkeypatch.setenv("HELPDESK_DATABASE", uri_banco)
+    monkeypatch.setenv("HELPDESK_SECRET_KEY", "chave-dos-testes")
+    sys.modules.pop("asgi", None)
+    modulo = importlib.import_module("asgi")
+    yield modulo
+    sys.modules.pop("asgi", None)
+
+
+def chamar(asgi, rota, caminho="/qualquer"):
+    enviados = []
+
+    async def send(mensagem):
+        enviados.append(mensagem)
+
+    scope = {"type": "http", "method": "GET", "path": caminho, "headers": []}
+    asyncio.run(asgi.responder(scope, send, rota))
+    return enviados[0]["status"], enviados[1]["body"]
+
+
+def test_abort_vira_a_resposta_http_e_nao_500(asgi):
+    async def proibido():
+        abort(403)
+
+    async def sumiu():
+        abort(404)
+
+    assert chamar(asgi, proibido)[0] == 403
+    assert chamar(asgi, sumiu)[0] == 404
+
+
+def test_erro_da_view_continua_500(asgi):
+    async def quebrou():
+        raise ValueError("bug")
+
+    asgi.flask_app.config["PROPAGATE_EXCEPTIONS"] = False
+    assert chamar(asgi, quebrou)[0] == 500
+
+
+def test_board_sem_login_redireciona(asgi):
+    status, _ = chamar(asgi, lambda: asgi.board_async(2, "admin_kanban.html"), "/admin")
+    assert status == 302
+
+
+def logado(asgi, usuarios, nome):
+    """
+    Cliente WSGI logado + o cookie de sessão dele para os requests ASGI.
+    """
+    client = logar(asgi.flask_app.test_client(), usuarios, nome)
+    return client, client.get_cookie("session").value
+
+
+def get_asgi(asgi, caminho, cookie, receive=None):
+    enviados = []
+
+    async def send(mensagem):
+        enviados.append(mensagem)
+
+    async def sem_corpo():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    scope = {"type": "http", "method": "GET", "path": caminho, "query_string": b"",
+             "headers": [(b"cookie", f"session={cookie}".encode())]}
+    asyncio.run(asgi.app(scope, receive or sem_corpo, send))
+    return enviados
+
+
+def test_board_async_renderiza_igual_ao_wsgi(asgi, repos, usuarios):
+    criar_ticket(repos, usuarios["usuario"], titulo="Impressora")
+    andamento = criar_ticket(repos, usuarios["usuario"], titulo="Monitor")
+    repos.tickets.aplicar_acao("start", [andamento], usuarios["atendente"], AGORA)
+    repos.comentarios.criar(andamento, usuarios["atendente"], "a caminho", AGORA)
+    repos.tickets.conn.commit()
+    client, cookie = logado(asgi, usuarios, "admin")
+
+    inicio, corpo = get_asgi(asgi, "/admin", cookie)
+
+    assert inicio["status"] == 200
+    assert corpo["body"] == client.get("/admin").data
+    assert b"Monitor" in corpo["body"] and b"badge-count" in corpo["body"]
+
+
+def test_detalhe_async_renderiza_igual_ao_wsgi_e_marca_como_visto(asgi, db, repos, usuarios):
+    ticket_id = criar_ticket(repos, usuarios["usuario"])
+    repos.comentarios.criar(ticket_id, usuarios["atendente"], "pode testar?", AGORA)
+    repos.tickets.conn.commit()
+    client, cookie = logado(asgi, usuarios, "usuario")
+    assert repos.comentarios.nao_lidos([ticket_id], usuarios["usuario"]) == {ticket_id: 1}
+    db.commit()
+
+    inicio, corpo = get_asgi(asgi, f"/ticket/{ticket_id}", cookie)
+
+    assert inicio["status"] == 200
+    assert b"pode testar?" in corpo["body"]
+    assert repos.comentarios.nao_lidos([ticket_id], usuarios["usuario"]) == {}
+    db.commit()
+
+    # Já visto: as duas entradas veem o mesmo ticket
+    assert get_asgi(asgi, f"/ticket/{ticket_id}", cookie)[1]["body"] == client.get(f"/ticket/{ticket_id}").data
+
+
+def test_eventos_sse_cancela_a_assinatura_quando_a_aba_fecha(asgi, usuarios):
+    _, cookie = logado(asgi, usuarios, "atendente")
+    durante = []
+
+    def assinantes():
+        with asgi.flask_app.app_context():
+            return len(asgi.helpdesk.recursos().assinantes)
+
+    async def fecha_a_aba():
+        await asyncio.sleep(0.05)
+        durante.append(assinantes())
+        return {"type": "http.disconnect"}
+
+    enviados = get_asgi(asgi, "/events", cookie, fecha_a_aba)
+
+    assert enviados[0]["status"] == 200
+    assert enviados[1]["body"] == b"retry: 5000\n\n"
+    assert durante == [1]
+    assert assinantes() == 0
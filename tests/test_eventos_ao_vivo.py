@@ -0,0 +1,156 @@
+import queue
+import time
+
+import pytest
+
+import app as helpdesk
+
+from conftest import AGORA, criar_ticket, logar
+
+
+@pytest.fixture
+def outro_processo(uri_banco, db):
+    """
+    Segundo app no mesmo banco: faz o papel de outro worker do gunicorn.
+    """
+    return helpdesk.create_app({"DATABASE": uri_banco, "SECRET_KEY": "chave-dos-testes"})
+
+
+@pytest.fixture
+def aba(outro_processo):
+    """
+    Fila de uma aba aberta em /events no outro processo, sem a thread
+    leitora (o teste chama publicar_eventos_novos na mão).
+    """
+    fila = queue.Queue()
+    with outro_processo.app_context():
+        helpdesk.recursos().assinantes.append(fila)
+    return fila
+
+
+def ler_do_log(app, ultimo_id, entregues):
+    with app.app_context():
+        return helpdesk.publicar_eventos_novos(helpdesk.repositorios(), ultimo_id, entregues)
+
+
+def esvaziar(fila):
+    eventos = []
+    while not fila.empty():
+        eventos.append(fila.get_nowait())
+    return eventos
+
+
+def test_mudanca_em_um_processo_chega_na_aba_do_outro(client, repos, usuarios, outro_processo, aba):
+    ticket_id = criar_ticket(repos, usuarios["usuario"])
+    with outro_processo.app_context():
+        ultimo_id = helpdesk.repositorios().tickets.ultimo_evento_id()
+
+    logar(client, usuarios, "atendente")
+    client.get(f"/start-ticket/{ticket_id}")
+    client.post(f"/ticket/{ticket_id}/comment", data={"comment": "a caminho"})
+
+    ultimo_id = ler_do_log(outro_processo, ultimo_id, set())
+    iniciado, comentado = esvaziar(aba)
+
+    assert iniciado["tipo"] == "status_changed" and iniciado["antes"]["status"] == "Aberto"
+    assert iniciado["ticket"]["status"] == "Em andamento"
+    assert (comentado["tipo"], comentado["autor_id"]) == ("comment_added", usuarios["atendente"])
+
+    # Cada um vê no próprio board
+    assert helpdesk.evento_para_usuario(iniciado, 1, usuarios["atendente"])["coluna"] == "andamento"
+    assert helpdesk.evento_para_usuario(iniciado, 1, usuarios["atendente2"])["coluna"] is None
+    assert helpdesk.evento_para_usuario(iniciado, 0, usuarios["usuario2"]) is None
+
+    # Nada novo: nada publicado
+    assert ler_do_log(outro_processo, ultimo_id, set(range(ultimo_id - 5, ultimo_id + 1))) == ultimo_id
+    assert esvaziar(aba) == []
+
+
+def test_ocultar_e_desocultar_tambem_sao_publicados(client, db, repos, usuarios, outro_processo, aba):
+    ticket_id = criar_ticket(repos, usuarios["usuario"])
+    repos.tickets.aplicar_acao("start", [ticket_id], usuarios["atendente"], AGORA)
+    repos.tickets.aplicar_acao("close", [ticket_id], usuarios["atendente"], AGORA)
+    db.commit()
+    ultimo_id = repos.tickets.ultimo_evento_id()
+    db.commit()
+
+    logar(client, usuarios, "admin")
+    client.get(f"/hide-ticket/{ticket_id}")
+    ler_do_log(outro_processo, ultimo_id, set())
+
+    [oculto] = esvaziar(aba)
+    dados = helpdesk.evento_para_usuario(oculto, 2, usuarios["admin"])
+    assert dados["coluna"] == "ocultados"
+    assert helpdesk.evento_para_usuario(oculto, 1, usuarios["atendente"])["coluna"] is None
+
+    # O card da coluna "ocultados" mostra quem ocultou e quando
+    hidden_at = db.execute("SELECT hidden_at FROM tickets WHERE id = ?", (ticket_id,)).fetchone()[0]
+    assert dados["ticket"]["hider_username"] == "admin"
+    assert dados["ticket"]["hidden_at"] == helpdesk.data_br(hidden_at)
+
+
+def test_evento_com_id_menor_que_commitou_depois_nao_se_perde(db, repos, usuarios, outro_processo, aba):
+    ticket_id = criar_ticket(repos, usuarios["usuario"])
+    ultimo_id = repos.tickets.ultimo_evento_id()
+
+    def gravar_evento(evento_id):
+        db.execute("""
+            INSERT INTO ticket_events (id, ticket_id, tipo, actor_id, created_at, payload)
+            VALUES (?, ?, 'comment_added', ?, ?, '{}')
+        """, (evento_id, ticket_id, usuarios["atendente"], AGORA))
+        db.commit()
+
+    entregues = set(range(ultimo_id - helpdesk.EVENTOS_RELER + 1, ultimo_id + 1))
+
+    # Sequence do PostgreSQL: o id +2 commita antes do +1
+    gravar_evento(ultimo_id + 2)
+    ultimo_id_depois = ler_do_log(outro_processo, ultimo_id, entregues)
+    assert len(esvaziar(aba)) == 1
+
+    gravar_evento(ultimo_id + 1)
+    assert ler_do_log(outro_processo, ultimo_id_depois, entregues) == ultimo_id + 2
+    assert len(esvaziar(aba)) == 1
+
+    # Relido na janela, mas já entregue
+    ler_do_log(outro_processo, ultimo_id + 2, entregues)
+    assert esvaziar(aba) == []
+
+
+def test_thread_leitora_entrega_na_fila_assinada(client, repos, usuarios, outro_processo, monkeypatch):
+    monkeypatch.setattr(helpdesk, "EVENTOS_POLL_SEG", 0.01)
+    ticket_id = criar_ticket(repos, usuarios["usuario"])
+
+    with outro_processo.app_context():
+        fila = helpdesk.assinar_eventos()
+
+    try:
+        # Dá tempo da thread marcar o "agora" antes da mudança
+        time.sleep(0.2)
+
+        logar(client, usuarios, "atendente")
+        client.get(f"/start-ticket/{ticket_id}")
+
+        evento = fila.get(timeout=5)
+        assert (evento["tipo"], evento["ticket"]["id"]) == ("status_changed", ticket_id)
+    finally:
+        with outro_processo.app_context():
+            helpdesk.cancelar_assinatura(fila)
+
+
+def assinantes(app):
+    with app.app_context():
+        return len(helpdesk.recursos().assinantes)
+
+
+def test_fechar_a_aba_cancela_a_assinatura(app, client, usuarios):
+    logar(client, usuarios, "atendente")
+
+    resposta = client.get("/events", buffered=False)
+    assert next(resposta.response) == b"retry: 5000\n\n"
+    assert assinantes(app) == 1
+    assert b"helpdesk_sse_conexoes 1" in app.test_client().get("/metrics").data
+
+    resposta.close()
+
+    assert assinantes(app) == 0
+    assert b"helpdesk_sse_conexoes 0" in app.test_client().get("/metrics").data
@@ -0,0 +1,76 @@
+import pytest
+
+from conftest import AGORA, criar_ticket, logar
+
+
+@pytest.fixture
+def tickets(repos, db, usuarios):
+    """
+    aberto, em andamento (com o atendente 1), fechado (atendente 1).
+    """
+    ids = {nome: criar_ticket(repos, usuarios["usuario"], titulo=nome)
+           for nome in ("aberto", "andamento", "fechado")}
+    repos.tickets.aplicar_acao("start", [ids["andamento"], ids["fechado"]], usuarios["atendente"], AGORA)
+    repos.tickets.aplicar_acao("close", [ids["fechado"]], usuarios["atendente"], AGORA)
+    db.commit()
+    return ids
+
+
+def status_de(db, ticket_id):
+    return db.execute("SELECT status, is_hidden FROM tickets WHERE id = ?", (ticket_id,)).fetchone()
+
+
+def test_lote_devolve_resultado_por_id(client, db, usuarios, tickets):
+    logar(client, usuarios, "atendente")
+
+    resposta = client.post("/api/tickets/lote", json={
+        "acao": "close",
+        "ids": [tickets["andamento"], tickets["aberto"], 9999, tickets["andamento"]],
+    })
+
+    assert resposta.status_code == 200
+    assert resposta.get_json() == {"acao": "close", "resultados": {
+        str(tickets["andamento"]): "ok",
+        str(tickets["aberto"]): "nao_permitido",
+        "9999": "nao_encontrado",
+    }}
+    db.commit()  # fecha a leitura do teste antes de olhar de novo
+    assert status_de(db, tickets["andamento"])["status"] == "Fechado"
+    assert status_de(db, tickets["aberto"])["status"] == "Aberto"
+
+    eventos = db.execute("SELECT ticket_id, tipo FROM ticket_events WHERE tipo = 'ticket_closed'").fetchall()
+    assert [tuple(e) for e in eventos] == [(tickets["andamento"], "ticket_closed")]
+
+
+def test_atendente_age_em_chamado_de_outro_atendente(client, db, usuarios, tickets):
+    # Mesma regra das rotas do baseline: basta ser equipe e o status casar
+    logar(client, usuarios, "atendente2")
+
+    resposta = client.post("/api/tickets/lote", json={
+        "acao": "close", "ids": [tickets["andamento"]]})
+    assert resposta.get_json()["resultados"] == {str(tickets["andamento"]): "ok"}
+
+    resposta = client.get(f"/hide-ticket/{tickets['fechado']}")
+    assert resposta.status_code == 302
+    db.commit()
+    assert status_de(db, tickets["fechado"])["is_hidden"] == 1
+
+
+def test_lote_so_para_equipe(client, usuarios, tickets):
+    corpo = {"acao": "close", "ids": [tickets["andamento"]]}
+
+    assert client.post("/api/tickets/lote", json=corpo).status_code == 401
+
+    logar(client, usuarios, "usuario")
+    assert client.post("/api/tickets/lote", json=corpo).status_code == 403
+
+
+@pytest.mark.parametrize("corpo", [
+    {"acao": "apagar", "ids": [1]},
+    {"acao": "close", "ids": "1,2"},
+    {"acao": "close", "ids": [1, True]},
+    {"acao": "close", "ids": list(range(501))},
+])
+def test_lote_recusa_pedido_invalido(client, usuarios, corpo):
+    logar(client, usuarios, "admin")
+    assert client.post("/api/tickets/lote", json=corpo).status_code == 400
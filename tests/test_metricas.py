@@ -0,0 +1,29 @@
+import app as helpdesk
+
+from conftest import logar
+
+
+def linha_da_metrica(client, prefixo):
+    texto = client.get("/metrics").get_data(as_text=True)
+    return [linha for linha in texto.splitlines() if linha.startswith(prefixo)]
+
+
+def test_metricas_sao_de_cada_app(app, client, uri_banco, usuarios):
+    outro = helpdesk.create_app({"DATABASE": uri_banco, "SECRET_KEY": "chave-dos-testes"})
+
+    logar(client, usuarios, "admin")
+    client.get("/admin")
+    client.get("/admin")
+
+    assert linha_da_metrica(client, 'helpdesk_request_duration_seconds_count{rota="admin"}') == [
+        'helpdesk_request_duration_seconds_count{rota="admin"} 2']
+    assert linha_da_metrica(outro.test_client(), 'helpdesk_request_duration_seconds_count') == []
+    assert linha_da_metrica(outro.test_client(), "helpdesk_db_comandos_total ") == [
+        "helpdesk_db_comandos_total 0"]
+
+
+def test_conexoes_em_uso_voltam_a_zero(client, usuarios):
+    logar(client, usuarios, "usuario")
+    client.get("/meus-chamados")
+
+    assert linha_da_metrica(client, "helpdesk_db_conexoes_em_uso ") == ["helpdesk_db_conexoes_em_uso 0"]
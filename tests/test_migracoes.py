@@ -0,0 +1,219 @@
+import os
+import sqlite3
+import subprocess
+import sys
+
+import pytest
+
+import app as helpdesk
+import migrar_db
+from migrar_db import VERSAO_ATUAL, migrar, versao_do_banco
+
+from conftest import RAIZ
+
+# Schema da versão 0 (antes de qualquer migração), com as colunas "por
+# perfil" que os scripts avulsos colocaram no tickets
+SCHEMA_VERSAO_0 = """
+    CREATE TABLE users (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        username TEXT NOT NULL UNIQUE,
+        email TEXT,
+        senha TEXT NOT NULL,
+        is_admin INTEGER NOT NULL
+    );
+    CREATE TABLE tickets (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        titulo TEXT NOT NULL,
+        descricao TEXT NOT NULL,
+        status TEXT NOT NULL,
+        user_id INTEGER NOT NULL,
+        attendant_id INTEGER,
+        created_at TEXT NOT NULL,
+        started_at TEXT,
+        closed_at TEXT,
+        is_hidden INTEGER NOT NULL,
+        hidden_by INTEGER,
+        hidden_at TEXT,
+        user_seen_comment_id INTEGER, attendant_seen_comment_id INTEGER, admin_seen_comment_id INTEGER,
+        user_seen_status_at TEXT, attendant_seen_status_at TEXT, admin_seen_status_at TEXT
+    );
+    CREATE TABLE ticket_comments (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        ticket_id INTEGER NOT NULL,
+        user_id INTEGER NOT NULL,
+        comment TEXT NOT NULL,
+        created_at TEXT NOT NULL
+    );
+"""
+
+
+@pytest.fixture
+def banco_antigo():
+    """
+    Banco na versão 0 com dados do jeito antigo (datas dd/mm/YYYY HH:MM,
+    leitura nas colunas do ticket, sem contadores).
+    """
+    conn = sqlite3.connect(":memory:")
+    conn.executescript(SCHEMA_VERSAO_0)
+    conn.executemany(
+        "INSERT INTO users (id, username, senha, is_admin) VALUES (?, ?, 'x', ?)",
+        [(1, "usuario", 0), (2, "atendente", 1), (3, "admin", 2)],
+    )
+    conn.executemany("""
+        INSERT INTO tickets (id, titulo, descricao, status, user_id, attendant_id,
+                             created_at, started_at, closed_at, is_hidden,
+                             user_seen_comment_id, attendant_seen_status_at)
+        VALUES (?, ?, ?, ?, 1, ?, ?, ?, ?, ?, ?, ?)
+    """, [
+        (1, "Impressão falhando", "Papel preso", "Fechado", 2,
+         "13/01/2026 11:10", "13/01/2026 11:40", "14/01/2026 09:00", 0, 2, "14/01/2026 09:00"),
+        (2, "Sem rede", "Cabo solto", "Aberto", None,
+         "15/01/2026 08:00", None, None, 1, None, None),
+    ])
+    conn.executemany(
+        "INSERT INTO ticket_comments (id, ticket_id, user_id, comment, created_at) VALUES (?, 1, ?, ?, ?)",
+        [(1, 1, "Já reiniciei", "13/01/2026 11:20"),
+         (2, 2, "Vou olhar a bandeja", "13/01/2026 11:45")],
+    )
+    conn.commit()
+    yield conn
+    conn.close()
+
+
+def test_banco_novo_fica_na_versao_atual_com_os_indices(db):
+    nomes = {linha[0] for linha in db.execute("SELECT name FROM sqlite_master")}
+
+    assert versao_do_banco(db) == VERSAO_ATUAL
+    assert {
+        "idx_tickets_hidden_status_id", "idx_tickets_user_hidden_status_id",
+        "idx_tickets_attendant_hidden_status_id", "idx_comments_ticket_id_user",
+        "idx_tickets_hidden_id", "idx_comments_arquivo_ticket_id", "idx_ticket_events_ticket",
+        "tickets_fts", "comments_fts", "tickets_arquivo_fts", "comments_arquivo_fts",
+    } <= nomes
+
+
+def test_rodar_de_novo_nao_faz_nada(db):
+    assert migrar(db) == []
+    assert versao_do_banco(db) == VERSAO_ATUAL
+
+
+def test_migra_da_versao_0_com_dados(banco_antigo):
+    conn = banco_antigo
+
+    assert migrar(conn) == list(range(0, VERSAO_ATUAL + 1))
+
+    # 005: datas em ISO
+    assert conn.execute("SELECT created_at, started_at, closed_at FROM tickets WHERE id = 1").fetchone() == (
+        "2026-01-13 11:10:00", "2026-01-13 11:40:00", "2026-01-14 09:00:00")
+    assert conn.execute("SELECT created_at FROM ticket_comments WHERE id = 2").fetchone() == (
+        "2026-01-13 11:45:00",)
+
+    # 003: contadores preenchidos com o que já existia
+    assert conn.execute(
+        "SELECT comment_count, last_comment_id, last_comment_user_id FROM tickets ORDER BY id"
+    ).fetchall() == [(2, 2, 2), (0, None, None)]
+
+    # 004: leituras por perfil viraram linhas por usuário
+    assert conn.execute("""
+        SELECT user_id, last_seen_comment_id, last_seen_status_at
+        FROM comment_reads WHERE ticket_id = 1 ORDER BY user_id
+    """).fetchall() == [(1, 2, None), (2, 0, "2026-01-14 09:00:00")]
+
+    # 006: o que já existia entra no índice de texto (sem acento também)
+    assert conn.execute(
+        "SELECT rowid FROM tickets_fts WHERE tickets_fts MATCH 'impressao'"
+    ).fetchall() == [(1,)]
+    assert conn.execute(
+        "SELECT rowid FROM comments_fts WHERE comments_fts MATCH 'bandeja'"
+    ).fetchall() == [(2,)]
+
+    # 008: totais por estado
+    assert dict(conn.execute("SELECT estado, total FROM ticket_totais")) == {
+        "Fechado": 1, "ocultados": 1}
+
+    # 009: estatísticas do histórico
+    assert conn.execute("""
+        SELECT quantidade, segundos_total FROM ticket_stats_dia
+        WHERE status = 'Fechado' AND attendant_id = 2
+    """).fetchone() == (1, 21 * 3600 + 50 * 60)
+
+    # 010: eventos do histórico, em ordem de data
+    assert conn.execute(
+        "SELECT ticket_id, tipo FROM ticket_events ORDER BY id"
+    ).fetchall() == [
+        (1, "ticket_created"), (1, "comment_added"), (1, "ticket_started"),
+        (1, "comment_added"), (1, "ticket_closed"), (2, "ticket_created"),
+    ]
+
+
+@pytest.mark.parametrize("scripts", [
+    ["create_db.py", "create_tickets.py", "create_logins.py"],
+    [],
+], ids=["create_scripts", "banco_vazio"])
+def test_migrar_db_sozinho_deixa_o_banco_pronto(tmp_path, scripts):
+    # Mesma ordem do run_cmd.txt, num diretório limpo
+    for script in scripts:
+        subprocess.run([sys.executable, os.path.join(RAIZ, script)], cwd=tmp_path,
+                       check=True, capture_output=True)
+    caminho = str(tmp_path / "database.db")
+
+    conn = sqlite3.connect(caminho)
+    assert migrar(conn) == list(range(0, VERSAO_ATUAL + 1))
+    conn.close()
+
+    app = helpdesk.create_app({"DATABASE": caminho, "SECRET_KEY": "chave-dos-testes"})
+    client = app.test_client()
+    if scripts:
+        client.post("/login", data={"username": "usuario.teste", "senha": "usuario@123"})
+    else:
+        client.post("/register", data={"username": "novo.usuario", "senha": "senha@123"})
+        client.post("/login", data={"username": "novo.usuario", "senha": "senha@123"})
+
+    client.post("/create-ticket", data={"titulo": "Mouse", "descricao": "Não clica"})
+    client.post("/ticket/1/comment", data={"comment": "Troquei a pilha"})
+
+    pagina = client.get("/ticket/1").get_data(as_text=True)
+    assert "Troquei a pilha" in pagina and "(1)" in pagina
+
+
+def test_triggers_valem_para_o_que_entra_depois_da_migracao(banco_antigo):
+    conn = banco_antigo
+    migrar(conn)
+
+    conn.execute("""
+        INSERT INTO tickets (titulo, descricao, status, user_id, created_at, is_hidden)
+        VALUES ('Monitor piscando', 'Desde ontem', 'Aberto', 1, '2026-01-16 10:00:00', 0)
+    """)
+    conn.execute("""
+        INSERT INTO ticket_comments (ticket_id, user_id, comment, created_at)
+        VALUES (2, 2, 'Cabo trocado', '2026-01-16 10:05:00')
+    """)
+
+    assert dict(conn.execute("SELECT estado, total FROM ticket_totais"))["Aberto"] == 1
+    assert conn.execute("SELECT comment_count FROM tickets WHERE id = 2").fetchone() == (1,)
+    assert conn.execute(
+        "SELECT rowid FROM tickets_fts WHERE tickets_fts MATCH 'monitor'"
+    ).fetchone() is not None
+
+
+def test_migracao_com_erro_desfaz_tudo_e_para(banco_antigo, monkeypatch):
+    conn = banco_antigo
+    migrar(conn)
+
+    def migracao_quebrada(cursor):
+        cursor.execute("CREATE TABLE pela_metade (id INTEGER)")
+        cursor.execute("UPDATE tickets SET status = 'Quebrado'")
+        raise RuntimeError("falhou no meio")
+
+    monkeypatch.setattr(migrar_db, "MIGRACOES", migrar_db.MIGRACOES + [
+        (VERSAO_ATUAL + 1, "quebrada", migracao_quebrada),
+        (VERSAO_ATUAL + 2, "nunca roda", lambda cursor: cursor.execute("CREATE TABLE depois (id INTEGER)")),
+    ])
+
+    with pytest.raises(RuntimeError):
+        migrar(conn)
+
+    nomes = {linha[0] for linha in conn.execute("SELECT name FROM sqlite_master")}
+    assert versao_do_banco(conn) == VERSAO_ATUAL
+    assert not {"pela_metade", "depois"} & nomes
+    assert conn.execute("SELECT COUNT(*) FROM tickets WHERE status = 'Quebrado'").fetchone() == (0,)
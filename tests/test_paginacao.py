@@ -0,0 +1,78 @@
+import pytest
+
+import app as helpdesk
+
+from conftest import AGORA, criar_ticket, logar
+
+
+@pytest.fixture
+def client(uri_banco, db):
+    app = helpdesk.create_app({"DATABASE": uri_banco, "SECRET_KEY": "chave-dos-testes", "PER_PAGE": 3})
+    return app.test_client()
+
+
+@pytest.fixture
+def abertos(repos, usuarios):
+    return [criar_ticket(repos, usuarios["usuario"], titulo=f"Chamado {n}") for n in range(7)]
+
+
+def coluna(client, nome, **cursor):
+    args = "&".join(f"{nome}_{campo}={valor}" for campo, valor in cursor.items())
+    dados = client.get(f"/api/boards/admin?{args}").get_json()["colunas"][nome]
+    return [card["id"] for card in dados["cards"]], dados["prev_id"], dados["next_id"]
+
+
+def test_paginas_para_frente_e_para_tras(client, usuarios, abertos):
+    logar(client, usuarios, "admin")
+    mais_novos = abertos[::-1]
+
+    pagina1, prev1, next1 = coluna(client, "abertos")
+    assert (pagina1, prev1) == (mais_novos[0:3], None)
+
+    pagina2, prev2, next2 = coluna(client, "abertos", before_id=next1)
+    assert pagina2 == mais_novos[3:6]
+
+    pagina3, prev3, next3 = coluna(client, "abertos", before_id=next2)
+    assert (pagina3, next3) == (mais_novos[6:], None)
+
+    # Voltando pelo prev_id, do mais novo pro mais antigo de novo
+    assert coluna(client, "abertos", after_id=prev3)[0] == pagina2
+    assert coluna(client, "abertos", after_id=prev2) == (pagina1, None, next1)
+
+
+def test_ticket_novo_nao_empurra_a_pagina_aberta(client, repos, usuarios, abertos):
+    logar(client, usuarios, "admin")
+    _, _, next1 = coluna(client, "abertos")
+    pagina2 = coluna(client, "abertos", before_id=next1)[0]
+
+    criar_ticket(repos, usuarios["usuario"], titulo="Chegou agora")
+
+    # OFFSET mostraria um card repetido; o cursor (id) não
+    assert coluna(client, "abertos", before_id=next1)[0] == pagina2
+
+
+def test_cursor_de_uma_coluna_nao_mexe_nas_outras(client, db, repos, usuarios, abertos):
+    repos.tickets.aplicar_acao("start", abertos[:4], usuarios["atendente"], AGORA)
+    db.commit()
+    logar(client, usuarios, "admin")
+
+    andamento = coluna(client, "andamento")[0]
+    _, _, next_abertos = coluna(client, "abertos")
+
+    assert coluna(client, "abertos")[0] == abertos[:3:-1]
+    assert client.get(f"/api/boards/admin?abertos_before_id={next_abertos}").get_json()[
+        "colunas"]["andamento"]["cards"][0]["id"] == andamento[0]
+
+
+def test_pagina_html_mostra_os_links_do_cursor(client, usuarios, abertos):
+    logar(client, usuarios, "admin")
+
+    pagina = client.get("/admin").get_data(as_text=True)
+
+    assert f"abertos_before_id={abertos[4]}" in pagina
+    assert "abertos_after_id" not in pagina
+
+    # O JS do /events só põe card na página em que o id cabe
+    assert 'data-coluna="abertos" data-primeira-pagina="1" data-ultima-pagina="0"' in pagina
+    ultima = client.get(f"/admin?abertos_before_id={abertos[1]}").get_data(as_text=True)
+    assert 'data-coluna="abertos" data-primeira-pagina="0" data-ultima-pagina="1"' in ultima
@@ -0,0 +1,78 @@
+import contextlib
+
+from flask import g
+
+import app as helpdesk
+
+from conftest import logar
+
+
+class CursorDoDriver:
+    """
+    Faz o papel do psycopg.Cursor: execute(query, params=None, *, prepare=None).
+    """
+
+    def __init__(self, conn=None):
+        self.conn = conn
+        self.recebidos = []
+
+    def execute(self, sql, params=None, *, prepare=None):
+        self.recebidos.append((sql, params, prepare))
+        return self
+
+    def executemany(self, sql, lista_params, *, returning=False):
+        self.recebidos.append((sql, lista_params, returning))
+
+    def fetchall(self):
+        return [{"QUERY PLAN": "Index Scan using tickets_pkey on tickets"}]
+
+
+class ConexaoPostgresFalsa:
+    def __init__(self):
+        self.savepoints = 0
+
+    @contextlib.contextmanager
+    def transaction(self):
+        self.savepoints += 1
+        yield
+
+
+def test_server_timing_conta_os_comandos_do_request(client, usuarios):
+    logar(client, usuarios, "admin")
+
+    timing = client.get("/admin").headers["Server-Timing"]
+
+    assert timing.startswith("db;dur=")
+    assert '"0 comandos SQL"' not in timing and "comandos SQL" in timing
+
+
+def test_cursor_do_postgres_tambem_e_medido(app, monkeypatch):
+    monkeypatch.setattr(helpdesk, "classe_cursor_postgres", lambda: CursorDoDriver)
+    monkeypatch.setattr(helpdesk, "_cursor_medido_postgres", None)
+
+    with app.test_request_context("/admin"):
+        cursor = helpdesk.cursor_medido_postgres()()
+        cursor.execute("SELECT * FROM tickets WHERE id = %s", (7,), prepare=False)
+        cursor.fetchall()
+        cursor.execute("BEGIN")
+
+        assert cursor.recebidos[0] == ("SELECT * FROM tickets WHERE id = %s", (7,), False)
+        assert [(c["sql"], c["params"]) for c in g.consultas] == [
+            ("SELECT * FROM tickets WHERE id = %s", (7,)), ("BEGIN", None)]
+
+
+def test_plano_da_consulta_usa_o_explain_do_banco(app, db, monkeypatch):
+    with app.test_request_context("/admin"):
+        plano = helpdesk.plano_da_consulta(helpdesk.get_db_connection(),
+                                           "SELECT * FROM tickets WHERE id = ?", (1,))
+        assert plano and "tickets" in plano[0]
+
+    monkeypatch.setattr(helpdesk, "classe_cursor_postgres", lambda: CursorDoDriver)
+    monkeypatch.setitem(app.config, "BANCO", "postgres")
+    conn = ConexaoPostgresFalsa()
+
+    with app.test_request_context("/admin"):
+        plano = helpdesk.plano_da_consulta(conn, "SELECT * FROM tickets WHERE id = %s", (1,))
+
+    assert plano == ["Index Scan using tickets_pkey on tickets"]
+    assert conn.savepoints == 1
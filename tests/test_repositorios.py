@@ -0,0 +1,222 @@
+import json
+
+import pytest
+
+import app as helpdesk
+from repositorios import (RepositorioComentariosPostgres, RepositorioTicketsPostgres,
+                          RepositorioUsuariosPostgres, criar_repositorios)
+
+from conftest import AGORA, criar_ticket
+
+
+# ============================================================
+# SQLite (banco em memória compartilhado)
+# ============================================================
+def test_usuarios_criar_buscar_e_trocar_senha(repos, db):
+    user_id = repos.usuarios.criar("fulano", "hash-1")
+    db.commit()
+
+    assert repos.usuarios.username_existe("fulano")
+    assert not repos.usuarios.username_existe("ciclano")
+
+    repos.usuarios.trocar_senha(user_id, "hash-2")
+    usuario = repos.usuarios.por_username("fulano")
+    assert (usuario["id"], usuario["senha"], usuario["is_admin"]) == (user_id, "hash-2", 0)
+
+
+def test_acesso_traz_ticket_quente_e_leitura_do_usuario(repos, db, usuarios):
+    ticket_id = criar_ticket(repos, usuarios["usuario"])
+    comentario_id = repos.comentarios.criar(ticket_id, usuarios["atendente"], "Olhando", AGORA)
+    repos.comentarios.gravar_leituras([(ticket_id, usuarios["usuario"], comentario_id, AGORA)])
+    db.commit()
+
+    [ticket] = repos.tickets.acesso([ticket_id], usuarios["usuario"])
+
+    assert ticket["arquivado"] is False
+    assert ticket["status"] == "Aberto"
+    assert ticket["creator_username"] == "usuario"
+    assert ticket["seen_comment_id"] == comentario_id
+    assert repos.tickets.acesso([ticket_id + 1000], usuarios["usuario"]) == []
+    assert repos.tickets.localizar(ticket_id)["is_hidden"] == 0
+
+
+def test_acoes_respeitam_as_travas_de_status(repos, db, usuarios):
+    ticket_id = criar_ticket(repos, usuarios["usuario"])
+    atendente = usuarios["atendente"]
+
+    # Fechar/ocultar ticket Aberto não casa o WHERE
+    repos.tickets.aplicar_acao("close", [ticket_id], atendente, AGORA)
+    repos.tickets.aplicar_acao("hide", [ticket_id], atendente, AGORA)
+    assert repos.tickets.localizar(ticket_id)["is_hidden"] == 0
+
+    for acao in ("start", "close", "hide"):
+        repos.tickets.aplicar_acao(acao, [ticket_id], atendente, AGORA)
+    db.commit()
+
+    ticket = db.execute("SELECT * FROM tickets WHERE id = ?", (ticket_id,)).fetchone()
+    assert (ticket["status"], ticket["attendant_id"], ticket["is_hidden"]) == ("Fechado", atendente, 1)
+
+    repos.tickets.desocultar(ticket_id)
+    assert repos.tickets.localizar(ticket_id)["is_hidden"] == 0
+
+
+def test_board_pagina_por_coluna(repos, usuarios):
+    ids = [criar_ticket(repos, usuarios["usuario"], titulo=f"Chamado {n}") for n in range(5)]
+    colunas = helpdesk.colunas_do_board(0, usuarios["usuario"])
+    cursores = {coluna: (None, None) for coluna in colunas}
+
+    linhas = repos.tickets.board({"abertos": colunas["abertos"]}, cursores, 3)
+
+    # por_pagina + 1 (a linha a mais diz que existe próxima página), mais novos primeiro
+    assert [linha["id"] for linha in linhas] == ids[::-1][:4]
+
+
+def test_busca_texto_acha_por_prefixo_no_ticket_e_no_comentario(repos, db, usuarios):
+    impressora = criar_ticket(repos, usuarios["usuario"], titulo="Impressora travada")
+    rede = criar_ticket(repos, usuarios["usuario"], titulo="Sem rede", descricao="Cabo solto")
+    repos.comentarios.criar(rede, usuarios["atendente"], "Troquei o switch", AGORA)
+    db.commit()
+
+    assert [linha["id"] for linha in repos.tickets.buscar_texto(2, None, "impres", 30)] == [impressora]
+    assert [linha["id"] for linha in repos.tickets.buscar_texto(2, None, "switch", 30)] == [rede]
+    # Outro usuário não vê os tickets
+    assert repos.tickets.buscar_texto(0, usuarios["usuario2"], "impres", 30) == []
+    # Só pontuação: nada para buscar
+    assert repos.tickets.buscar_texto(2, None, '"*', 30) == []
+
+
+def test_comentarios_pagina_e_nao_lidos(repos, db, usuarios):
+    ticket_id = criar_ticket(repos, usuarios["usuario"])
+    ids = [repos.comentarios.criar(ticket_id, usuarios["atendente"], f"c{n}", AGORA) for n in range(4)]
+    repos.comentarios.criar(ticket_id, usuarios["usuario"], "meu", AGORA)
+    db.commit()
+
+    assert [c["comment"] for c in repos.comentarios.pagina(ticket_id, 2)] == ["meu", "c3", "c2"]
+    assert [c["id"] for c in repos.comentarios.pagina(ticket_id, 2, after_id=ids[0])] == ids[1:4]
+    assert [c["id"] for c in repos.comentarios.pagina(ticket_id, 2, before_id=ids[2])] == ids[1::-1]
+
+    # O próprio comentário não conta
+    assert repos.comentarios.nao_lidos([ticket_id], usuarios["usuario"]) == {ticket_id: 4}
+
+    repos.comentarios.gravar_leituras([(ticket_id, usuarios["usuario"], ids[1], AGORA)])
+    assert repos.comentarios.nao_lidos([ticket_id], usuarios["usuario"]) == {ticket_id: 2}
+
+    # Leitura atrasada (gravação em segundo plano) não volta o marcador
+    repos.comentarios.gravar_leituras([(ticket_id, usuarios["usuario"], ids[0], AGORA)])
+    assert repos.comentarios.nao_lidos([ticket_id], usuarios["usuario"]) == {ticket_id: 2}
+
+
+def test_eventos_do_ticket(repos, db, usuarios):
+    ticket_id = criar_ticket(repos, usuarios["usuario"])
+    repos.tickets.registrar_eventos([
+        (ticket_id, "ticket_started", usuarios["atendente"], AGORA, json.dumps({"status": "Em andamento"})),
+        (ticket_id, "comment_added", usuarios["atendente"], AGORA, "{}"),
+    ])
+    db.commit()
+
+    tipos = [e["tipo"] for e in repos.tickets.eventos_do_ticket(ticket_id, sem_comentarios=True)]
+    assert "ticket_started" in tipos and "comment_added" not in tipos
+    assert all(e["id"] > 0 for e in repos.tickets.eventos(0, 10))
+
+
+def test_criar_repositorios_recusa_banco_desconhecido(db):
+    with pytest.raises(ValueError):
+        criar_repositorios("mysql", db)
+
+
+# ============================================================
+# APP COM BANCO EM MEMÓRIA
+# ============================================================
+def test_app_usa_o_mesmo_banco_em_memoria_do_teste(app, usuarios):
+    with app.app_context():
+        assert helpdesk.repositorios().usuarios.username_existe("admin")
+
+
+def test_memory_puro_vira_banco_compartilhado_e_exige_migracoes():
+    assert helpdesk.montar_config({"DATABASE": ":memory:"})["DATABASE"] == helpdesk.BANCO_MEMORIA_COMPARTILHADO
+
+    # Banco novo em memória: sem schema, mas sem o "não encontrado" de arquivo
+    with pytest.raises(RuntimeError, match="versão 0"):
+        helpdesk.create_app({"DATABASE": ":memory:"})
+
+
+# ============================================================
+# PostgreSQL (só o SQL gerado: sem servidor aqui)
+# ============================================================
+class CursorFalso:
+    def __init__(self, linha=None):
+        self.linha = linha
+
+    def fetchone(self):
+        return self.linha
+
+    def fetchall(self):
+        return [self.linha] if self.linha else []
+
+
+class ConexaoFalsa:
+    """
+    Guarda o (sql, params) que o psycopg receberia.
+    """
+
+    def __init__(self, linha=None):
+        self.executados = []
+        self.linha = linha
+
+    def execute(self, sql, params=()):
+        self.executados.append((sql, params))
+        return CursorFalso(self.linha)
+
+    def cursor(self):
+        return self
+
+    def executemany(self, sql, lista_params):
+        self.executados.append((sql, list(lista_params)))
+
+
+def test_dialeto_postgres_converte_marcadores():
+    repo = RepositorioUsuariosPostgres(ConexaoFalsa())
+
+    assert repo.sql("SELECT * FROM t WHERE a = ? AND b LIKE 'x%'") == \
+        "SELECT * FROM t WHERE a = %s AND b LIKE 'x%%'"
+    assert repo.sql("UPDATE t SET a = :agora WHERE id = :id") == \
+        "UPDATE t SET a = %(agora)s WHERE id = %(id)s"
+    # Cast do PostgreSQL não é parâmetro
+    assert repo.sql("SELECT x::text") == "SELECT x::text"
+
+
+def test_dialeto_postgres_insere_com_returning():
+    conn = ConexaoFalsa(linha={"id": 42})
+
+    assert RepositorioUsuariosPostgres(conn).criar("fulano", "hash") == 42
+
+    sql, params = conn.executados[-1]
+    assert sql.endswith(" RETURNING id") and "%s" in sql and "?" not in sql
+    assert params == ("fulano", None, "hash", 0)
+
+
+def test_acoes_e_leituras_no_postgres():
+    conn = ConexaoFalsa()
+    tickets = RepositorioTicketsPostgres(conn)
+    comentarios = RepositorioComentariosPostgres(conn)
+
+    tickets.aplicar_acao("start", [1, 2], 7, AGORA)
+    sql, params = conn.executados[-1]
+    assert "%(user_id)s" in sql and len(params) == 2
+    assert tickets.TRAVA_LINHAS == " FOR UPDATE OF tickets"
+
+    comentarios.gravar_leituras([(1, 7, 10, AGORA)])
+    sql, _ = conn.executados[-1]
+    assert "GREATEST(" in sql and "MAX(" not in sql
+
+
+def test_busca_texto_no_postgres_usa_tsquery_de_prefixos():
+    conn = ConexaoFalsa()
+
+    assert RepositorioTicketsPostgres(conn).buscar_texto(0, 5, "Impressora, rede!", 30) == []
+
+    sql, params = conn.executados[-1]
+    assert "to_tsquery('portuguese', %s)" in sql
+    # Filtro do perfil duas vezes: tabela quente e arquivo
+    assert params == ("impressora:* & rede:*", 5, 5, 30)
+    assert "tickets_arquivo AS tickets" in sql and "ticket_comments_arquivo AS tc" in sql
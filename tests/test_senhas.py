@@ -0,0 +1,79 @@
+import threading
+
+import pytest
+from werkzeug.security import generate_password_hash
+
+import app as helpdesk
+
+from conftest import SENHA
+
+
+@pytest.mark.parametrize("guardado, configurado", [
+    ("scrypt:32768:8:1", "scrypt"),
+    ("scrypt:32768:8:1", "scrypt:32768"),
+    (f"pbkdf2:sha256:{helpdesk.DEFAULT_PBKDF2_ITERATIONS}", "pbkdf2"),
+    ("pbkdf2:sha256:1", "pbkdf2:sha256:1"),
+])
+def test_metodo_abreviado_nao_refaz_hash(guardado, configurado):
+    assert not helpdesk.hash_desatualizado(f"{guardado}$sal$hash", configurado)
+
+
+@pytest.mark.parametrize("guardado, configurado", [
+    ("scrypt:16384:8:1", "scrypt"),
+    ("pbkdf2:sha256:260000", "pbkdf2"),
+    ("pbkdf2:sha256:1", "scrypt"),
+    ("md5", "scrypt"),
+])
+def test_metodo_ou_custo_diferente_refaz_hash(guardado, configurado):
+    assert helpdesk.hash_desatualizado(f"{guardado}$sal$hash", configurado)
+
+
+def test_hash_gerado_pelo_werkzeug_com_abreviacao_fica_atualizado():
+    assert not helpdesk.hash_desatualizado(generate_password_hash("x", "scrypt"), "scrypt")
+
+
+def test_metodo_invalido_na_config_nao_sobe():
+    with pytest.raises(RuntimeError, match="SENHA_METODO"):
+        helpdesk.montar_config({"SENHA_METODO": "bcrypt"})
+
+
+def test_login_refaz_hash_uma_vez_com_o_metodo_da_config(uri_banco, db, usuarios):
+    app = helpdesk.create_app({"DATABASE": uri_banco, "SECRET_KEY": "chave-dos-testes",
+                               "SENHA_METODO": "pbkdf2:sha256:2"})
+    client = app.test_client()
+
+    def senha_guardada():
+        db.commit()
+        return db.execute("SELECT senha FROM users WHERE username = 'usuario'").fetchone()[0]
+
+    # conftest grava pbkdf2:sha256:1
+    resposta = client.post("/login", data={"username": "usuario", "senha": SENHA})
+    assert resposta.status_code == 302 and not resposta.location.endswith("/login")
+    novo_hash = senha_guardada()
+    assert novo_hash.startswith("pbkdf2:sha256:2$")
+
+    client.get("/logout")
+    client.post("/login", data={"username": "usuario", "senha": SENHA})
+    assert senha_guardada() == novo_hash
+
+
+def test_pool_de_senhas_lotado_responde_servidor_ocupado(client, usuarios, monkeypatch):
+    vagas = threading.BoundedSemaphore(1)
+    monkeypatch.setattr(helpdesk, "_senha_vagas", vagas)
+    monkeypatch.setattr(helpdesk, "SENHA_ESPERA_SEG", 0.05)
+
+    # Outro request com o hash em andamento segura a única vaga
+    vagas.acquire()
+    for rota, username in (("/login", "usuario"), ("/register", "usuario.novo")):
+        resposta = client.post(rota, data={"username": username, "senha": SENHA})
+        assert resposta.location.endswith(rota)
+
+        with client.session_transaction() as sessao:
+            assert sessao.pop("_flashes") == [
+                ("warning", "Servidor ocupado, tente novamente em instantes.")]
+            assert "user_id" not in sessao
+
+    # Vaga livre de novo: o mesmo login passa
+    vagas.release()
+    resposta = client.post("/login", data={"username": "usuario", "senha": SENHA})
+    assert resposta.status_code == 302 and not resposta.location.endswith("/login")
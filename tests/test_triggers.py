@@ -0,0 +1,78 @@
+from conftest import AGORA, criar_ticket
+
+
+def contadores(db, ticket_id):
+    linha = db.execute("""
+        SELECT last_comment_id, last_comment_user_id, comment_count
+        FROM tickets WHERE id = ?
+    """, (ticket_id,)).fetchone()
+    return tuple(linha)
+
+
+def totais(db):
+    return dict(db.execute("SELECT estado, total FROM ticket_totais WHERE total != 0").fetchall())
+
+
+def test_comentario_atualiza_contadores_do_ticket(repos, db, usuarios):
+    ticket_id = criar_ticket(repos, usuarios["usuario"])
+    assert contadores(db, ticket_id) == (None, None, 0)
+
+    primeiro = repos.comentarios.criar(ticket_id, usuarios["usuario"], "oi", AGORA)
+    segundo = repos.comentarios.criar(ticket_id, usuarios["atendente"], "olá", AGORA)
+    assert contadores(db, ticket_id) == (segundo, usuarios["atendente"], 2)
+
+    # Apagado na mão: recalcula o último a partir do que sobrou
+    db.execute("DELETE FROM ticket_comments WHERE id = ?", (segundo,))
+    assert contadores(db, ticket_id) == (primeiro, usuarios["usuario"], 1)
+    db.commit()
+
+
+def test_responder_nao_esconde_o_que_os_outros_escreveram(repos, db, usuarios):
+    ticket_id = criar_ticket(repos, usuarios["usuario"])
+    repos.comentarios.criar(ticket_id, usuarios["atendente"], "pode testar?", AGORA)
+    db.commit()
+    assert repos.comentarios.nao_lidos([ticket_id], usuarios["usuario"]) == {ticket_id: 1}
+
+    # Último comentário é dele, mas o do atendente continua não lido
+    repos.comentarios.criar(ticket_id, usuarios["usuario"], "funcionou", AGORA)
+    db.commit()
+    assert repos.comentarios.nao_lidos([ticket_id], usuarios["usuario"]) == {ticket_id: 1}
+    assert repos.comentarios.nao_lidos([ticket_id], usuarios["atendente"]) == {ticket_id: 1}
+
+    # Leu até o last_comment_id do ticket: descartado sem contar
+    ultimo = db.execute("SELECT last_comment_id FROM tickets WHERE id = ?", (ticket_id,)).fetchone()[0]
+    repos.comentarios.gravar_leituras([(ticket_id, usuarios["usuario"], ultimo, AGORA)])
+    db.commit()
+    assert repos.comentarios.nao_lidos([ticket_id], usuarios["usuario"]) == {}
+
+
+def test_totais_por_estado_acompanham_o_ticket(repos, db, usuarios):
+    ticket_id = criar_ticket(repos, usuarios["usuario"])
+    criar_ticket(repos, usuarios["usuario"])
+    assert totais(db) == {"Aberto": 2}
+
+    repos.tickets.aplicar_acao("start", [ticket_id], usuarios["atendente"], AGORA)
+    repos.tickets.aplicar_acao("close", [ticket_id], usuarios["atendente"], AGORA)
+    assert totais(db) == {"Aberto": 1, "Fechado": 1}
+
+    repos.tickets.aplicar_acao("hide", [ticket_id], usuarios["atendente"], AGORA)
+    assert totais(db) == {"Aberto": 1, "ocultados": 1}
+
+    db.execute("DELETE FROM tickets WHERE id = ?", (ticket_id,))
+    assert totais(db) == {"Aberto": 1}
+    db.commit()
+
+
+def test_indice_de_busca_acompanha_edicao_e_remocao(repos, db, usuarios):
+    ticket_id = criar_ticket(repos, usuarios["usuario"], titulo="Monitor piscando")
+    assert [t["id"] for t in repos.tickets.buscar_texto(2, None, "monitor", 30)] == [ticket_id]
+
+    db.execute("UPDATE tickets SET titulo = 'Teclado falhando' WHERE id = ?", (ticket_id,))
+    assert repos.tickets.buscar_texto(2, None, "monitor", 30) == []
+    assert [t["id"] for t in repos.tickets.buscar_texto(2, None, "teclado", 30)] == [ticket_id]
+
+    comentario = repos.comentarios.criar(ticket_id, usuarios["atendente"], "trocar cabo HDMI", AGORA)
+    assert [t["id"] for t in repos.tickets.buscar_texto(2, None, "hdmi", 30)] == [ticket_id]
+    db.execute("DELETE FROM ticket_comments WHERE id = ?", (comentario,))
+    assert repos.tickets.buscar_texto(2, None, "hdmi", 30) == []
+    db.commit()
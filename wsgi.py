@@ -0,0 +1,16 @@
+from app import create_app
+
+# ============================================================
+# ENTRADA WSGI (PRODUÇÃO)
+# ============================================================
+#
+# O servidor importa "wsgi:app". A configuração vem das variáveis
+# HELPDESK_* (ver create_app no app.py) e a versão do schema é
+# conferida aqui, na subida: banco desatualizado = o servidor nem sobe.
+#
+# Rodar:
+#   HELPDESK_SECRET_KEY=... gunicorn -c gunicorn.conf.py wsgi:app
+#
+# ============================================================
+
+app = create_app()